@@ -1,32 +1,58 @@
 import streamlit as st
-import requests
-import json
 import os
 import pandas as pd
 import io
-import numpy as np
-import time
-from datetime import datetime
 import hashlib
 import urllib.parse
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
-import threading
-import logging
-
-# Configuración de logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
+from log_tail import LogTail
+from run_stats import RunStats
+from logging_setup import LOG_SETTINGS, component_logger, configure_logging, current_log_file
+from extraction import EXTRACTION_JOB, run_extraction_job
+from extraction_checkpoint import ExtractionCheckpoint
+from jobs import CANCELLING, JobRegistry, job_active
+from metrics import METRICS, METRICS_DIR
+from item_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ItemCache
+from ml_client import TOKEN_FILE, MercadoLibreClient
+from inventory_sync import apply_provider_stock, changed_listings, sync_inventory
+from pricing import cost_values, scenario_grid, scenario_label, summarize_scenarios, suggested_prices
+from provider_reader import PROVIDER_HISTORY_DIR, ProviderFileError, import_provider_file
+from inventory_store import InventoryStore
+from snapshot_diff import CHANGE_TYPES, dataframe_source, diff_snapshots, store_source
+from snapshots import (
+    list_ml_snapshots, load_snapshot,
+    migrate_xlsx_snapshots, snapshot_to_xlsx_bytes, compact_snapshot
 )
-logger = logging.getLogger("inventarios-app")
+
+def get_setting(env_var, secrets_key, default=None, section="mercadolibre"):
+    """Lee un parámetro opcional desde variables de entorno (Render) o de la sección `section` de secrets.toml."""
+    if "RENDER" in os.environ:
+        return os.environ.get(env_var, default)
+    try:
+        return st.secrets[section].get(secrets_key, os.environ.get(env_var, default))
+    except (KeyError, FileNotFoundError):
+        return os.environ.get(env_var, default)
+
+# Configuración de logging (cola + archivo rotativo; niveles por componente en [logging] o LOG_LEVEL_*)
+configure_logging({key: get_setting(env_var, key, section="logging") for key, env_var in LOG_SETTINGS.items()})
+logger = component_logger("ui")
+# Métricas de la API y de los trabajos, exportadas para Prometheus al terminar cada trabajo
+METRICS.configure(get_setting("METRICS_FILE", "prometheus_file", os.path.join(METRICS_DIR, "app.prom"), section="metrics"))
 
 st.set_page_config(layout="wide", page_title="Gestión de Inventario ESPAITEC")
 
+# Segundos entre actualizaciones del panel de progreso de la extracción
+PROGRESS_REFRESH_SECONDS = 1
+
+@st.cache_resource(show_spinner=False)
+def get_run_stats():
+    """Contadores de ejecuciones de la página compartidos por todas las sesiones."""
+    return RunStats()
+
+run_stats = get_run_stats()
+script_started = run_stats.start("script")
+
 # ---- CUSTOM STYLES ----
 st.markdown("""
     <style>
@@ -152,261 +178,103 @@ def get_google_auth_url():
     )
 
 # ---- FILE HISTORY ----
-def manage_file_history(directory, file_extension, max_files=3):
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-    
-    history = sorted(
-        [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(file_extension)],
-        key=os.path.getmtime
+@st.cache_data(show_spinner=False, max_entries=3)
+def get_snapshot_xlsx(path, mtime):
+    """xlsx de un inventario del historial; se genera solo cuando se pide y se cachea por archivo y fecha."""
+    return snapshot_to_xlsx_bytes(path)
+
+# ---- CALCULADORA DE PRECIOS ----
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_master_catalog(file_hash, _data):
+    """Catálogo maestro leído una sola vez por archivo: la clave del caché es el hash del contenido."""
+    df_master = pd.read_excel(io.BytesIO(_data))
+    df_master.columns = [str(c).strip().upper() for c in df_master.columns]
+    return df_master
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def price_master_catalog(file_hash, utilidad, costo_envio, iva, comision_ml, _data):
+    """Catálogo con PRECIO VENTA SUGERIDO, cacheado por archivo y parámetros."""
+    df_master = load_master_catalog(file_hash, _data)
+    df_master["PRECIO VENTA SUGERIDO"] = suggested_prices(
+        cost_values(df_master["PRECIO MAYOREO"]), utilidad, costo_envio, iva, comision_ml
     )
-    
-    while len(history) >= max_files:
-        os.remove(history.pop(0))
-
-# ---- API MERCADO LIBRE ----
-def refresh_access_token(client_id, client_secret):
-    """Obtiene un nuevo token de acceso usando las credenciales de la aplicación."""
-    url = "https://api.mercadolibre.com/oauth/token"
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded",
-        "Accept": "application/json"
-    }
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret
-    }
-    
-    try:
-        resp = requests.post(url, headers=headers, data=data, timeout=10)
-        resp.raise_for_status()
-        token_info = resp.json()
-        
-        # Guardar el nuevo token en las variables de entorno en memoria
-        os.environ["MERCADOLIBRE_ACCESS_TOKEN"] = token_info["access_token"]
-        
-        # Registrar la renovación en el log
-        logger.info(f"Token de Mercado Libre renovado. Expira en {token_info.get('expires_in')} segundos.")
-        
-        return token_info["access_token"]
-    except requests.RequestException as e:
-        logger.error(f"Error al renovar el token: {str(e)}")
-        if hasattr(e, 'response') and e.response:
-            logger.error(f"Respuesta del servidor: {e.response.text}")
-        return None
-
-def get_headers(token):
-    """Genera los headers de autorización para la API de Mercado Libre."""
-    return {"Authorization": f"Bearer {token}"}
-
-def get_user_id(token):
-    """Obtiene el ID del usuario autenticado en Mercado Libre."""
-    url = "https://api.mercadolibre.com/users/me"
-    try:
-        resp = requests.get(url, headers=get_headers(token), timeout=10)
-        
-        # Si el token expiró (401), intentar renovarlo
-        if resp.status_code == 401:
-            logger.warning("Token expirado. Intentando renovar...")
-            
-            # Obtener credenciales para renovar
-            if "RENDER" in os.environ:
-                client_id = os.environ.get("MERCADOLIBRE_CLIENT_ID")
-                client_secret = os.environ.get("MERCADOLIBRE_CLIENT_SECRET")
-            else:
-                try:
-                    client_id = st.secrets["mercadolibre"]["client_id"]
-                    client_secret = st.secrets["mercadolibre"]["client_secret"]
-                except (KeyError, FileNotFoundError):
-                    logger.error("No se encontraron las credenciales para renovar el token")
-                    return None
-            
-            # Renovar token
-            new_token = refresh_access_token(client_id, client_secret)
-            if new_token:
-                # Reintentar con el nuevo token
-                resp = requests.get(url, headers=get_headers(new_token), timeout=10)
-            else:
-                logger.error("No se pudo renovar el token")
-                return None
-        
-        resp.raise_for_status()
-        return resp.json()["id"]
-    except requests.RequestException as e:
-        logger.error(f"Error al obtener user_id: {str(e)}")
-        return None
-
-def get_items(user_id, token, status):
-    """Obtiene todos los items de un usuario con un status específico (active, paused, etc)."""
-    items = []
-    offset = 0
-    limit = 50
-    while True:
-        url = f"https://api.mercadolibre.com/users/{user_id}/items/search?status={status}&limit={limit}&offset={offset}"
+    return df_master
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def master_catalog_xlsx(file_hash, utilidad, costo_envio, iva, comision_ml, _data):
+    """xlsx del catálogo con precios; solo se genera al descargarlo."""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        price_master_catalog(file_hash, utilidad, costo_envio, iva, comision_ml, _data).to_excel(writer, index=False)
+    return output.getvalue()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def price_scenarios(file_hash, utilidades, comisiones, envios, iva, _data):
+    """Rejilla de escenarios para todo el catálogo: (resumen por escenario, catálogo con una columna por escenario)."""
+    df_master = load_master_catalog(file_hash, _data)
+    precios, escenarios = scenario_grid(df_master["PRECIO MAYOREO"], utilidades, comisiones, envios, iva)
+    columnas = [scenario_label(*row) for row in escenarios.itertuples(index=False)]
+    df_precios = pd.DataFrame(precios, columns=columnas, index=df_master.index)
+    base = [c for c in ["CLAVE_ARTICULO", "DESCRIPCION DEL ARTICULO", "PRECIO MAYOREO"] if c in df_master.columns]
+    return summarize_scenarios(precios, escenarios), pd.concat([df_master[base], df_precios], axis=1)
+
+def parse_number_list(texto):
+    """Convierte "15, 20, 25" en una tupla ordenada de números sin repetir (ignora lo que no sea número)."""
+    valores = set()
+    for parte in texto.replace(";", ",").split(","):
         try:
-            resp = requests.get(url, headers=get_headers(token), timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            results = data.get("results", [])
-            items.extend(results)
-            if not results or len(results) < limit:
-                break
-            offset += limit
-        except requests.RequestException as e:
-            logger.error(f"Error al obtener items con status {status}: {str(e)}")
-            break
-    return items
-
-def get_item_detail(item_id, token):
-    """Obtiene los detalles completos de un item específico con manejo robusto de errores."""
-    url = f"https://api.mercadolibre.com/items/{item_id}"
-    max_retries = 3
-    
-    for attempt in range(max_retries):
-        try:
-            resp = requests.get(url, headers=get_headers(token), timeout=15)  # Timeout aumentado
-            
-            # Si hay rate limiting, esperar y reintentar
-            if resp.status_code == 429:
-                wait_time = 2 ** attempt  # Backoff exponencial
-                logger.warning(f"Rate limit para {item_id}, esperando {wait_time}s (intento {attempt + 1}/{max_retries})")
-                time.sleep(wait_time)
-                continue
-                
-            resp.raise_for_status()
-            return resp.json()
-            
-        except requests.Timeout:
-            logger.warning(f"Timeout para {item_id} (intento {attempt + 1}/{max_retries})")
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-        except requests.RequestException as e:
-            logger.error(f"Error al obtener detalles del item {item_id} (intento {attempt + 1}/{max_retries}): {str(e)}")
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-    
-    logger.error(f"Falló completamente la obtención de {item_id} después de {max_retries} intentos")
-    return None
+            valores.add(float(parte.strip()))
+        except ValueError:
+            pass
+    return tuple(sorted(valores))
+
+@st.cache_resource(show_spinner=False)
+def get_log_tail(path):
+    """Lector incremental del log compartido por todas las sesiones."""
+    return LogTail(path)
+
+@st.cache_resource(show_spinner=False)
+def get_job_registry():
+    """Registro de trabajos en segundo plano compartido por todas las sesiones."""
+    return JobRegistry()
+
+@st.cache_resource(show_spinner=False)
+def get_inventory_store():
+    """Almacén SQLite de inventarios compartido por todas las sesiones."""
+    return InventoryStore()
+
+@st.cache_resource(show_spinner=False)
+def import_snapshot_history():
+    """Convierte los xlsx antiguos a Parquet y registra en la base los archivos del historial, una vez por proceso."""
+    migrate_xlsx_snapshots()
+    get_inventory_store().import_snapshot_files(list_ml_snapshots(), load_snapshot)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_ml_snapshot(snapshot_id):
+    """Inventario de Mercado Libre en tipos compactos, compartido por todas las sesiones.
+
+    Cada snapshot de la base es inmutable, así que su id basta como clave. cache_resource
+    entrega el mismo objeto a todas las sesiones (cache_data haría una copia por llamada):
+    es de solo lectura, quien necesite modificarlo trabaja sobre una copia.
+    """
+    return compact_snapshot(get_inventory_store().load_ml_snapshot(snapshot_id))
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def diff_store_snapshots(snapshot_ids):
+    """Comparación de inventarios del historial; cada snapshot es inmutable, así que basta su id como clave."""
+    inventory_store = get_inventory_store()
+    return diff_snapshots([store_source(inventory_store, snapshot_id) for snapshot_id in snapshot_ids], labels=snapshot_ids)
 
-def extract_sku_from_item(item_or_variation):
-    """Extrae el SKU de un item o variación de forma más robusta."""
-    
-    # Debug: Log la estructura del item para identificar problemas
-    item_id = item_or_variation.get("item_id", item_or_variation.get("id", "unknown"))
-    
-    # 1. seller_custom_field (preferido)
-    sku = item_or_variation.get("seller_custom_field", None)
-    if isinstance(sku, str) and sku.strip():
-        logger.debug(f"SKU encontrado en seller_custom_field para {item_id}: {sku.strip()}")
-        return sku.strip()
-
-    # 2. Nuevo: Buscar en el campo "seller_sku" que es donde ML guarda el "Código de identificación (SKU)"
-    sku = item_or_variation.get("seller_sku", None)
-    if isinstance(sku, str) and sku.strip():
-        logger.debug(f"SKU encontrado en seller_sku para {item_id}: {sku.strip()}")
-        return sku.strip()
-
-    # 3. Buscar en attributes con más variaciones de nombres
-    if "attributes" in item_or_variation:
-        for attr in item_or_variation["attributes"]:
-            attr_id = attr.get("id", "").upper()
-            # Buscar múltiples variaciones de SKU incluyendo SELLER_SKU que es el campo oficial
-            if attr_id in ["SELLER_SKU", "SKU", "ITEM_SKU", "PRODUCT_SKU", "CUSTOM_SKU", "IDENTIFIER"]:
-                # Probar diferentes campos de valor
-                for value_field in ["value_name", "value", "values"]:
-                    value = attr.get(value_field)
-                    if isinstance(value, str) and value.strip():
-                        logger.debug(f"SKU encontrado en attributes.{attr_id}.{value_field} para {item_id}: {value.strip()}")
-                        return value.strip()
-                    elif isinstance(value, list) and value and isinstance(value[0], str):
-                        logger.debug(f"SKU encontrado en attributes.{attr_id}.{value_field}[0] para {item_id}: {value[0].strip()}")
-                        return value[0].strip()
-
-    # 4. Buscar en attribute_combinations (para variaciones)
-    if "attribute_combinations" in item_or_variation:
-        for attr in item_or_variation["attribute_combinations"]:
-            attr_id = attr.get("id", "").upper()
-            if attr_id in ["SELLER_SKU", "SKU", "ITEM_SKU", "PRODUCT_SKU"]:
-                for value_field in ["value_name", "value", "values"]:
-                    value = attr.get(value_field)
-                    if isinstance(value, str) and value.strip():
-                        logger.debug(f"SKU encontrado en attribute_combinations.{attr_id}.{value_field} para {item_id}: {value.strip()}")
-                        return value.strip()
-
-    # 5. Campos directos de SKU (ampliados)
-    for key in ["sku", "variation_sku", "seller_sku", "custom_sku", "identifier", "code"]:
-        value = item_or_variation.get(key, None)
-        if isinstance(value, str) and value.strip():
-            logger.debug(f"SKU encontrado en campo directo {key} para {item_id}: {value.strip()}")
-            return value.strip()
-
-    # 6. Si no se encuentra, log para debugging con más detalle
-    logger.warning(f"No se encontró SKU para item {item_id}. Estructura disponible: {list(item_or_variation.keys())}")
-    
-    # Log específico de atributos para debug
-    if "attributes" in item_or_variation:
-        attr_list = [f"{attr.get('id', 'NO_ID')}:{attr.get('value_name', attr.get('value', 'NO_VALUE'))}" for attr in item_or_variation["attributes"]]
-        logger.warning(f"Atributos disponibles en {item_id}: {attr_list}")
-    
-    # 7. Último recurso: buscar cualquier campo que contenga "sku" en el nombre
-    for key, value in item_or_variation.items():
-        if "sku" in key.lower() and isinstance(value, str) and value.strip():
-            logger.debug(f"SKU encontrado en campo alternativo {key} para {item_id}: {value.strip()}")
-            return value.strip()
-    
-    return ""
-
-def update_item_stock_safe(item_id, all_variations, token):
-    """Actualiza el stock de un item asegurando que se envíen TODAS las variantes para evitar eliminaciones."""
-    url = f"https://api.mercadolibre.com/items/{item_id}"
-    headers = get_headers(token)
-    headers["Content-Type"] = "application/json"
-    headers["Accept"] = "application/json"
-    
-    try:
-        # Primer intento
-        resp = requests.put(url, data=json.dumps(all_variations), headers=headers, timeout=15)
-        if resp.status_code == 200:
-            logger.info(f"Item {item_id} actualizado correctamente")
-            return {"success": True, "data": resp.json()}
-            
-        # Si hay rate limiting, esperar y reintentar
-        if resp.status_code == 429:
-            logger.warning(f"Rate limit alcanzado para {item_id}, reintentando después de pausa")
-            time.sleep(2)
-            resp = requests.put(url, data=json.dumps(all_variations), headers=headers, timeout=15)
-            if resp.status_code == 200:
-                logger.info(f"Item {item_id} actualizado correctamente en segundo intento")
-                return {"success": True, "data": resp.json()}
-                
-        # Si sigue fallando, registrar el error
-        error_msg = f"Status {resp.status_code}"
-        logger.error(f"Error al actualizar {item_id}: {error_msg} - {resp.text}")
-        return {"success": False, "error": error_msg, "details": resp.text}
-        
-    except requests.RequestException as e:
-        logger.error(f"Excepción al actualizar {item_id}: {str(e)}")
-        return {"success": False, "error": str(e), "details": ""}
-
-def pause_item(item_id, token):
-    """Pausa una publicación en Mercado Libre (cuando su stock total es 0)."""
-    url = f"https://api.mercadolibre.com/items/{item_id}"
-    headers = get_headers(token)
-    headers["Content-Type"] = "application/json"
-    headers["Accept"] = "application/json"
-    payload = {"status": "paused"}
-    
-    try:
-        resp = requests.put(url, data=json.dumps(payload), headers=headers, timeout=10)
-        resp.raise_for_status()
-        logger.info(f"Item {item_id} pausado correctamente")
-        return {"success": True}
-    except requests.RequestException as e:
-        logger.error(f"Error al pausar item {item_id}: {str(e)}")
-        return {"success": False, "error": str(e)}
+# ---- API MERCADO LIBRE ----
+@st.cache_resource(show_spinner=False)
+def get_ml_client(access_token, client_id=None, client_secret=None, base_url=None, token_file=TOKEN_FILE):
+    """Cliente de Mercado Libre compartido entre reruns (y sesiones) para reutilizar el pool de conexiones y el token renovado."""
+    item_cache = ItemCache(
+        get_setting("ITEM_CACHE_PATH", "item_cache_path", DEFAULT_CACHE_PATH),
+        int(get_setting("ITEM_CACHE_MAX_MB", "item_cache_max_mb", DEFAULT_MAX_BYTES // 2**20)) * 2**20,
+    )
+    return MercadoLibreClient(access_token, client_id, client_secret, base_url=base_url, token_file=token_file,
+                              item_cache=item_cache)
 
 # ---- LOGIN UI ----
 if "session_token" in st.query_params and "session_token" in st.session_state:
@@ -441,12 +309,13 @@ with st.sidebar:
     st.markdown("<div class='sidebar-title'>Gestor ESPAITEC</div>", unsafe_allow_html=True)
     menu = st.radio(
         "Menú principal",
-        options=["Sincronizar Inventario", "Calculadora de Precios", "Auditor de Variaciones", "Historial"],
+        options=["Sincronizar Inventario", "Calculadora de Precios", "Auditor de Variaciones", "Historial", "Métricas"],
         format_func=lambda x: {
             "Sincronizar Inventario": "🟠 Sincronizar Inventario",
             "Calculadora de Precios": "💰 Calculadora de Precios",
             "Auditor de Variaciones": "🔍 Auditor de Variaciones",
-            "Historial": "📂 Historial"
+            "Historial": "📂 Historial",
+            "Métricas": "📊 Métricas"
         }[x],
         label_visibility="collapsed"
     )
@@ -498,403 +367,291 @@ if menu == "Sincronizar Inventario":
     else:
         st.session_state.ml_can_refresh = False
         st.warning("⚠️ No se han configurado las credenciales para la renovación automática de tokens. Si el token expira, tendrás que renovarlo manualmente.")
+    ml_client = get_ml_client(
+        access_token, client_id, client_secret,
+        get_setting("MERCADOLIBRE_API_URL", "api_url"),
+        get_setting("MERCADOLIBRE_TOKEN_FILE", "token_file", TOKEN_FILE),
+    )
+    token_status = ml_client.token_manager.status()
+    if token_status["expira"]:
+        st.caption(
+            f"Token de Mercado Libre vigente hasta {token_status['expira']}"
+            + (" (se renueva automáticamente antes de vencer)" if ml_client.can_refresh else "")
+        )
+
     # Cargar el último inventario extraído de Mercado Libre
-    if "ml_inventory" not in st.session_state:
-        st.session_state.ml_inventory = None
-        ml_history_dir = "inventario_ml_historial"
-        if os.path.exists(ml_history_dir):
-            ml_files = sorted([f for f in os.listdir(ml_history_dir) if f.endswith(".xlsx")], 
-                             key=lambda x: os.path.getmtime(os.path.join(ml_history_dir, x)),
-                             reverse=True)
-            if ml_files:
-                latest_ml_file = os.path.join(ml_history_dir, ml_files[0])
-                try:
-                    st.session_state.ml_inventory = pd.read_excel(latest_ml_file)
-                    st.session_state.ml_inventory_fecha = datetime.fromtimestamp(os.path.getmtime(latest_ml_file)).strftime("%Y-%m-%d %H:%M:%S")
-                    st.success(f"Inventario cargado automáticamente del historial: {ml_files[0]}")
-                except Exception as e:
-                    st.error(f"Error al cargar el inventario: {str(e)}")
+    inventory_store = get_inventory_store()
+    # La sesión guarda solo el id del inventario; los datos están en get_ml_snapshot
+    if "ml_snapshot_id" not in st.session_state:
+        st.session_state.ml_snapshot_id = None
+        try:
+            # Los inventarios antiguos en xlsx se convierten una sola vez a Parquet y los
+            # archivos del historial que falten se registran en la base de datos
+            import_snapshot_history()
+            snapshot_id = inventory_store.latest_snapshot_id("ml")
+            if snapshot_id is not None:
+                snapshot = inventory_store.get_snapshot(snapshot_id)
+                st.session_state.ml_snapshot_id = snapshot_id
+                st.session_state.ml_inventory_fecha = snapshot["created_at"]
+                st.success(f"Inventario cargado automáticamente del historial: {os.path.basename(snapshot['source'] or str(snapshot_id))}")
+        except Exception as e:
+            st.error(f"Error al cargar el inventario: {str(e)}")
     
     if "ml_inventory_fecha" not in st.session_state:
         st.session_state.ml_inventory_fecha = None
 
     # --------- EXTRACCIÓN CON STOP Y PROGRESO ---------
-    if "extraction_job" not in st.session_state:
-        st.session_state.extraction_job = {"status": "idle"}
-
-    def run_extraction_job(token, job_state):
-        """Función principal para extraer el inventario de Mercado Libre en segundo plano."""
-        user_id = get_user_id(token)
-        if not user_id:
-            job_state["status"] = "error"
-            job_state["message"] = "No se pudo obtener tu user_id. Revisa tu token."
-            logger.error("Extracción fallida: No se pudo obtener user_id")
-            return
-
-        # Obtener IDs de todas las publicaciones (activas y pausadas)
-        status_list = ["active", "paused"]
-        all_items_info = []
-        item_ids = []
-        for status in status_list:
-            status_items = get_items(user_id, token, status)
-            logger.info(f"Obtenidas {len(status_items)} publicaciones con status {status}")
-            item_ids.extend(status_items)
-        
-        total_publicaciones = len(item_ids)
-        job_state["total"] = total_publicaciones
-        logger.info(f"Iniciando extracción de {total_publicaciones} publicaciones")
-        
-        # Procesar cada publicación
-        for idx, item_id in enumerate(item_ids):
-            # Verificar si el usuario canceló la operación
-            if job_state["status"] == "cancelled":
-                logger.info("Extracción cancelada por el usuario")
-                return
-
-            # Actualizar progreso
-            job_state["progress"] = (idx + 1) / total_publicaciones
-            job_state["text"] = f"Descargando {idx+1}/{total_publicaciones}"
-
-            # Obtener detalles de la publicación con manejo de errores robusto
-            try:
-                item = get_item_detail(item_id, token)
-                if not item:
-                    logger.warning(f"No se pudo obtener detalles para {item_id}, saltando...")
-                    continue
-                    
-                status = item.get("status", "unknown")
-                
-                # Debug específico para publicaciones problemáticas
-                if item_id in ["MLM1338123694", "MLM1339305557", "MLM1339298925", "MLM1339298922", "MLM1856162519", "MLM2308903050", "MLM3088252038"]:
-                    logger.info(f"DEBUG: Analizando publicación problemática {item_id}")
-                    try:
-                        debug_item_structure(item_id, token)
-                    except Exception as debug_error:
-                        logger.error(f"Error en debug de {item_id}: {debug_error}")
-                
-                # Procesar publicación con variaciones
-                if "variations" in item and item["variations"]:
-                    for v in item["variations"]:
-                        try:
-                            sku = extract_sku_from_item(v)
-                            # Debug adicional para variaciones sin SKU en publicaciones problemáticas
-                            if not sku and item_id in ["MLM1338123694", "MLM1339305557", "MLM1339298925", "MLM1339298922", "MLM1856162519", "MLM2308903050", "MLM3088252038"]:
-                                logger.warning(f"DEBUG: Variación sin SKU en {item_id}, variation_id: {v.get('id')}")
-                                logger.warning(f"Estructura de variación sin SKU: keys={list(v.keys())}, seller_custom_field={v.get('seller_custom_field')}, seller_sku={v.get('seller_sku')}")
-                            
-                            all_items_info.append({
-                                "status": status, 
-                                "item_id": item_id, 
-                                "título": item.get("title", ""),
-                                "sku": sku, 
-                                "variación_id": v.get("id", np.nan),
-                                "stock": v.get("available_quantity", 0),
-                            })
-                        except Exception as var_error:
-                            logger.error(f"Error procesando variación de {item_id}: {var_error}")
-                            continue
-                # Procesar publicación sin variaciones
-                else:
-                    try:
-                        sku = extract_sku_from_item(item)
-                        # Debug adicional para publicaciones sin SKU
-                        if not sku and item_id in ["MLM1338123694", "MLM1339305557", "MLM1339298925", "MLM1339298922", "MLM1856162519", "MLM2308903050", "MLM3088252038"]:
-                            logger.warning(f"DEBUG: Publicación sin SKU {item_id}")
-                            logger.warning(f"Estructura de publicación sin SKU: keys={list(item.keys())}, seller_custom_field={item.get('seller_custom_field')}, seller_sku={item.get('seller_sku')}")
-                        
-                        all_items_info.append({
-                            "status": status, 
-                            "item_id": item_id, 
-                            "título": item.get("title", ""),
-                            "sku": sku, 
-                            "variación_id": np.nan,
-                            "stock": item.get("available_quantity", 0),
-                        })
-                    except Exception as item_error:
-                        logger.error(f"Error procesando item {item_id}: {item_error}")
-                        continue
-                        
-                # Pequeña pausa para evitar rate limiting
-                if idx % 50 == 0:  # Cada 50 publicaciones
-                    time.sleep(0.5)
-                    
-            except Exception as general_error:
-                logger.error(f"Error general procesando {item_id}: {general_error}")
-                # Continuar con el siguiente item en lugar de fallar completamente
-                continue
-        
-        if job_state["status"] != "cancelled":
-            df_inv = pd.DataFrame(all_items_info)
-            # Identificar publicaciones sin SKU
-            df_sin_sku = df_inv[df_inv["sku"].apply(lambda x: x is None or str(x).strip() == "")]
-            if not df_sin_sku.empty:
-                job_state["sin_sku"] = True
-                job_state["sin_sku_count"] = len(df_sin_sku)
-                job_state["sin_sku_items"] = df_sin_sku[["item_id", "título"]].drop_duplicates().to_dict('records')
-                # Guardar reporte Excel de publicaciones/variaciones sin SKU
-                sin_sku_dir = "reportes_sin_sku"
-                if not os.path.exists(sin_sku_dir):
-                    os.makedirs(sin_sku_dir)
-                reporte_path = os.path.join(sin_sku_dir, f"sin_sku_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
-                df_sin_sku.to_excel(reporte_path, index=False)
-                job_state["sin_sku_reporte"] = reporte_path
-                logger.warning(f"Se encontraron {len(df_sin_sku)} variaciones sin SKU en {len(job_state['sin_sku_items'])} publicaciones")
-            else:
-                job_state["sin_sku"] = False
-                job_state["sin_sku_reporte"] = None
-                logger.info("No se encontraron publicaciones sin SKU")
-            
-            # Guardar en session_state y en historial
-            st.session_state.ml_inventory = df_inv
-            st.session_state.ml_inventory_fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Guardar archivo en historial
-            history_dir = "inventario_ml_historial"
-            manage_file_history(history_dir, ".xlsx")
-            filename = f"ml_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            file_path = os.path.join(history_dir, filename)
-            df_inv.to_excel(file_path, index=False)
-            logger.info(f"Inventario guardado en {file_path} con {len(df_inv)} variantes")
+    # La extracción es un trabajo del proceso: solo hay una a la vez y cualquier pestaña
+    # ve su progreso y recibe su resultado
+    job_registry = get_job_registry()
+    extraction_job = job_registry.get(EXTRACTION_JOB)
+    if "extraction_seen_job" not in st.session_state:
+        # Una sesión nueva ya cargó el último inventario; no repite avisos de extracciones anteriores
+        st.session_state.extraction_seen_job = (
+            extraction_job["id"] if extraction_job is not None and not job_active(extraction_job) else None
+        )
+    # Una extracción cancelada sigue activa hasta que su hilo guarda el avance y termina
+    extraction_running = job_active(extraction_job)
+    extraction_cancelling = extraction_running and extraction_job["status"] == CANCELLING
+
+    # Número de hilos y tasa inicial (req/s) para la extracción concurrente
+    with st.expander("⚙️ Opciones de extracción"):
+        col_opt1, col_opt2 = st.columns(2)
+        extraction_workers = col_opt1.number_input(
+            "Hilos en paralelo", min_value=1, max_value=16,
+            value=int(get_setting("ML_EXTRACTION_WORKERS", "extraction_workers", 4)), step=1
+        )
+        extraction_rate_limit = col_opt2.number_input(
+            "Peticiones por segundo", min_value=1.0, max_value=50.0,
+            value=float(get_setting("ML_RATE_LIMIT", "rate_limit", 10.0)), step=1.0
+        )
+        extraction_full = st.checkbox(
+            "Forzar extracción completa",
+            value=False,
+            help="Por defecto solo se descargan las publicaciones nuevas o modificadas desde el último inventario del historial."
+        )
+        extraction_resume = st.checkbox(
+            "Reanudar extracción interrumpida",
+            value=True,
+            help="Si una extracción anterior se detuvo o se reinició el servidor, continúa desde su último avance guardado."
+        )
 
-            job_state["status"] = "done"
+    # Avance guardado de una extracción que no terminó (no es un inventario del historial)
+    extraction_checkpoint = None if extraction_running else ExtractionCheckpoint().status()
+    if extraction_checkpoint is not None:
+        st.info(
+            f"Hay una extracción interrumpida del {extraction_checkpoint['creado']} con "
+            f"{extraction_checkpoint['procesadas']}/{extraction_checkpoint['total']} publicaciones descargadas. "
+            + ("Se reanudará al extraer." if extraction_resume else "Se descartará al extraer.")
+        )
 
     col_btn1, col_btn2 = st.columns([5, 1])
     with col_btn1:
-        if st.session_state.extraction_job["status"] == "running":
-            st.button("🔄 Extrayendo...", use_container_width=True, type="primary", disabled=True)
+        if extraction_running:
+            st.button(
+                "⏳ Cancelando..." if extraction_cancelling else "🔄 Extrayendo...",
+                use_container_width=True, type="primary", disabled=True
+            )
         else:
             if st.button("🔄 Extraer Inventario de Mercado Libre", use_container_width=True, type="primary"):
-                st.session_state.extraction_job = {"status": "running", "progress": 0, "text": "Iniciando..."}
-                job_thread = threading.Thread(target=run_extraction_job, args=(access_token, st.session_state.extraction_job))
-                job_thread.start()
-                st.rerun()
+                _, creado = job_registry.start(
+                    EXTRACTION_JOB, run_extraction_job,
+                    ml_client, inventory_store, extraction_workers, extraction_rate_limit, not extraction_full,
+                    extraction_resume
+                )
+                if creado:
+                    st.rerun()
+                st.info("Ya hay una extracción en curso; se muestra su progreso.")
 
     with col_btn2:
-        if st.session_state.extraction_job["status"] == "running":
+        if extraction_running and not extraction_cancelling:
             if st.button("⏹️ Stop", use_container_width=True, type="secondary"):
-                st.session_state.extraction_job["status"] = "cancelled"
+                job_registry.cancel(EXTRACTION_JOB)
                 st.rerun()
         else:
             st.button("⏹️ Stop", use_container_width=True, type="secondary", disabled=True)
 
-    if st.session_state.extraction_job["status"] == "running":
-        progress = st.session_state.extraction_job.get("progress", 0)
-        text = st.session_state.extraction_job.get("text", "")
-        st.progress(progress, text=text)
-        
-        # Mostrar logs de debugging en tiempo real
-        if os.path.exists("app.log"):
-            with st.expander("📋 Ver logs de debugging en tiempo real", expanded=False):
-                try:
-                    with open("app.log", "r") as f:
-                        # Leer las últimas 50 líneas del log
-                        lines = f.readlines()
-                        recent_lines = lines[-50:] if len(lines) > 50 else lines
-                        log_content = "".join(recent_lines)
-                        st.text_area("Logs recientes:", value=log_content, height=200, disabled=True)
-                except Exception:
-                    st.text("No se pueden cargar los logs en este momento")
-        
-        time.sleep(1)
-        st.rerun()
-    
-    if st.session_state.extraction_job["status"] == "done":
-        st.success("¡Inventario extraído!")
-        
-        # Mostrar alerta de publicaciones sin SKU
-        if st.session_state.extraction_job.get("sin_sku", False):
-            sin_sku_count = st.session_state.extraction_job.get("sin_sku_count", 0)
-            sin_sku_items = st.session_state.extraction_job.get("sin_sku_items", [])
-            st.warning(f"⚠️ Se encontraron {sin_sku_count} variaciones sin SKU en {len(sin_sku_items)} publicaciones.")
-            if st.session_state.extraction_job.get("sin_sku_reporte"):
-                with open(st.session_state.extraction_job["sin_sku_reporte"], "rb") as f:
-                    st.download_button(
-                        "Descargar reporte de publicaciones sin SKU",
-                        f.read(),
-                        file_name=os.path.basename(st.session_state.extraction_job["sin_sku_reporte"])
-                    )
-            with st.expander("Ver publicaciones sin SKU"):
-                for item in sin_sku_items:
-                    st.markdown(f"**{item['item_id']}**: {item['título']}")
-                st.markdown("""
-                **Importante:** Las publicaciones sin SKU no podrán ser actualizadas automáticamente.
-                Te recomendamos agregar SKUs a todas tus publicaciones en Mercado Libre.
-                """)
-        
-        st.session_state.extraction_job = {"status": "idle"}
-
-    if st.session_state.extraction_job["status"] == "cancelled":
-        st.warning("⏹️ Extracción cancelada por el usuario.")
-        st.session_state.extraction_job = {"status": "idle"}
+    @st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+    def extraction_progress():
+        """Progreso y logs de la extracción; se actualiza solo este fragmento, no toda la página."""
+        fragment_started = run_stats.start("fragmento_progreso")
+        job = job_registry.get(EXTRACTION_JOB)
+        if not job_active(job) or (job["status"] == CANCELLING) != extraction_cancelling:
+            # Terminó o se está cancelando: una ejecución completa para actualizar los botones
+            st.rerun()
+        if job["status"] == CANCELLING:
+            st.progress(job.get("progress", 0), text="Cancelando: guardando el avance para poder reanudarla...")
+        else:
+            st.progress(job.get("progress", 0), text=f"{job.get('text', '')} (iniciada {job['started_at']})")
+
+        # Mostrar logs de debugging en tiempo real (solo se leen las líneas nuevas del archivo)
+        with st.expander("📋 Ver logs de debugging en tiempo real", expanded=False):
+            solo_extraccion = st.checkbox("Solo esta extracción", value=True)
+            log_tail = get_log_tail(current_log_file())
+            log_tail.poll()
+            job_id = job.get("id") if solo_extraccion else None
+            st.code("\n".join(log_tail.lines(50, job_id)) or "Sin registros todavía.", language=None)
+        run_stats.finish("fragmento_progreso", fragment_started)
+
+    if extraction_running:
+        extraction_progress()
+    elif extraction_job is not None and extraction_job["id"] != st.session_state.extraction_seen_job:
+        # Resultado nuevo publicado por el registro: se muestra una vez en cada sesión
+        st.session_state.extraction_seen_job = extraction_job["id"]
+        if extraction_job["status"] == "done":
+            resultado = extraction_job["result"]
+            st.session_state.ml_snapshot_id = resultado["snapshot_id"]
+            st.session_state.ml_inventory_fecha = resultado["fecha"]
+            st.success("¡Inventario extraído!")
+            if resultado.get("reanudada"):
+                st.info(f"Se reanudó una extracción interrumpida: {resultado['reanudada']} publicaciones ya estaban descargadas.")
+            if resultado.get("omitidas"):
+                st.info(f"Extracción incremental: {resultado['omitidas']} publicaciones sin cambios se tomaron del inventario anterior.")
+
+            # Avisar si el listado de la API quedó incompleto
+            for status, listado in resultado.get("listado", {}).items():
+                if listado["total"] is not None and listado["obtenidas"] < listado["total"]:
+                    st.warning(f"⚠️ Publicaciones con status {status}: la API reporta {listado['total']} pero solo se obtuvieron {listado['obtenidas']}.")
         
-    if st.session_state.extraction_job["status"] == "error":
-        st.error(st.session_state.extraction_job["message"])
-        st.session_state.extraction_job = {"status": "idle"}
-
-    if st.session_state.ml_inventory is not None:
+            # Mostrar alerta de publicaciones sin SKU
+            if resultado.get("sin_sku", False):
+                sin_sku_count = resultado.get("sin_sku_count", 0)
+                sin_sku_items = resultado.get("sin_sku_items", [])
+                st.warning(f"⚠️ Se encontraron {sin_sku_count} variaciones sin SKU en {len(sin_sku_items)} publicaciones.")
+                if resultado.get("sin_sku_reporte"):
+                    with open(resultado["sin_sku_reporte"], "rb") as f:
+                        st.download_button(
+                            "Descargar reporte de publicaciones sin SKU",
+                            f.read(),
+                            file_name=os.path.basename(resultado["sin_sku_reporte"])
+                        )
+                with st.expander("Ver publicaciones sin SKU"):
+                    for item in sin_sku_items:
+                        st.markdown(f"**{item['item_id']}**: {item['título']}")
+                    st.markdown("""
+                    **Importante:** Las publicaciones sin SKU no podrán ser actualizadas automáticamente.
+                    Te recomendamos agregar SKUs a todas tus publicaciones en Mercado Libre.
+                    """)
+
+            if resultado.get("sku_estrategias"):
+                with st.expander("🔎 Origen de los SKU"):
+                    st.dataframe(pd.DataFrame(resultado["sku_estrategias"]), use_container_width=True, hide_index=True)
+        elif extraction_job["status"] == "cancelled":
+            st.warning("⏹️ Extracción cancelada. El avance quedó guardado y se puede reanudar; no se guardó ningún inventario.")
+        elif extraction_job["status"] == "error":
+            st.error(extraction_job.get("message", "Error desconocido en la extracción."))
+
+    ml_inventory = None
+    if st.session_state.ml_snapshot_id is not None:
+        ml_inventory = get_ml_snapshot(st.session_state.ml_snapshot_id)
         st.success(f"Inventario local disponible. Última extracción: {st.session_state.ml_inventory_fecha}")
         with st.expander("Ver inventario Mercado Libre"):
-            st.dataframe(st.session_state.ml_inventory, use_container_width=True)
+            st.dataframe(ml_inventory, use_container_width=True)
         
-    proveedor_file = st.file_uploader("Sube el inventario del proveedor", type=["xlsx"])
+    api_stats = ml_client.get_stats()
+    if api_stats:
+        with st.expander("📈 Estadísticas de la API de Mercado Libre"):
+            st.dataframe(pd.DataFrame(api_stats), use_container_width=True, hide_index=True)
+
+    with st.expander("⏱️ Ejecuciones de la página"):
+        st.caption("Ejecuciones de todas las pestañas abiertas desde el último reinicio de los contadores.")
+        st.dataframe(pd.DataFrame(run_stats.snapshot()), use_container_width=True, hide_index=True)
+        if st.button("Reiniciar contadores"):
+            run_stats.reset()
+            st.rerun()
+
+    proveedor_file = st.file_uploader("Sube el inventario del proveedor", type=["xlsx", "csv", "tsv", "txt"])
     
     # Botón para procesar el inventario
     procesar_btn = False
-    if st.session_state.ml_inventory is not None and proveedor_file is not None:
+    if ml_inventory is not None and proveedor_file is not None:
         procesar_btn = st.button("📊 Procesar Inventario", use_container_width=True, type="primary")
 
 
     if procesar_btn:
             try:
-                # Leer y validar el archivo del proveedor
-                df_prov = pd.read_excel(proveedor_file)
-                df_prov.columns = [str(c).strip().upper() for c in df_prov.columns]
-                
-                # Verificar que tenga las columnas necesarias
-                if not {"CLAVE_ARTICULO", "EXISTENCIAS"}.issubset(df_prov.columns):
-                    st.error("El archivo debe tener las columnas CLAVE_ARTICULO y EXISTENCIAS.")
-                    logger.error("Archivo de proveedor sin columnas requeridas")
-                    st.stop()
-                
-                # Guardar archivo en historial
-                history_dir = "inventario_proveedor_historial"
-                manage_file_history(history_dir, ".xlsx")
-                filename = f"proveedor_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                file_path = os.path.join(history_dir, filename)
-                with open(file_path, "wb") as f:
-                    f.write(proveedor_file.getbuffer())
-                logger.info(f"Archivo de proveedor guardado en {file_path}")
-
-                # Filtrar datos válidos
-                df_prov_filtrado = df_prov[
-                    df_prov["CLAVE_ARTICULO"].apply(lambda x: isinstance(x, str) and x.strip() != "") &
-                    df_prov["EXISTENCIAS"].apply(lambda x: isinstance(x, (int, float)))
-                ].copy()
-                
-                # Crear diccionario de inventario y aplicar a inventario ML
-                inventario_dict = dict(zip(df_prov_filtrado["CLAVE_ARTICULO"], df_prov_filtrado["EXISTENCIAS"]))
-                df_ml = st.session_state.ml_inventory.copy()
-                
-                # Mapear stock nuevo y aplicar regla de seguridad (stock ≤ 3 → stock = 0)
-                df_ml["stock_nuevo"] = df_ml["sku"].map(inventario_dict).fillna(0).astype(int)
-                df_ml["stock_nuevo"] = df_ml["stock_nuevo"].apply(lambda x: 0 if x <= 3 else x)
-                
-                # Identificar cambios
-                df_ml["cambio"] = df_ml["stock"].astype(int) != df_ml["stock_nuevo"].astype(int)
-                st.session_state.df_actualizar = df_ml[df_ml["cambio"]].copy()
-                st.session_state.df_ml = df_ml.copy()
-                
-                logger.info(f"Procesamiento completado: {len(st.session_state.df_actualizar)} variantes con cambios")
+                # Guardar el archivo en el historial (copia en bloques) y leerlo fila por fila
+                # (solo CLAVE_ARTICULO y EXISTENCIAS)
+                inventario_dict, rechazos, resumen, file_path = import_provider_file(proveedor_file, proveedor_file.name)
+                st.session_state.proveedor_rechazos = (rechazos, resumen)
+
+                # Registrar el inventario del proveedor y aplicarlo al inventario ML
+                inventory_store.save_provider_stock(inventario_dict, source=file_path)
+
+                # Mapear stock nuevo, aplicar regla de seguridad (stock ≤ 3 → stock = 0) e identificar cambios
+                df_ml = apply_provider_stock(ml_inventory, inventario_dict)
+                # La sesión guarda solo las publicaciones con cambios (con todas sus variantes,
+                # que la sincronización necesita); el inventario completo sigue compartido
+                st.session_state.df_sync = changed_listings(df_ml)
+                st.session_state.sync_total_variantes = len(df_ml)
+                del df_ml
+
+                logger.info(f"Procesamiento completado: {int(st.session_state.df_sync['cambio'].sum())} variantes con cambios")
                 
+            except ProviderFileError as e:
+                st.error(str(e))
+                logger.error(f"Archivo de proveedor inválido: {str(e)}")
             except Exception as e:
                 st.error(f"Error al procesar el archivo: {str(e)}")
                 logger.error(f"Error en procesamiento de inventario: {str(e)}")
 
-    if "df_actualizar" in st.session_state:
+    if "df_sync" in st.session_state:
+        df_sync = st.session_state.df_sync
+        df_actualizar = df_sync[df_sync["cambio"]]
         st.divider()
         st.header("2. Vista previa de cambios a aplicar")
         st.markdown("<b>Solo se modifican existencias. Nunca se elimina ningún SKU/variante/publicación.</b>", unsafe_allow_html=True)
 
+        rechazos, resumen = st.session_state.get("proveedor_rechazos", ([], {}))
+        if resumen.get("rechazadas"):
+            st.warning(f"Se ignoraron {resumen['rechazadas']} de {resumen['filas']} filas del archivo del proveedor.", icon="⚠️")
+            with st.expander("Ver filas rechazadas"):
+                if len(rechazos) < resumen["rechazadas"]:
+                    st.caption(f"Se muestran las primeras {len(rechazos)} filas rechazadas.")
+                st.dataframe(pd.DataFrame(rechazos).astype(str), use_container_width=True, hide_index=True)
+
         col1, col2, col3 = st.columns(3)
-        col1.metric("Variaciones a Actualizar", f"{len(st.session_state.df_actualizar)}")
-        stock_total_nuevo = st.session_state.df_ml.groupby('item_id')['stock_nuevo'].sum()
-        items_a_pausar = stock_total_nuevo[stock_total_nuevo == 0].count()
+        col1.metric("Variaciones a Actualizar", f"{len(df_actualizar)}")
+        # Mismo criterio que build_sync_plan: quedan en 0 y antes tenían stock
+        totales = df_sync.groupby("item_id", observed=True)[["stock", "stock_nuevo"]].sum()
+        items_a_pausar = int(((totales["stock_nuevo"] == 0) & (totales["stock"] > 0)).sum())
         col2.metric("Publicaciones a Pausar", f"{items_a_pausar}")
-        col3.metric("Sin Cambio", f"{len(st.session_state.df_ml) - len(st.session_state.df_actualizar)}")
+        col3.metric("Sin Cambio", f"{st.session_state.sync_total_variantes - len(df_actualizar)}")
 
-        st.dataframe(st.session_state.df_actualizar[["item_id", "título", "sku", "stock", "stock_nuevo"]], use_container_width=True, hide_index=True)
+        st.dataframe(df_actualizar[["item_id", "título", "sku", "stock", "stock_nuevo"]], use_container_width=True, hide_index=True)
         
         st.divider()
         st.warning("Al ejecutar, la app actualizará SOLO el inventario de todas las variantes, sin eliminar ninguna. Si una publicación queda en stock 0, se pausa. Revisa bien antes de continuar.", icon="⚠️")
         if st.button("🚀 Ejecutar sincronización", type="primary", use_container_width=True):
-            with st.spinner("Actualizando Mercado Libre..."):
-                try:
-                    log = []
-                    errores_tipo = set()
-                    exito_count = 0
-                    error_count = 0
-                    
-                    # Actualizar cada publicación con cambios
-                    logger.info(f"Iniciando sincronización de {len(st.session_state.df_actualizar['item_id'].unique())} publicaciones")
-                    for item_id in st.session_state.df_actualizar['item_id'].unique():
-                        # Obtener TODAS las variantes de la publicación (no solo las que cambian)
-                        # Esto es CRÍTICO para evitar que Mercado Libre elimine variantes por omisión
-                        all_variations_item = st.session_state.df_ml[st.session_state.df_ml['item_id'] == item_id].copy()
-                        has_variations = not pd.isna(all_variations_item['variación_id'].iloc[0])
-                        
-                        # Preparar payload según si tiene variaciones o no
-                        if has_variations:
-                            # IMPORTANTE: Incluir TODAS las variantes en el payload
-                            variations_payload = [{"id": int(row['variación_id']), "available_quantity": int(row['stock_nuevo'])} 
-                                                for _, row in all_variations_item.iterrows()]
-                            payload = {"variations": variations_payload}
-                            logger.info(f"Actualizando {item_id} con {len(variations_payload)} variantes")
-                        else:
-                            payload = {"available_quantity": int(all_variations_item['stock_nuevo'].iloc[0])}
-                            logger.info(f"Actualizando {item_id} sin variantes")
-                        
-                        # Actualizar en Mercado Libre
-                        update_result = update_item_stock_safe(item_id, payload, access_token)
-                        if update_result["success"]:
-                            exito_count += len(all_variations_item)
-                            log.append(f"✔️ {item_id}: Actualizado correctamente ({len(all_variations_item)} variantes/items).")
-                        else:
-                            error_count += len(all_variations_item)
-                            error_msg = update_result.get("error", "Error desconocido")
-                            details = update_result.get("details", "")
-                            full_error = f"{error_msg} - {details}" if details else error_msg
-                            log.append(f"❌ {item_id}: Error en actualización. Causa: {full_error}")
-                            errores_tipo.add(error_msg)
-                    
-                    # Pausar publicaciones con stock 0
-                    stock_total_nuevo = st.session_state.df_ml.groupby('item_id')['stock_nuevo'].sum()
-                    items_a_pausar_df = stock_total_nuevo[stock_total_nuevo == 0]
-                    logger.info(f"Pausando {len(items_a_pausar_df)} publicaciones con stock 0")
-                    
-                    for item_id_pausar in items_a_pausar_df.index:
-                        item_original = st.session_state.df_ml[st.session_state.df_ml['item_id'] == item_id_pausar]
-                        if not item_original.empty and item_original['stock'].sum() > 0:
-                            pause_result = pause_item(item_id_pausar, access_token)
-                            if pause_result["success"]:
-                                log.append(f"⏸️ {item_id_pausar}: Publicación pausada correctamente.")
-                            else:
-                                error_msg_pause = pause_result.get("error", "Error desconocido")
-                                log.append(f"❌ {item_id_pausar}: Error al pausar. Causa: {error_msg_pause}")
-                                errores_tipo.add(f"Error al pausar: {error_msg_pause}")
-                    
-                    # Guardar log
-                    log_filename = f"log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                    log_dir = "logs"
-                    if not os.path.exists(log_dir):
-                        os.makedirs(log_dir)
-                    with open(os.path.join(log_dir, log_filename), "w") as f:
-                        f.write("\n".join(log))
-                    
-                    # Guardar resultado en session_state
-                    st.session_state.resultado = {
-                        "log": log, 
-                        "errores": list(errores_tipo), 
-                        "exito": exito_count, 
-                        "error": error_count, 
-                        "log_file": log_filename
-                    }
-                    
-                    logger.info(f"Sincronización completada: {exito_count} éxitos, {error_count} errores")
-                    st.success("¡Proceso terminado! Consulta el resumen abajo.")
-                    
-                    # Limpiar datos temporales
-                    del st.session_state.df_actualizar
-                    del st.session_state.df_ml
-                    
-                except Exception as e:
-                    st.error(f"Error durante la sincronización: {str(e)}")
-                    logger.error(f"Error no controlado durante sincronización: {str(e)}")
+            sync_progress = st.progress(0.0, text="Actualizando Mercado Libre...")
+
+            def update_sync_progress(hechas, total, texto):
+                sync_progress.progress(hechas / total if total else 1.0, text=texto)
+
+            try:
+                # Los PUT se envían en paralelo; el log y los conteos salen en orden determinista
+                st.session_state.resultado = sync_inventory(
+                    ml_client,
+                    df_sync,
+                    df_actualizar,
+                    workers=int(get_setting("ML_SYNC_WORKERS", "sync_workers", 4)),
+                    progress_callback=update_sync_progress
+                )
+                st.success("¡Proceso terminado! Consulta el resumen abajo.")
+
+                # Limpiar datos temporales
+                del st.session_state.df_sync
+
+            except Exception as e:
+                st.error(f"Error durante la sincronización: {str(e)}")
+                logger.error(f"Error no controlado durante sincronización: {str(e)}")
 
     if "resultado" in st.session_state:
         res = st.session_state.resultado
-        colA, colB = st.columns(2)
+        colA, colB, colC = st.columns(3)
         colA.metric("Actualizaciones exitosas", res['exito'])
         colB.metric("Errores", res['error'])
+        colC.metric("Peticiones de escritura", res['escrituras'])
         if res['errores']:
             st.subheader("Resumen de errores:")
             for err in res['errores']:
@@ -927,27 +684,52 @@ elif menu == "Calculadora de Precios":
     with col4:
         comision_ml_porcentaje = st.number_input("Comisión ML (%)", min_value=0.0, value=15.0, step=0.5, format="%.2f")
     if master_file:
-        df_master = pd.read_excel(master_file)
-        df_master.columns = [str(c).strip().upper() for c in df_master.columns]
+        master_data = master_file.getvalue()
+        master_hash = hashlib.sha256(master_data).hexdigest()
+        df_master = load_master_catalog(master_hash, master_data)
         if "PRECIO MAYOREO" in df_master.columns:
-            def calcular_precio_venta(costo):
-                if pd.isna(costo) or not isinstance(costo, (int, float)) or costo <= 0:
-                    return np.nan
-                utilidad_dec = utilidad_deseada / 100.0
-                iva_dec = iva_porcentaje / 100.0
-                comision_ml_dec = comision_ml_porcentaje / 100.0
-                precio_sugerido = (costo * (1 + iva_dec + utilidad_dec) + costo_envio_promedio) / (1 - comision_ml_dec)
-                return np.ceil(precio_sugerido) if precio_sugerido >= 299.00 else 299.00
-            df_master['PRECIO VENTA SUGERIDO'] = df_master['PRECIO MAYOREO'].apply(calcular_precio_venta)
+            df_master = price_master_catalog(
+                master_hash, utilidad_deseada, costo_envio_promedio, iva_porcentaje, comision_ml_porcentaje, master_data
+            )
             st.markdown("---")
             st.subheader("Catálogo con Precios Calculados")
             columnas_a_mostrar = ["CLAVE_ARTICULO", "DESCRIPCION DEL ARTICULO", "PRECIO MAYOREO", "PRECIO VENTA SUGERIDO"]
             columnas_existentes = [col for col in columnas_a_mostrar if col in df_master.columns]
             st.dataframe(df_master[columnas_existentes], use_container_width=True)
-            output_precios = io.BytesIO()
-            with pd.ExcelWriter(output_precios, engine='openpyxl') as writer:
-                df_master.to_excel(writer, index=False)
-            st.download_button("Descargar Catálogo con Precios Calculados", data=output_precios.getvalue(), file_name="catalogo_precios_calculados.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            st.download_button(
+                "Descargar Catálogo con Precios Calculados",
+                data=lambda: master_catalog_xlsx(
+                    master_hash, utilidad_deseada, costo_envio_promedio, iva_porcentaje, comision_ml_porcentaje, master_data
+                ),
+                file_name="catalogo_precios_calculados.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+
+            st.markdown("---")
+            st.subheader("Comparar Escenarios")
+            st.caption("Calcula todas las combinaciones de utilidad, comisión y envío para todo el catálogo (valores separados por comas). El IVA es el de arriba.")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                utilidades = parse_number_list(st.text_input("Márgenes de utilidad (%)", value="15, 20, 25"))
+            with col2:
+                comisiones = parse_number_list(st.text_input("Comisiones ML (%)", value="13, 15, 17.5"))
+            with col3:
+                envios = parse_number_list(st.text_input("Costos de envío ($)", value="90, 120"))
+            if not (utilidades and comisiones and envios):
+                st.info("Indica al menos un valor en cada campo para calcular los escenarios.")
+            elif any(c >= 100 for c in comisiones):
+                st.error("La comisión de Mercado Libre debe ser menor a 100%.")
+            else:
+                df_resumen, df_escenarios = price_scenarios(master_hash, utilidades, comisiones, envios, iva_porcentaje, master_data)
+                st.dataframe(df_resumen, use_container_width=True, hide_index=True)
+                with st.expander(f"Ver catálogo con los {len(df_resumen)} escenarios"):
+                    st.dataframe(df_escenarios, use_container_width=True)
+                st.download_button(
+                    "Descargar Escenarios (CSV)",
+                    data=lambda: df_escenarios.to_csv(index=False).encode("utf-8-sig"),
+                    file_name="catalogo_escenarios.csv",
+                    mime="text/csv"
+                )
         else:
             st.error("El archivo maestro no contiene la columna 'PRECIO MAYOREO'. Por favor, verifica el archivo.")
 
@@ -955,37 +737,90 @@ elif menu == "Calculadora de Precios":
 elif menu == "Auditor de Variaciones":
     st.markdown(
         "<h1 style='color:#F39200;'>🔍 Auditor de Variaciones Perdidas</h1>"
-        "<div style='color:#888;margin-bottom:20px;'>Compara dos inventarios y detecta variaciones o SKUs que se hayan perdido.</div>",
+        "<div style='color:#888;margin-bottom:20px;'>Compara inventarios y detecta variaciones perdidas, agregadas o con cambios de SKU o stock.</div>",
         unsafe_allow_html=True
     )
-    col1, col2 = st.columns(2)
-    with col1:
-        respaldo_file = st.file_uploader("1. Sube tu inventario de RESPALDO (archivo bueno)", type=["xlsx"], key="respaldo_uploader")
-    with col2:
-        actual_file = st.file_uploader("2. Sube tu inventario ACTUAL (tras el problema)", type=["xlsx"], key="actual_uploader")
-    if respaldo_file and actual_file:
-        df_respaldo = pd.read_excel(respaldo_file)
-        df_actual = pd.read_excel(actual_file)
-        counts_respaldo = df_respaldo.groupby('item_id').size()
-        counts_actual = df_actual.groupby('item_id').size()
-        df_compare = pd.DataFrame({'respaldo': counts_respaldo, 'actual': counts_actual}).fillna(0)
-        df_compare['diferencia'] = df_compare['respaldo'] - df_compare['actual']
-        items_afectados = df_compare[df_compare['diferencia'] > 0].index
-        if not items_afectados.empty:
-            st.subheader("Publicaciones con Variaciones Faltantes")
-            df_merged = df_respaldo.merge(df_actual, on=['item_id', 'variación_id'], how='outer', indicator=True)
-            df_perdidas = df_merged[df_merged['_merge'] == 'left_only']
-            df_reporte = df_perdidas[df_perdidas['item_id'].isin(items_afectados)]
-            columnas_reporte = ['item_id', 'título_x', 'sku_x', 'variación_id']
-            df_reporte = df_reporte[columnas_reporte].rename(columns={'título_x': 'título', 'sku_x': 'sku'})
-            st.dataframe(df_reporte, use_container_width=True)
-            st.success(f"Se encontraron {len(df_reporte)} variaciones faltantes en {len(items_afectados)} publicaciones.")
+    inventory_store = get_inventory_store()
+    comparaciones = None
+    origen = st.radio("Inventarios a comparar", ["Historial", "Subir archivos"], horizontal=True)
+    if origen == "Historial":
+        df_snapshots = inventory_store.list_snapshots("ml")
+        if len(df_snapshots) < 2:
+            st.info("Se necesitan al menos dos inventarios en el historial para compararlos.")
+        else:
+            opciones = df_snapshots["id"].tolist()
+            etiquetas = {
+                row.id: f"{row.created_at} — {os.path.basename(row.source) if row.source else row.id} ({row.row_count} variantes)"
+                for row in df_snapshots.itertuples()
+            }
+            seleccion = st.multiselect(
+                "Inventarios (se comparan en orden cronológico, cada uno contra el siguiente)",
+                opciones, default=opciones[:2][::-1], format_func=etiquetas.get
+            )
+            if len(seleccion) < 2:
+                st.info("Selecciona al menos dos inventarios.")
+            else:
+                # list_snapshots viene del más reciente al más antiguo
+                seleccion = sorted(seleccion, key=opciones.index, reverse=True)
+                with st.spinner("Comparando inventarios..."):
+                    comparaciones = diff_store_snapshots(tuple(seleccion))
+                etiquetas_cortas = {row.id: row.created_at for row in df_snapshots.itertuples()}
+                for comparacion in comparaciones:
+                    comparacion["desde"] = etiquetas_cortas[comparacion["desde"]]
+                    comparacion["hasta"] = etiquetas_cortas[comparacion["hasta"]]
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            respaldo_file = st.file_uploader("1. Sube tu inventario de RESPALDO (archivo bueno)", type=["xlsx"], key="respaldo_uploader")
+        with col2:
+            actual_file = st.file_uploader("2. Sube tu inventario ACTUAL (tras el problema)", type=["xlsx"], key="actual_uploader")
+        if respaldo_file and actual_file:
+            comparaciones = diff_snapshots(
+                [dataframe_source(pd.read_excel(respaldo_file)), dataframe_source(pd.read_excel(actual_file))],
+                labels=[respaldo_file.name, actual_file.name]
+            )
+    for i, comparacion in enumerate(comparaciones or []):
+        st.subheader(f"{comparacion['desde']} → {comparacion['hasta']}")
+        resumen = comparacion["resumen"]
+        cambios = comparacion["cambios"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Variaciones Eliminadas", resumen["eliminada"])
+        col2.metric("Variaciones Agregadas", resumen["agregada"])
+        col3.metric("SKU Cambiado", resumen["sku_cambiado"])
+        col4.metric("Stock Cambiado", resumen["stock_cambiado"])
+        if cambios.empty:
+            st.success("✅ ¡No se encontraron diferencias en las variaciones entre los dos inventarios!")
+            continue
+        if resumen["eliminada"]:
+            eliminadas = cambios[cambios["tipo"] == "eliminada"]
+            st.warning(f"Se encontraron {len(eliminadas)} variaciones faltantes en {eliminadas['item_id'].nunique()} publicaciones.", icon="⚠️")
+        tipo = st.selectbox(
+            "Ver cambios", CHANGE_TYPES, key=f"auditor_tipo_{i}",
+            format_func=lambda t: f"{t.replace('_', ' ').capitalize()} ({resumen[t]})"
+        )
+        st.dataframe(cambios[cambios["tipo"] == tipo], use_container_width=True, hide_index=True)
+
+        def reporte_xlsx(cambios=cambios):
             output_reporte = io.BytesIO()
             with pd.ExcelWriter(output_reporte, engine='openpyxl') as writer:
-                df_reporte.to_excel(writer, index=False)
-            st.download_button("Descargar Reporte de Variaciones Faltantes", data=output_reporte.getvalue(), file_name="reporte_variaciones_faltantes.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                cambios.to_excel(writer, index=False)
+            return output_reporte.getvalue()
+
+        st.download_button(
+            "Descargar Reporte de Variaciones", data=reporte_xlsx, key=f"auditor_reporte_{i}",
+            file_name="reporte_variaciones.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+    st.divider()
+    st.subheader("Buscar un SKU en el historial")
+    sku_buscado = st.text_input("SKU", placeholder="Ej. SM1122N")
+    if sku_buscado.strip():
+        df_sku = inventory_store.variations_for_sku(sku_buscado.strip(), last_n=30)
+        if df_sku.empty:
+            st.info("El SKU no aparece en los últimos 30 inventarios.")
         else:
-            st.success("✅ ¡No se encontraron diferencias en el número de variaciones entre los dos archivos!")
+            st.dataframe(df_sku, use_container_width=True, hide_index=True)
 
 # ---- SECTION 4: HISTORIAL ----
 elif menu == "Historial":
@@ -996,17 +831,23 @@ elif menu == "Historial":
     )
 
     st.subheader("Historial de Inventarios de Mercado Libre")
-    ml_history_dir = "inventario_ml_historial"
-    if os.path.exists(ml_history_dir):
-        ml_files = sorted(os.listdir(ml_history_dir), reverse=True)
-        for f in ml_files:
-            with open(os.path.join(ml_history_dir, f), "rb") as file:
-                st.download_button(f, file.read(), file_name=f)
+    migrate_xlsx_snapshots()
+    ml_files = list_ml_snapshots()
+    if ml_files:
+        # El xlsx se genera solo para el inventario seleccionado
+        ml_file = st.selectbox("Inventario", ml_files, format_func=os.path.basename)
+        xlsx_name = os.path.splitext(os.path.basename(ml_file))[0] + ".xlsx"
+        st.download_button(
+            f"Descargar {xlsx_name}",
+            get_snapshot_xlsx(ml_file, os.path.getmtime(ml_file)),
+            file_name=xlsx_name,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
     else:
         st.info("No hay historial de inventarios de Mercado Libre.")
 
     st.subheader("Historial de Inventarios del Proveedor")
-    prov_history_dir = "inventario_proveedor_historial"
+    prov_history_dir = PROVIDER_HISTORY_DIR
     if os.path.exists(prov_history_dir):
         prov_files = sorted(os.listdir(prov_history_dir), reverse=True)
         for f in prov_files:
@@ -1015,40 +856,52 @@ elif menu == "Historial":
     else:
         st.info("No hay historial de inventarios del proveedor.")
 
-def debug_item_structure(item_id, token):
-    """Función temporal para debuggear la estructura de un item específico."""
-    url = f"https://api.mercadolibre.com/items/{item_id}"
-    try:
-        resp = requests.get(url, headers=get_headers(token), timeout=10)
-        resp.raise_for_status()
-        item = resp.json()
-        
-        logger.info(f"\n=== DEBUG ITEM {item_id} ===")
-        logger.info(f"Título: {item.get('title', 'N/A')}")
-        logger.info(f"seller_custom_field: {item.get('seller_custom_field', 'N/A')}")
-        logger.info(f"seller_sku: {item.get('seller_sku', 'N/A')}")
-        
-        if "attributes" in item:
-            logger.info("Attributes:")
-            for attr in item["attributes"]:
-                attr_id = attr.get('id', 'NO_ID')
-                attr_value = attr.get('value_name', attr.get('value', 'NO_VALUE'))
-                logger.info(f"  - {attr_id}: {attr_value}")
-        
-        if "variations" in item and item["variations"]:
-            logger.info("Variations:")
-            for i, var in enumerate(item["variations"]):
-                logger.info(f"  Variation {i}:")
-                logger.info(f"    - id: {var.get('id', 'N/A')}")
-                logger.info(f"    - seller_custom_field: {var.get('seller_custom_field', 'N/A')}")
-                logger.info(f"    - seller_sku: {var.get('seller_sku', 'N/A')}")
-                if "attributes" in var:
-                    for attr in var["attributes"]:
-                        attr_id = attr.get('id', 'NO_ID')
-                        attr_value = attr.get('value_name', attr.get('value', 'NO_VALUE'))
-                        logger.info(f"    - {attr_id}: {attr_value}")
-        
-        return item
-    except Exception as e:
-        logger.error(f"Error debugging item {item_id}: {e}")
-        return None
+# ---- SECTION 5: MÉTRICAS ----
+elif menu == "Métricas":
+    st.markdown(
+        "<h1 style='color:#F39200;'>📊 Métricas</h1>"
+        "<div style='color:#888;margin-bottom:20px;'>Latencia, reintentos y límites de tasa de la API de Mercado Libre, y duración de cada fase de las extracciones y sincronizaciones de este servidor.</div>",
+        unsafe_allow_html=True
+    )
+    st.caption(f"Desde {METRICS.started_at}")
+
+    st.subheader("API de Mercado Libre por endpoint")
+    endpoint_rows = METRICS.endpoint_rows()
+    if endpoint_rows:
+        st.dataframe(pd.DataFrame(endpoint_rows), use_container_width=True, hide_index=True)
+        st.caption("Las latencias son estimaciones a partir del histograma. La espera por rate limit incluye las pausas globales tras un 429.")
+    else:
+        st.info("Todavía no hay peticiones registradas.")
+    cache_rows = METRICS.cache_rows()
+    if cache_rows:
+        st.dataframe(pd.DataFrame(cache_rows), use_container_width=True, hide_index=True)
+        st.caption("Caché de publicaciones: un acierto es un 304 de GET /items/{id}, la publicación no cambió y no se volvió a descargar.")
+
+    st.subheader("Fases de los trabajos")
+    phase_rows = METRICS.phase_rows()
+    if phase_rows:
+        df_phases = pd.DataFrame(phase_rows)
+        st.dataframe(df_phases, use_container_width=True, hide_index=True)
+        ultima = df_phases[df_phases["fase"] != "total"].pivot(index="fase", columns="trabajo", values="ultima_s")
+        st.bar_chart(ultima)
+    else:
+        st.info("Todavía no hay extracciones ni sincronizaciones registradas.")
+
+    col_m1, col_m2 = st.columns(2)
+    with col_m1:
+        st.download_button(
+            "Descargar métricas (Prometheus)",
+            data=METRICS.to_prometheus,
+            file_name="inventarios.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+    with col_m2:
+        if st.button("Reiniciar métricas", use_container_width=True):
+            METRICS.reset()
+            METRICS.export()
+            st.rerun()
+    if METRICS.export_path:
+        st.caption(f"Se exportan a `{METRICS.export_path}` al terminar cada extracción o sincronización.")
+
+run_stats.finish("script", script_started)
@@ -0,0 +1,222 @@
+"""Benchmark de rendimiento de la extracción y la sincronización contra la API simulada.
+
+Levanta benchmarks/ml_stub_server.py en otro proceso (para que no compita por el GIL con
+el cliente) y ejecuta extraction.run_extraction_job e inventory_sync.sync_inventory
+contra él con el MercadoLibreClient real. Por cada fase reporta publicaciones/s,
+peticiones/s, latencia p50/p99 medida en el cliente, errores HTTP y memoria máxima.
+
+Cada número de hilos se mide contra un servidor nuevo, así todas las corridas parten del
+mismo catálogo (la sincronización modifica el del servidor). La extracción escribe su
+historial y su base SQLite en un directorio temporal; no toca los archivos del proyecto.
+
+Uso:
+    python benchmarks/bench_ml_throughput.py
+    python benchmarks/bench_ml_throughput.py --items 5000 --hilos 1 4 8 --latencia-ms 50 --tasa-429 0.01
+    python benchmarks/bench_ml_throughput.py --json resultados.json --tracemalloc
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from extraction import run_extraction_job  # noqa: E402
+from inventory_store import InventoryStore  # noqa: E402
+from inventory_sync import apply_provider_stock, sync_inventory  # noqa: E402
+from ml_client import MercadoLibreClient  # noqa: E402
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml_stub_server.py")
+
+
+def start_stub(args):
+    """Arranca el servidor simulado en un puerto libre y devuelve (proceso, url_base)."""
+    command = [
+        sys.executable, STUB_SERVER, "--port", "0",
+        "--items", str(args.items), "--variaciones", str(args.variaciones),
+        "--latencia-ms", str(args.latencia_ms), "--jitter-ms", str(args.jitter_ms),
+        "--tasa-429", str(args.tasa_429), "--tasa-5xx", str(args.tasa_5xx),
+        "--retry-after", str(args.retry_after), "--seed", str(args.seed),
+    ]
+    if args.sin_put_combinado:
+        command.append("--sin-put-combinado")
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.kill()
+        raise RuntimeError("El servidor simulado no arrancó")
+    return process, base_url
+
+
+class LatencyRecorder:
+    """Envuelve session.request del cliente para guardar la duración de cada petición HTTP."""
+
+    def __init__(self, client):
+        self.lock = threading.Lock()
+        self.durations = []
+        self.statuses = []
+        original = client.session.request
+
+        def timed_request(*args, **kwargs):
+            start = time.perf_counter()
+            resp = None
+            try:
+                resp = original(*args, **kwargs)
+                return resp
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.durations.append(elapsed)
+                    self.statuses.append(resp.status_code if resp is not None else 0)
+
+        client.session.request = timed_request
+
+    def reset(self):
+        with self.lock:
+            self.durations = []
+            self.statuses = []
+
+    def summary(self):
+        with self.lock:
+            durations = np.array(self.durations)
+            statuses = np.array(self.statuses)
+        if not len(durations):
+            return {"peticiones": 0, "p50_ms": 0.0, "p99_ms": 0.0, "429": 0, "5xx": 0}
+        return {
+            "peticiones": len(durations),
+            "p50_ms": round(1000 * float(np.percentile(durations, 50)), 1),
+            "p99_ms": round(1000 * float(np.percentile(durations, 99)), 1),
+            "429": int((statuses == 429).sum()),
+            "5xx": int((statuses >= 500).sum()),
+        }
+
+
+def measure(phase, workers, func, recorder, use_tracemalloc):
+    """Ejecuta func() y devuelve (resultado, fila de métricas sin las unidades procesadas)."""
+    recorder.reset()
+    if use_tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    row = {"fase": phase, "hilos": workers, "segundos": round(elapsed, 2)}
+    row.update(recorder.summary())
+    row["peticiones_s"] = round(row["peticiones"] / elapsed, 1)
+    if use_tracemalloc:
+        row["pico_python_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    # ru_maxrss está en KB en Linux: es el máximo del proceso hasta ahora
+    row["rss_max_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result, row
+
+
+def run_workers(args, base_url, workers, work_dir):
+    client = MercadoLibreClient("stub-token", rate_limit=args.tasa, pool_size=max(16, 2 * workers), base_url=base_url,
+                                token_file=None)
+    recorder = LatencyRecorder(client)
+    store = InventoryStore(os.path.join(work_dir, f"bench_{workers}.db"))
+    rows = []
+
+    job_state = {"id": uuid.uuid4().hex[:8], "status": "running"}
+    resultado, row = measure(
+        "extracción", workers,
+        lambda: run_extraction_job(job_state, client, store, workers, args.tasa, incremental=False, resume=False),
+        recorder, args.tracemalloc
+    )
+    if not resultado or resultado.get("error"):
+        raise RuntimeError(f"La extracción no terminó: {resultado}")
+    df_ml = store.load_ml_snapshot(resultado["snapshot_id"])
+    row["publicaciones"] = int(df_ml["item_id"].nunique())
+    row["variaciones"] = len(df_ml)
+    row["publicaciones_s"] = round(row["publicaciones"] / row["segundos"], 1)
+    rows.append(row)
+
+    # Nuevo stock del proveedor para una fracción de los SKUs (el resto se conserva)
+    rng = np.random.default_rng(args.seed)
+    cambia = rng.random(len(df_ml)) < args.cambios
+    stock = np.where(cambia, rng.integers(0, 50, len(df_ml)), df_ml["stock"].to_numpy())
+    inventario = dict(zip(df_ml["sku"], stock))
+    df_ml = apply_provider_stock(df_ml, inventario)
+    df_actualizar = df_ml[df_ml["cambio"]]
+    sync_workers = args.sync_hilos or workers
+    client.limiter.configure(args.tasa)
+    resultado, row = measure(
+        "sincronización", sync_workers,
+        lambda: sync_inventory(client, df_ml, df_actualizar, workers=sync_workers),
+        recorder, args.tracemalloc
+    )
+    row["publicaciones"] = int(df_actualizar["item_id"].nunique())
+    row["variaciones"] = len(df_actualizar)
+    row["publicaciones_s"] = round(row["publicaciones"] / row["segundos"], 1) if row["segundos"] else 0.0
+    row["errores_sync"] = resultado["error"]
+    row["escrituras"] = resultado["escrituras"]
+    rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000, help="publicaciones del catálogo simulado")
+    parser.add_argument("--variaciones", type=int, default=3)
+    parser.add_argument("--latencia-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--tasa-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--sin-put-combinado", action="store_true",
+                        help="el servidor rechaza status junto con cantidades (la pausa va en un segundo PUT)")
+    parser.add_argument("--hilos", type=int, nargs="+", default=[1, 4, 8], help="hilos de extracción a medir")
+    parser.add_argument("--sync-hilos", type=int, help="hilos de sincronización (por defecto los mismos que la extracción)")
+    parser.add_argument("--tasa", type=float, default=200.0, help="peticiones por segundo iniciales del cliente")
+    parser.add_argument("--cambios", type=float, default=0.3, help="fracción de variaciones con stock nuevo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="medir el pico de memoria de Python (más lento; afecta las demás cifras)")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    rows = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_ml_") as work_dir:
+        for workers in args.hilos:
+            process, base_url = start_stub(args)
+            # run_extraction_job escribe el historial en rutas relativas
+            os.chdir(work_dir)
+            try:
+                rows.extend(run_workers(args, base_url, workers, work_dir))
+            finally:
+                os.chdir(cwd)
+                process.terminate()
+                process.wait()
+
+    columns = ["fase", "hilos", "publicaciones", "segundos", "publicaciones_s", "peticiones", "peticiones_s",
+               "p50_ms", "p99_ms", "429", "5xx", "escrituras", "rss_max_mb"]
+    if args.tracemalloc:
+        columns.append("pico_python_mb")
+    print(f"Servidor simulado: {args.items} publicaciones, latencia {args.latencia_ms}±{args.jitter_ms} ms, "
+          f"429 {args.tasa_429:.1%}, 5xx {args.tasa_5xx:.1%}")
+    widths = [max(len(c), 8) for c in columns]
+    print(" ".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows:
+        print(" ".join(f"{str(row.get(c, '-')):>{w}}" for c, w in zip(columns, widths)))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": rows}, f, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Benchmark del trabajo de servidor que generan las pestañas abiertas durante una extracción.
+
+Ejecuta app.py con streamlit.testing (AppTest) contra benchmarks/ml_stub_server.py,
+inicia una extracción y simula varias pestañas que refrescan el progreso cada
+PROGRESS_REFRESH_SECONDS, cada una en su hilo:
+
+- "script": cada refresco vuelve a ejecutar la página completa (el bucle anterior con
+  time.sleep + st.rerun).
+- "fragmento": cada refresco ejecuta solo el fragmento extraction_progress (st.fragment
+  con run_every).
+
+AppTest no dispara los fragmentos con run_every, así que el modo "fragmento" pide la
+reejecución del fragmento igual que lo hace el navegador (RerunData con fragment_id_queue).
+Los tiempos salen de los contadores de run_stats.RunStats que muestra la página: duración
+promedio de cada ejecución y milisegundos de servidor por segundo de reloj.
+
+Uso:
+    python benchmarks/bench_page_runs.py
+    python benchmarks/bench_page_runs.py --pestanas 1 4 8 --segundos 20
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import streamlit.testing.v1.app_test as app_test_module  # noqa: E402
+import streamlit.testing.v1.local_script_runner as local_runner_module  # noqa: E402
+from streamlit.components.v2.component_manager import BidiComponentManager  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.scriptrunner import RerunData  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1.local_script_runner import (  # noqa: E402
+    LocalScriptRunner,
+    parse_tree_from_messages,
+    require_widgets_deltas,
+)
+
+import run_stats  # noqa: E402
+
+APP = os.path.join(ROOT, "app.py")
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml_stub_server.py")
+FRAGMENT_KIND = "fragmento_progreso"
+
+# Fragmento a ejecutar en la próxima corrida de cada hilo (None: script completo)
+current_fragment = threading.local()
+
+
+class FragmentScriptRunner(LocalScriptRunner):
+    """LocalScriptRunner que puede reejecutar solo un fragmento, como el refresco automático."""
+
+    def run(self, widget_state=None, query_params=None, timeout=3, page_hash=""):
+        fragment_id = getattr(current_fragment, "id", None)
+        if fragment_id is None:
+            return super().run(widget_state, query_params, timeout, page_hash)
+        self.request_rerun(RerunData(
+            page_script_hash=page_hash, fragment_id_queue=[fragment_id],
+            is_fragment_scoped_rerun=True, is_auto_rerun=True,
+        ))
+        try:
+            if not self._script_thread:
+                self.start()
+            require_widgets_deltas(self, timeout)
+        finally:
+            self.join()
+        return parse_tree_from_messages(self.forward_msgs())
+
+
+app_test_module.LocalScriptRunner = FragmentScriptRunner
+
+
+class _TabRuntime(Runtime):
+    """AppTest fija y borra Runtime._instance en cada corrida; así no pisa a las demás pestañas."""
+
+
+# Igual que el servidor real: un solo runtime y el bytecode de la página compilado una vez
+# (cada AppTest compilaría app.py en cada corrida, y ast no es seguro entre hilos en 3.11)
+app_test_module.Runtime = _TabRuntime
+shared_script_cache = ScriptCache()
+app_test_module.ScriptCache = lambda: shared_script_cache
+local_runner_module.ScriptCache = lambda: shared_script_cache
+
+
+def install_shared_runtime():
+    """Runtime simulado (como el de AppTest) que comparten todas las pestañas."""
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    Runtime._instance = runtime
+
+# La página guarda su RunStats en st.cache_resource; se registra al crearlo para leerlo aquí
+stats_instances = []
+_run_stats_init = run_stats.RunStats.__init__
+
+
+def _register_run_stats(self):
+    _run_stats_init(self)
+    stats_instances.append(self)
+
+
+run_stats.RunStats.__init__ = _register_run_stats
+
+
+def start_stub(args):
+    """Arranca el servidor simulado en un puerto libre y devuelve (proceso, url_base)."""
+    command = [
+        sys.executable, STUB_SERVER, "--port", "0", "--items", str(args.items),
+        "--latencia-ms", str(args.latencia_ms),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.kill()
+        raise RuntimeError("El servidor simulado no arrancó")
+    return process, base_url
+
+
+def new_tab(base_url, args):
+    """Sesión ya autenticada de la página apuntando al servidor simulado."""
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["mercadolibre"] = {"access_token": "stub-token", "api_url": base_url, "rate_limit": args.tasa}
+    at.session_state["authenticated"] = True
+    at.session_state["user_name"] = "Benchmark"
+    at.session_state["user_email"] = "benchmark@example.com"
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"La página falló: {at.exception[0].value}")
+    return at
+
+
+def progress_fragment(at):
+    """Id del fragmento de progreso que registró la pestaña en su última ejecución completa."""
+    fragments = list(at._fragment_storage._fragments)
+    if len(fragments) != 1:
+        raise RuntimeError(f"Se esperaba un fragmento de progreso y hay {len(fragments)}")
+    return fragments[0]
+
+
+def refresh_loop(at, mode, interval, stop, errors):
+    """Refresca la pestaña cada `interval` segundos hasta que se pida detener."""
+    current_fragment.id = progress_fragment(at) if mode == "fragmento" else None
+    next_run = time.monotonic()
+    while not stop.is_set():
+        try:
+            at.run()
+        except Exception as e:
+            errors.append(e)
+            return
+        next_run += interval
+        stop.wait(max(0.0, next_run - time.monotonic()))
+
+
+def measure(tabs, mode, args):
+    """Mide args.segundos con todas las pestañas refrescando en el modo indicado."""
+    kind = "script" if mode == "script" else FRAGMENT_KIND
+    stats = stats_instances[0]
+    stop = threading.Event()
+    errors = []
+    threads = [
+        threading.Thread(target=refresh_loop, args=(at, mode, args.intervalo, stop, errors))
+        for at in tabs
+    ]
+    stats.reset()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.segundos)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError(f"Una pestaña falló: {errors[0]}")
+    row = next((r for r in stats.snapshot() if r["tipo"] == kind), None)
+    if row is None:
+        raise RuntimeError(f"No se registraron ejecuciones de tipo {kind}")
+    result = {"modo": mode, "pestanas": len(tabs)}
+    result.update({k: row[k] for k in ("ejecuciones", "por_segundo", "promedio_ms", "max_ms", "ms_por_segundo")})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pestanas", type=int, nargs="+", default=[1, 4, 8], help="pestañas abiertas a la vez")
+    parser.add_argument("--segundos", type=float, default=15.0, help="duración de cada medición")
+    parser.add_argument("--intervalo", type=float, default=1.0,
+                        help="segundos entre refrescos de cada pestaña (PROGRESS_REFRESH_SECONDS de app.py)")
+    parser.add_argument("--items", type=int, default=50000, help="publicaciones del catálogo simulado")
+    parser.add_argument("--latencia-ms", type=float, default=30.0)
+    parser.add_argument("--tasa", type=float, default=5.0,
+                        help="peticiones por segundo de la extracción (baja para que dure toda la medición)")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    install_shared_runtime()
+    rows = []
+    cwd = os.getcwd()
+    process, base_url = start_stub(args)
+    with tempfile.TemporaryDirectory(prefix="bench_pages_") as work_dir:
+        # La página escribe su base, el historial y los logs en rutas relativas
+        os.chdir(work_dir)
+        try:
+            tabs = [new_tab(base_url, args) for _ in range(max(args.pestanas))]
+            extract = next(b for b in tabs[0].button if b.label.startswith("🔄 Extraer"))
+            extract.click().run()
+            for tab in tabs[1:]:
+                # Las demás pestañas ven la extracción en curso y registran su fragmento de progreso
+                tab.run()
+            for count in args.pestanas:
+                for mode in ("script", "fragmento"):
+                    rows.append(measure(tabs[:count], mode, args))
+            stop = next(b for b in tabs[0].button if b.label.startswith("⏹️"))
+            stop.click().run()
+            # Esperar a que la extracción guarde su avance antes de borrar el directorio temporal
+            deadline = time.monotonic() + 60
+            while not any(b.label.startswith("🔄 Extraer") for b in tabs[0].button):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("La extracción no se detuvo")
+                time.sleep(args.intervalo)
+                tabs[0].run()
+        finally:
+            os.chdir(cwd)
+            process.terminate()
+            process.wait()
+
+    columns = ["modo", "pestanas", "ejecuciones", "por_segundo", "promedio_ms", "max_ms", "ms_por_segundo"]
+    print(f"Refresco cada {args.intervalo} s durante {args.segundos} s por medición")
+    widths = [max(len(c), 10) for c in columns]
+    print(" ".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows:
+        print(" ".join(f"{str(row[c]):>{w}}" for c, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    main()
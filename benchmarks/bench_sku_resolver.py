@@ -0,0 +1,178 @@
+"""Microbenchmark de la resolución de SKU (sku_resolver.resolve_sku).
+
+Compara el resolvedor con la versión anterior de extract_sku_from_item sobre items de
+Mercado Libre capturados (JSON de /items/{id}, la respuesta de un multiget
+/items?ids=... o un archivo JSONL con un item por línea) y verifica que ambos
+devuelvan el mismo SKU para cada item y variación. Sin --items usa un catálogo
+sintético que cubre todas las estrategias.
+
+Para capturar items reales basta guardar la respuesta de la API, por ejemplo:
+    curl -H "Authorization: Bearer $ML_ACCESS_TOKEN" \\
+        "https://api.mercadolibre.com/items?ids=MLM1,MLM2" > items.json
+
+Uso:
+    python benchmarks/bench_sku_resolver.py
+    python benchmarks/bench_sku_resolver.py --items items.json --repeat 20 --log-level DEBUG
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sku_resolver import SkuStats, resolve_sku  # noqa: E402
+
+logger = logging.getLogger("inventarios-app")
+
+
+def legacy_extract_sku(item_or_variation):
+    """Versión anterior de extract_sku_from_item (f-strings en cada acierto, listas en cada llamada)."""
+    item_id = item_or_variation.get("item_id", item_or_variation.get("id", "unknown"))
+    sku = item_or_variation.get("seller_custom_field", None)
+    if isinstance(sku, str) and sku.strip():
+        logger.debug(f"SKU encontrado en seller_custom_field para {item_id}: {sku.strip()}")
+        return sku.strip()
+    sku = item_or_variation.get("seller_sku", None)
+    if isinstance(sku, str) and sku.strip():
+        logger.debug(f"SKU encontrado en seller_sku para {item_id}: {sku.strip()}")
+        return sku.strip()
+    if "attributes" in item_or_variation:
+        for attr in item_or_variation["attributes"]:
+            attr_id = attr.get("id", "").upper()
+            if attr_id in ["SELLER_SKU", "SKU", "ITEM_SKU", "PRODUCT_SKU", "CUSTOM_SKU", "IDENTIFIER"]:
+                for value_field in ["value_name", "value", "values"]:
+                    value = attr.get(value_field)
+                    if isinstance(value, str) and value.strip():
+                        logger.debug(f"SKU encontrado en attributes.{attr_id}.{value_field} para {item_id}: {value.strip()}")
+                        return value.strip()
+                    elif isinstance(value, list) and value and isinstance(value[0], str):
+                        logger.debug(f"SKU encontrado en attributes.{attr_id}.{value_field}[0] para {item_id}: {value[0].strip()}")
+                        return value[0].strip()
+    if "attribute_combinations" in item_or_variation:
+        for attr in item_or_variation["attribute_combinations"]:
+            attr_id = attr.get("id", "").upper()
+            if attr_id in ["SELLER_SKU", "SKU", "ITEM_SKU", "PRODUCT_SKU"]:
+                for value_field in ["value_name", "value", "values"]:
+                    value = attr.get(value_field)
+                    if isinstance(value, str) and value.strip():
+                        logger.debug(f"SKU encontrado en attribute_combinations.{attr_id}.{value_field} para {item_id}: {value.strip()}")
+                        return value.strip()
+    for key in ["sku", "variation_sku", "seller_sku", "custom_sku", "identifier", "code"]:
+        value = item_or_variation.get(key, None)
+        if isinstance(value, str) and value.strip():
+            logger.debug(f"SKU encontrado en campo directo {key} para {item_id}: {value.strip()}")
+            return value.strip()
+    logger.warning(f"No se encontró SKU para item {item_id}. Estructura disponible: {list(item_or_variation.keys())}")
+    if "attributes" in item_or_variation:
+        attr_list = [f"{attr.get('id', 'NO_ID')}:{attr.get('value_name', attr.get('value', 'NO_VALUE'))}" for attr in item_or_variation["attributes"]]
+        logger.warning(f"Atributos disponibles en {item_id}: {attr_list}")
+    for key, value in item_or_variation.items():
+        if "sku" in key.lower() and isinstance(value, str) and value.strip():
+            logger.debug(f"SKU encontrado en campo alternativo {key} para {item_id}: {value.strip()}")
+            return value.strip()
+    return ""
+
+
+def load_items(path):
+    """Items de un archivo JSON/JSONL capturado; acepta la forma {"code", "body"} del multiget."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = [data]
+    return [entry["body"] if "body" in entry and "code" in entry else entry for entry in data if isinstance(entry, dict)]
+
+
+def make_items(n_items=2000):
+    """Items sintéticos con la forma de la API, repartidos entre todas las estrategias."""
+    filler = [{"id": name, "value_name": "x"} for name in ("BRAND", "MODEL", "COLOR", "SIZE", "GTIN", "MATERIAL")]
+    items = []
+    for i in range(n_items):
+        kind = i % 7
+        item = {"id": f"MLM{1000000000 + i}", "title": "Producto", "attributes": list(filler), "available_quantity": 5}
+        if kind == 0:
+            item["seller_custom_field"] = f"SKU{i}"
+        elif kind == 1:
+            item["variations"] = [
+                {"id": i * 10 + j, "seller_custom_field": None,
+                 "attribute_combinations": [{"id": "COLOR", "value_name": "Rojo"}, {"id": "SELLER_SKU", "value_name": f"SKU{i}-{j}"}]}
+                for j in range(4)
+            ]
+        elif kind == 2:
+            item["attributes"] = filler + [{"id": "SELLER_SKU", "value_name": f"SKU{i}"}]
+        elif kind == 3:
+            item["seller_sku"] = f" SKU{i} "
+        elif kind == 4:
+            item["code"] = f"SKU{i}"
+        elif kind == 5:
+            item["legacy_sku_field"] = f"SKU{i}"
+        items.append(item)
+    return items
+
+
+def flatten(items):
+    """Lo que se resuelve en la extracción: cada variación o, si no tiene, el item."""
+    return [v for item in items for v in (item.get("variations") or [item])]
+
+
+def timed(func, entries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in entries:
+            func(entry)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", help="archivo JSON/JSONL con items capturados de la API")
+    parser.add_argument("--synthetic", type=int, default=2000, help="items sintéticos si no se indica --items")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--log-level", default="INFO", help="nivel del logger durante la medición")
+    args = parser.parse_args()
+
+    # Los mensajes se descartan: se mide el costo de armarlos, no de escribirlos
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(args.log_level.upper())
+
+    entries = flatten(load_items(args.items) if args.items else make_items(args.synthetic))
+    comparables, mismatches, legacy_errors = [], [], 0
+    for entry in entries:
+        try:
+            legacy_sku = legacy_extract_sku(entry)
+        except Exception:
+            # La versión anterior fallaba con atributos sin id; en la extracción esa fila se perdía
+            legacy_errors += 1
+            continue
+        comparables.append(entry)
+        if legacy_sku != resolve_sku(entry).sku:
+            mismatches.append(entry.get("id"))
+    assert not mismatches, f"SKU distinto al de la versión anterior en: {mismatches[:10]}"
+    if legacy_errors:
+        print(f"{legacy_errors} items/variaciones hacían fallar la versión anterior; se excluyen de la medición")
+    entries = comparables
+
+    t_old = timed(legacy_extract_sku, entries, args.repeat)
+    t_new = timed(resolve_sku, entries, args.repeat)
+    calls = len(entries) * args.repeat
+    print(f"{len(entries)} items/variaciones x {args.repeat} repeticiones, logger en {args.log_level.upper()}")
+    print(f"{'anterior':>10}: {t_old:.3f} s ({1e6 * t_old / calls:.2f} µs por llamada)")
+    print(f"{'nuevo':>10}: {t_new:.3f} s ({1e6 * t_new / calls:.2f} µs por llamada) -> {t_old / t_new:.1f}x")
+
+    stats = SkuStats()
+    for entry in entries:
+        stats.resolve(entry)
+    print("\nSKUs por estrategia:")
+    for entry in stats.summary():
+        print(f"  {entry['estrategia']:<24} {entry['resueltos']:>8} {entry['porcentaje']:>7.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark del procesamiento del proveedor y del armado de payloads de sincronización.
+
+Compara la implementación actual (provider_reader.read_provider_stock para el archivo del
+proveedor, inventory_sync.apply_provider_stock y build_sync_plan) con la versión fila por
+fila anterior en catálogos sintéticos de 10k, 100k y 1M variaciones. Ambas parten del
+mismo archivo CSV del proveedor. La versión anterior es cuadrática, así que por defecto
+solo se mide hasta 10k variaciones (--legacy-max para cambiarlo).
+
+Uso:
+    python benchmarks/bench_sync_pipeline.py
+    python benchmarks/bench_sync_pipeline.py --sizes 10000 100000 --legacy-max 100000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inventory_sync import apply_provider_stock, build_sync_plan  # noqa: E402
+from provider_reader import read_provider_stock  # noqa: E402
+
+
+def make_catalog(n_variations, variations_per_item=4, seed=0):
+    """Inventario ML y archivo CSV del proveedor (bytes) sintéticos con ~n_variations variaciones."""
+    rng = np.random.default_rng(seed)
+    # 70% de las publicaciones con variaciones (1..2*variations_per_item) y el resto con una sola fila
+    n_items = int(n_variations / (0.7 * variations_per_item + 0.3)) + 1
+    has_variations = rng.random(n_items) < 0.7
+    per_item = np.where(has_variations, rng.integers(1, 2 * variations_per_item, n_items), 1)
+    item_idx = np.repeat(np.arange(n_items), per_item)[:n_variations]
+    df_ml = pd.DataFrame({
+        "status": "active",
+        "item_id": pd.Series([f"MLM{1000000000 + i}" for i in item_idx], dtype="string"),
+        "título": "Producto",
+        "sku": pd.Series([f"SKU{i}" for i in range(len(item_idx))], dtype="string"),
+        "variación_id": pd.array(np.where(has_variations[item_idx], np.arange(len(item_idx)) + 10**11, np.nan), dtype="Float64").astype("Int64"),
+        "stock": rng.integers(0, 30, len(item_idx)),
+    })
+    df_prov = pd.DataFrame({
+        "CLAVE_ARTICULO": [f"SKU{i}" for i in range(n_variations)],
+        "EXISTENCIAS": rng.integers(0, 30, n_variations),
+    })
+    return df_ml, df_prov.to_csv(index=False).encode("utf-8")
+
+
+def legacy_pipeline(df_ml, provider_csv):
+    """Versión fila por fila anterior (read_csv + apply + filtro por publicación + iterrows)."""
+    df_prov = pd.read_csv(io.BytesIO(provider_csv), dtype={"CLAVE_ARTICULO": str})
+    df_prov_filtrado = df_prov[
+        df_prov["CLAVE_ARTICULO"].apply(lambda x: isinstance(x, str) and x.strip() != "") &
+        df_prov["EXISTENCIAS"].apply(lambda x: isinstance(x, (int, float)))
+    ].copy()
+    inventario_dict = dict(zip(df_prov_filtrado["CLAVE_ARTICULO"], df_prov_filtrado["EXISTENCIAS"]))
+    df_ml = df_ml.copy()
+    df_ml["stock_nuevo"] = df_ml["sku"].map(inventario_dict).fillna(0).astype(int)
+    df_ml["stock_nuevo"] = df_ml["stock_nuevo"].apply(lambda x: 0 if x <= 3 else x)
+    df_ml["cambio"] = df_ml["stock"].astype(int) != df_ml["stock_nuevo"].astype(int)
+    df_actualizar = df_ml[df_ml["cambio"]]
+    payloads = []
+    for item_id in df_actualizar['item_id'].unique():
+        all_variations_item = df_ml[df_ml['item_id'] == item_id].copy()
+        if not pd.isna(all_variations_item['variación_id'].iloc[0]):
+            payload = {"variations": [{"id": int(row['variación_id']), "available_quantity": int(row['stock_nuevo'])}
+                                      for _, row in all_variations_item.iterrows()]}
+        else:
+            payload = {"available_quantity": int(all_variations_item['stock_nuevo'].iloc[0])}
+        payloads.append((item_id, payload))
+    return payloads
+
+
+def vectorized_pipeline(df_ml, provider_csv):
+    inventario, _, _ = read_provider_stock(io.BytesIO(provider_csv), "proveedor.csv")
+    df_ml = apply_provider_stock(df_ml, inventario)
+    item_ids = list(df_ml.loc[df_ml["cambio"], "item_id"].unique())
+    updates, _ = build_sync_plan(df_ml, item_ids)
+    return [(item_id, payload) for item_id, payload, _ in updates]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="tamaño máximo en el que se mide la versión anterior")
+    args = parser.parse_args()
+
+    print(f"{'variaciones':>12} {'publicaciones':>14} {'vectorizado (s)':>16} {'anterior (s)':>13} {'aceleración':>12}")
+    for size in args.sizes:
+        df_ml, provider_csv = make_catalog(size)
+        t_new, payloads_new = timed(vectorized_pipeline, df_ml, provider_csv)
+        t_old = speedup = "-"
+        if size <= args.legacy_max:
+            elapsed, payloads_old = timed(legacy_pipeline, df_ml, provider_csv)
+            assert payloads_old == payloads_new, "los payloads no coinciden con la versión anterior"
+            t_old = f"{elapsed:.3f}"
+            speedup = f"{elapsed / t_new:.0f}x"
+        print(f"{len(df_ml):>12} {df_ml['item_id'].nunique():>14} {t_new:>16.3f} {t_old:>13} {speedup:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Servidor local que imita la API de Mercado Libre para medir extracción y sincronización.
+
+Emula los endpoints que usa ml_client.MercadoLibreClient con un catálogo sintético
+determinista: /users/me, /users/{id}/items/search (scan con scroll_id y paginación con
+offset), /items/{id} (con ETag y 304 ante If-None-Match), el multiget /items?ids=...,
+PUT /items/{id} y /oauth/token. Cada respuesta espera una latencia configurable y una
+fracción de las peticiones devuelve 429 o 503. GET /__stats devuelve las peticiones
+atendidas por endpoint.
+
+Uso:
+    python benchmarks/ml_stub_server.py --items 5000 --variaciones 3 --latencia-ms 40
+    python benchmarks/ml_stub_server.py --port 8081 --tasa-429 0.01 --tasa-5xx 0.005
+
+Al arrancar imprime la URL base en la primera línea; úsala como MERCADOLIBRE_API_URL.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USER_ID = 123456789
+FIRST_ITEM = 1_000_000_000
+# La búsqueda sin scan no permite pasar de este offset (igual que la API real)
+MAX_SEARCH_OFFSET = 1000
+
+ITEM_RE = re.compile(r"^/items/(MLM\d+)$")
+SEARCH_RE = re.compile(r"^/users/(\d+)/items/search$")
+
+
+class StubCatalog:
+    """Catálogo sintético: cada publicación se genera a partir de su índice y la semilla.
+
+    Alrededor del 30% de las publicaciones no tiene variaciones; las demás tienen entre 1 y
+    2 * variations - 1. Lo que se modifica con PUT se guarda aparte y se devuelve en las
+    siguientes lecturas.
+    """
+
+    def __init__(self, items=1000, variations=3, paused_ratio=0.1, seed=0):
+        self.items = items
+        self.variations = variations
+        self.seed = seed
+        rng = random.Random(seed)
+        self.status = ["paused" if rng.random() < paused_ratio else "active" for _ in range(items)]
+        self.ids_by_status = {}
+        for index, status in enumerate(self.status):
+            self.ids_by_status.setdefault(status, []).append(self.item_id(index))
+        self.lock = threading.Lock()
+        self.overrides = {}
+
+    @staticmethod
+    def item_id(index):
+        return f"MLM{FIRST_ITEM + index}"
+
+    def index(self, item_id):
+        index = int(item_id[3:]) - FIRST_ITEM
+        return index if 0 <= index < self.items else None
+
+    def _generate(self, index):
+        rng = random.Random(self.seed * 1_000_003 + index)
+        item_id = self.item_id(index)
+        n_variations = 0 if rng.random() < 0.3 else rng.randint(1, max(1, 2 * self.variations - 1))
+        item = {
+            "id": item_id,
+            "title": f"Producto de prueba {index}",
+            "status": self.status[index],
+            "price": round(rng.uniform(100, 5000), 2),
+            "currency_id": "MXN",
+            "available_quantity": rng.randint(0, 50),
+            "seller_custom_field": f"SKU{index}",
+            "last_updated": "2024-01-01T00:00:00.000Z",
+            "pictures": [{"id": f"{item_id}-{n}", "url": f"http://stub/{item_id}/{n}.jpg"} for n in range(3)],
+            "attributes": [
+                {"id": "BRAND", "name": "Marca", "value_name": "Genérica"},
+                {"id": "SELLER_SKU", "name": "SKU", "value_name": f"SKU{index}"},
+            ],
+            "variations": [],
+        }
+        for n in range(n_variations):
+            item["variations"].append({
+                "id": 100_000_000_000 + index * 100 + n,
+                "available_quantity": rng.randint(0, 50),
+                "seller_custom_field": f"SKU{index}-{n}",
+                "attribute_combinations": [{"id": "COLOR", "name": "Color", "value_name": f"Color {n}"}],
+            })
+        return item
+
+    def get(self, item_id):
+        index = self.index(item_id)
+        if index is None:
+            return None
+        with self.lock:
+            if item_id in self.overrides:
+                return json.loads(json.dumps(self.overrides[item_id]))
+        return self._generate(index)
+
+    def update(self, item_id, payload):
+        """Aplica un PUT (status, available_quantity o variations) y devuelve la publicación, o None."""
+        item = self.get(item_id)
+        if item is None:
+            return None
+        if "status" in payload:
+            item["status"] = payload["status"]
+        if "available_quantity" in payload:
+            item["available_quantity"] = payload["available_quantity"]
+        if "variations" in payload:
+            quantities = {v["id"]: v.get("available_quantity") for v in payload["variations"]}
+            # Como en la API real, las variaciones que no se envían se eliminan
+            item["variations"] = [
+                dict(v, available_quantity=quantities[v["id"]]) if quantities[v["id"]] is not None else v
+                for v in item["variations"] if v["id"] in quantities
+            ]
+        item["last_updated"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        with self.lock:
+            self.overrides[item_id] = item
+        return item
+
+    def search(self, status, offset, limit):
+        ids = self.ids_by_status.get(status, [])
+        return ids[offset:offset + limit], len(ids)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, catalog, latency_ms=30.0, jitter_ms=10.0, rate_429=0.0, rate_5xx=0.0,
+                 retry_after=1, seed=0, reject_combined=False):
+        super().__init__(address, StubHandler)
+        # Simula una API que no acepta el estado junto con las cantidades en el mismo PUT
+        self.reject_combined = reject_combined
+        self.catalog = catalog
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.stats = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, endpoint, status):
+        with self.stats_lock:
+            entry = self.stats.setdefault(endpoint, {"peticiones": 0, "429": 0, "5xx": 0})
+            entry["peticiones"] += 1
+            if status == 429:
+                entry["429"] += 1
+            elif status >= 500:
+                entry["5xx"] += 1
+
+    def draw(self):
+        """Latencia (s) y error inyectado (429, 503 o None) de la siguiente petición."""
+        with self.stats_lock:
+            latency = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            roll = self.rng.random()
+        if roll < self.rate_429:
+            return latency, 429
+        if roll < self.rate_429 + self.rate_5xx:
+            return latency, 503
+        return latency, None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Sin Nagle: encabezados y cuerpo se escriben por separado y el ACK retardado sumaría ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, endpoint, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.record(endpoint, status)
+
+    def _send_not_modified(self, endpoint, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.server.record(endpoint, 304)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            return None
+
+    def _inject(self, endpoint):
+        """Espera la latencia simulada; devuelve True si ya respondió con un error inyectado."""
+        latency, error = self.server.draw()
+        time.sleep(latency)
+        if error == 429:
+            self._send(endpoint, 429, {"message": "Too many requests"}, {"Retry-After": str(self.server.retry_after)})
+        elif error:
+            self._send(endpoint, error, {"message": "Service unavailable"})
+        return error is not None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        catalog = self.server.catalog
+
+        if url.path == "/__stats":
+            with self.server.stats_lock:
+                self._send("__stats", 200, self.server.stats)
+            return
+        if url.path == "/users/me":
+            if not self._inject("GET /users/me"):
+                self._send("GET /users/me", 200, {"id": USER_ID, "nickname": "STUB"})
+            return
+
+        match = SEARCH_RE.match(url.path)
+        if match:
+            endpoint = "GET /users/{id}/items/search"
+            if self._inject(endpoint):
+                return
+            limit = int(params.get("limit", 50))
+            if params.get("search_type") == "scan":
+                offset = int(params.get("scroll_id") or 0)
+            else:
+                offset = int(params.get("offset", 0))
+                if offset + limit > MAX_SEARCH_OFFSET:
+                    self._send(endpoint, 400, {"message": "offset demasiado grande; usa search_type=scan"})
+                    return
+            results, total = catalog.search(params.get("status", "active"), offset, limit)
+            body = {"results": results, "paging": {"total": total, "offset": offset, "limit": limit}}
+            if params.get("search_type") == "scan":
+                body["scroll_id"] = str(offset + limit)
+            self._send(endpoint, 200, body)
+            return
+
+        if url.path == "/items" and "ids" in params:
+            endpoint = "GET /items?ids"
+            if self._inject(endpoint):
+                return
+            attributes = params["attributes"].split(",") if params.get("attributes") else None
+            entries = []
+            for item_id in params["ids"].split(","):
+                item = catalog.get(item_id)
+                if item is None:
+                    entries.append({"code": 404, "body": {"id": item_id, "message": "Item not found"}})
+                    continue
+                if attributes:
+                    item = {key: item[key] for key in attributes if key in item}
+                entries.append({"code": 200, "body": item})
+            self._send(endpoint, 200, entries)
+            return
+
+        match = ITEM_RE.match(url.path)
+        if match:
+            endpoint = "GET /items/{id}"
+            if self._inject(endpoint):
+                return
+            item = catalog.get(match.group(1))
+            if item is None:
+                self._send(endpoint, 404, {"message": "Item not found"})
+                return
+            etag = '"' + hashlib.md5(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send_not_modified(endpoint, etag)
+            else:
+                self._send(endpoint, 200, item, {"ETag": etag})
+            return
+
+        self._send("otro", 404, {"message": f"Ruta no emulada: {url.path}"})
+
+    def do_PUT(self):
+        endpoint = "PUT /items/{id}"
+        payload = self._read_json()
+        match = ITEM_RE.match(urlsplit(self.path).path)
+        if not match:
+            self._send("otro", 404, {"message": "Ruta no emulada"})
+            return
+        if self._inject(endpoint):
+            return
+        if payload is None:
+            self._send(endpoint, 400, {"message": "JSON inválido"})
+            return
+        if self.server.reject_combined and "status" in payload and len(payload) > 1:
+            self._send(endpoint, 400, {"message": "status no se puede combinar con otros campos"})
+            return
+        item = self.server.catalog.update(match.group(1), payload)
+        if item is None:
+            self._send(endpoint, 404, {"message": "Item not found"})
+        else:
+            self._send(endpoint, 200, item)
+
+    def do_POST(self):
+        self._read_json()
+        if urlsplit(self.path).path == "/oauth/token":
+            self._send("POST /oauth/token", 200, {"access_token": "stub-token", "token_type": "Bearer", "expires_in": 21600})
+        else:
+            self._send("otro", 404, {"message": "Ruta no emulada"})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081, help="0 elige un puerto libre")
+    parser.add_argument("--items", type=int, default=1000, help="publicaciones del catálogo")
+    parser.add_argument("--variaciones", type=int, default=3, help="variaciones promedio por publicación con variaciones")
+    parser.add_argument("--pausadas", type=float, default=0.1, help="fracción de publicaciones pausadas")
+    parser.add_argument("--latencia-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="fracción de peticiones que responden 429")
+    parser.add_argument("--tasa-5xx", type=float, default=0.0, help="fracción de peticiones que responden 503")
+    parser.add_argument("--retry-after", type=int, default=1, help="segundos de Retry-After en los 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sin-put-combinado", action="store_true",
+                        help="responder 400 a los PUT que combinan status con cantidades")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    catalog = StubCatalog(args.items, args.variaciones, args.pausadas, args.seed)
+    server = StubServer(
+        (args.host, args.port), catalog, args.latencia_ms, args.jitter_ms,
+        args.tasa_429, args.tasa_5xx, args.retry_after, args.seed, args.sin_put_combinado
+    )
+    print(server.base_url, flush=True)
+    print(f"Catálogo de {catalog.items} publicaciones; Ctrl+C para detener", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
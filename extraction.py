@@ -0,0 +1,337 @@
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import requests
+
+from logging_setup import set_job_id
+from extraction_checkpoint import CHECKPOINT_EVERY, ExtractionCheckpoint
+from jobs import cancel_requested
+from metrics import METRICS
+from ml_client import MULTIGET_MAX_IDS
+from sku_resolver import SkuStats
+from snapshots import SNAPSHOT_DTYPES, get_latest_ml_snapshot, load_snapshot, normalize_snapshot, save_ml_snapshot
+
+logger = logging.getLogger("inventarios-app.extraction")
+
+# Tipo de trabajo en JobRegistry
+EXTRACTION_JOB = "extraccion"
+
+# Publicaciones con problemas conocidos de SKU: se registra su estructura completa
+PUBLICACIONES_DEBUG = frozenset([
+    "MLM1338123694", "MLM1339305557", "MLM1339298925", "MLM1339298922", "MLM1856162519", "MLM2308903050", "MLM3088252038"
+])
+
+
+def plan_incremental_extraction(item_ids, df_prev, client, workers=1, job_state=None):
+    """Decide qué publicaciones hay que volver a descargar comparando con el último inventario.
+
+    Consulta solo `last_updated` de cada publicación (multiget con attributes) y la compara
+    con la guardada en el inventario anterior. Devuelve (ids_a_descargar, df_conservadas,
+    last_updated): las publicaciones nuevas o modificadas, las filas del inventario anterior
+    que siguen vigentes y el last_updated actual de cada publicación (con él la descarga
+    toma de la caché de publicaciones las que ya estaban guardadas). Las publicaciones que
+    ya no aparecen en el listado se descartan.
+    """
+    prev_updated = (
+        df_prev.dropna(subset=["last_updated"])
+        .drop_duplicates("item_id")
+        .set_index("item_id")["last_updated"]
+        .astype(str)
+        .to_dict()
+    )
+
+    current_updated = {}
+    revisadas = 0
+    for batch in client.iter_items_details(item_ids, workers, job_state, attributes=["id", "last_updated"]):
+        if cancel_requested(job_state):
+            return None, None, None
+        for item_id, item in batch.items():
+            if item and item.get("last_updated"):
+                current_updated[item_id] = str(item["last_updated"])
+        revisadas += len(batch)
+        if job_state is not None:
+            job_state["text"] = f"Revisando cambios {min(revisadas, len(item_ids))}/{len(item_ids)}"
+
+    ids_a_descargar = [
+        item_id for item_id in item_ids
+        if item_id not in prev_updated or current_updated.get(item_id) != prev_updated[item_id]
+    ]
+    ids_sin_cambios = set(item_ids) - set(ids_a_descargar)
+    df_conservadas = df_prev[df_prev["item_id"].isin(ids_sin_cambios)]
+
+    eliminadas = set(df_prev["item_id"]) - set(item_ids)
+    nuevas = sum(1 for item_id in item_ids if item_id not in prev_updated)
+    logger.info(
+        f"Extracción incremental: {len(ids_sin_cambios)} sin cambios, "
+        f"{len(ids_a_descargar) - nuevas} modificadas, {nuevas} nuevas, {len(eliminadas)} ya no listadas"
+    )
+    return ids_a_descargar, df_conservadas, current_updated
+
+
+def run_extraction_job(job_state, client, inventory_store, workers=1, rate_limit=10.0, incremental=False, resume=True):
+    """Extrae el inventario de Mercado Libre; pensada para ejecutarse como trabajo de JobRegistry.
+
+    job_state es el diccionario del trabajo: aquí se actualizan progress y text, y se
+    consulta status para detenerse si se canceló. Devuelve el resultado (snapshot_id,
+    fecha, resumen de publicaciones sin SKU, ...), un diccionario con "error" si no se
+    pudo extraer, o None si se canceló. No toca st.session_state: cada sesión toma el
+    resultado del registro de trabajos.
+
+    El avance se guarda cada CHECKPOINT_EVERY publicaciones (y al cancelar) en el área de
+    trabajo de ExtractionCheckpoint; con `resume` se continúa desde el último checkpoint
+    válido. Solo una extracción completa se guarda en el historial.
+    """
+    set_job_id(job_state.get("id"))
+    resultado = {}
+    # El limitador es del cliente compartido: una sincronización en otra pestaña conserva la
+    # pausa y la tasa reducida por un 429 aunque empiece esta extracción
+    client.limiter.set_rate(rate_limit)
+    client.reset_stats()
+    sku_stats = SkuStats()
+
+    user_id = client.get_user_id()
+    if not user_id:
+        logger.error("Extracción fallida: No se pudo obtener user_id")
+        return {"error": "No se pudo obtener tu user_id. Revisa tu token."}
+
+    latest_ml_file = get_latest_ml_snapshot()
+    checkpoint = ExtractionCheckpoint()
+    if resume and checkpoint.load(incremental, latest_ml_file):
+        # Reanudar: el listado y el plan son los del checkpoint
+        item_ids = checkpoint.plan["item_ids"]
+        ids_a_descargar = checkpoint.plan["ids_a_descargar"]
+        resultado["listado"] = checkpoint.plan["listado"]
+        resultado["omitidas"] = checkpoint.plan["omitidas"]
+        last_updated = checkpoint.plan.get("last_updated")
+        sku_stats.update(checkpoint.progress["sku_estrategias"])
+        resultado["reanudada"] = checkpoint.progress["procesadas"]
+    else:
+        # Obtener IDs de todas las publicaciones (activas y pausadas), ambos listados en paralelo
+        status_list = ["active", "paused"]
+        item_ids = []
+        job_state["text"] = "Obteniendo listado de publicaciones..."
+        try:
+            with METRICS.phase(EXTRACTION_JOB, "listado"), \
+                    ThreadPoolExecutor(max_workers=len(status_list), thread_name_prefix="ml-listado") as executor:
+                futures = [executor.submit(contextvars.copy_context().run, client.get_items, user_id, status) for status in status_list]
+                listings = [future.result() for future in futures]
+        except requests.RequestException as e:
+            # Con un listado incompleto se publicaría un inventario truncado y la sincronización
+            # lo tomaría como el estado real de la cuenta
+            logger.error(f"Extracción fallida: no se pudo obtener el listado completo ({str(e)})")
+            return {"error": f"No se pudo obtener el listado completo de publicaciones ({str(e)}). No se guardó ningún inventario; intenta de nuevo."}
+
+        resultado["listado"] = {}
+        for status, (status_items, status_total) in zip(status_list, listings):
+            logger.info(f"Obtenidas {len(status_items)} de {status_total} publicaciones con status {status}")
+            resultado["listado"][status] = {"total": status_total, "obtenidas": len(status_items)}
+            item_ids.extend(status_items)
+        # Una publicación puede cambiar de status mientras se lista; no descargarla dos veces
+        item_ids = list(dict.fromkeys(item_ids))
+
+        # En modo incremental solo se descargan las publicaciones nuevas o modificadas
+        # desde el último inventario del historial; el resto se toma de ese archivo
+        ids_a_descargar = item_ids
+        df_conservadas = None
+        last_updated = None
+        resultado["omitidas"] = 0
+        if incremental:
+            df_prev = load_snapshot(latest_ml_file) if latest_ml_file else None
+            # normalize_snapshot siempre agrega la columna; los inventarios migrados desde xlsx la traen vacía
+            if df_prev is not None and df_prev["last_updated"].notna().any():
+                logger.info(f"Extracción incremental a partir de {latest_ml_file}")
+                with METRICS.phase(EXTRACTION_JOB, "revision_cambios"):
+                    ids_a_descargar, df_conservadas, last_updated = plan_incremental_extraction(
+                        item_ids, df_prev, client, workers, job_state
+                    )
+                if ids_a_descargar is None:
+                    logger.info("Extracción cancelada por el usuario")
+                    return None
+                resultado["omitidas"] = len(item_ids) - len(ids_a_descargar)
+            else:
+                logger.info("No hay un inventario previo con last_updated; se hace una extracción completa")
+        checkpoint.begin(
+            item_ids, ids_a_descargar, resultado["listado"], incremental, latest_ml_file,
+            resultado["omitidas"], df_conservadas, last_updated
+        )
+
+    # Las publicaciones ya guardadas en el checkpoint no se vuelven a descargar
+    offset = checkpoint.progress["procesadas"]
+    total_publicaciones = len(ids_a_descargar)
+    job_state["total"] = total_publicaciones
+    logger.info(f"Iniciando extracción de {total_publicaciones - offset} de {total_publicaciones} publicaciones")
+
+    # Procesar cada publicación; los lotes multiget se descargan en paralelo
+    batch_results = client.iter_items_details(ids_a_descargar[offset:], workers, job_state, last_updated=last_updated)
+    logger.info(f"Extracción con {workers} hilo(s) y tasa inicial de {rate_limit} req/s")
+    details = {}
+    # Filas y conteo de SKUs del lote en curso; pasan a pending_rows cuando el lote termina
+    # completo, así un checkpoint nunca incluye un lote a medias
+    all_items_info = []
+    batch_stats = SkuStats()
+    pending_rows = []
+    procesadas = offset
+    # Tiempo del bucle: esperando lotes (descarga), guardando checkpoints y el resto
+    # (extracción de SKUs y armado de filas)
+    loop_start = time.perf_counter()
+    tiempos = {"descarga": 0.0, "checkpoint": 0.0}
+
+    def record_loop_phases():
+        METRICS.observe_phase(EXTRACTION_JOB, "descarga", tiempos["descarga"])
+        METRICS.observe_phase(EXTRACTION_JOB, "checkpoint", tiempos["checkpoint"])
+        METRICS.observe_phase(EXTRACTION_JOB, "sku", time.perf_counter() - loop_start - tiempos["descarga"] - tiempos["checkpoint"])
+
+    for idx in range(offset, total_publicaciones):
+        item_id = ids_a_descargar[idx]
+        # Verificar si el usuario canceló la operación
+        if cancel_requested(job_state):
+            batch_results.close()
+            record_loop_phases()
+            checkpoint.save(pending_rows, procesadas, sku_stats.counts)
+            logger.info(f"Extracción cancelada por el usuario; avance guardado en {procesadas}/{total_publicaciones}")
+            return None
+
+        # Actualizar progreso
+        job_state["progress"] = (idx + 1) / total_publicaciones
+        job_state["text"] = f"Descargando {idx+1}/{total_publicaciones}"
+
+        # Tomar los detalles del siguiente lote multiget
+        if (idx - offset) % MULTIGET_MAX_IDS == 0:
+            pending_rows.extend(all_items_info)
+            sku_stats.update(batch_stats.counts)
+            all_items_info, batch_stats, procesadas = [], SkuStats(), idx
+            if procesadas - checkpoint.progress["procesadas"] >= CHECKPOINT_EVERY:
+                started = time.perf_counter()
+                checkpoint.save(pending_rows, procesadas, sku_stats.counts)
+                pending_rows = []
+                tiempos["checkpoint"] += time.perf_counter() - started
+            started = time.perf_counter()
+            details = next(batch_results, {})
+            tiempos["descarga"] += time.perf_counter() - started
+
+        # Obtener detalles de la publicación con manejo de errores robusto
+        try:
+            item = details.get(item_id)
+            if not item:
+                logger.warning(f"No se pudo obtener detalles para {item_id}, saltando...")
+                continue
+
+            status = item.get("status", "unknown")
+
+            # Debug específico para publicaciones problemáticas
+            if item_id in PUBLICACIONES_DEBUG:
+                logger.info(f"DEBUG: Analizando publicación problemática {item_id}")
+                try:
+                    client.debug_item_structure(item_id)
+                except Exception as debug_error:
+                    logger.error(f"Error en debug de {item_id}: {debug_error}")
+
+            # Procesar publicación con variaciones
+            if "variations" in item and item["variations"]:
+                for v in item["variations"]:
+                    try:
+                        sku = batch_stats.resolve(v).sku
+                        # Debug adicional para variaciones sin SKU en publicaciones problemáticas
+                        if not sku and item_id in PUBLICACIONES_DEBUG:
+                            logger.warning(f"DEBUG: Variación sin SKU en {item_id}, variation_id: {v.get('id')}")
+                            logger.warning(f"Estructura de variación sin SKU: keys={list(v.keys())}, seller_custom_field={v.get('seller_custom_field')}, seller_sku={v.get('seller_sku')}")
+
+                        all_items_info.append({
+                            "status": status, 
+                            "item_id": item_id, 
+                            "título": item.get("title", ""),
+                            "sku": sku, 
+                            "variación_id": v.get("id", np.nan),
+                            "stock": v.get("available_quantity", 0),
+                            "last_updated": item.get("last_updated"),
+                        })
+                    except Exception as var_error:
+                        logger.error(f"Error procesando variación de {item_id}: {var_error}")
+                        continue
+            # Procesar publicación sin variaciones
+            else:
+                try:
+                    sku = batch_stats.resolve(item).sku
+                    # Debug adicional para publicaciones sin SKU
+                    if not sku and item_id in PUBLICACIONES_DEBUG:
+                        logger.warning(f"DEBUG: Publicación sin SKU {item_id}")
+                        logger.warning(f"Estructura de publicación sin SKU: keys={list(item.keys())}, seller_custom_field={item.get('seller_custom_field')}, seller_sku={item.get('seller_sku')}")
+
+                    all_items_info.append({
+                        "status": status, 
+                        "item_id": item_id, 
+                        "título": item.get("title", ""),
+                        "sku": sku, 
+                        "variación_id": np.nan,
+                        "stock": item.get("available_quantity", 0),
+                        "last_updated": item.get("last_updated"),
+                    })
+                except Exception as item_error:
+                    logger.error(f"Error procesando item {item_id}: {item_error}")
+                    continue
+
+        except Exception as general_error:
+            logger.error(f"Error general procesando {item_id}: {general_error}")
+            # Continuar con el siguiente item en lugar de fallar completamente
+            continue
+
+    record_loop_phases()
+    if cancel_requested(job_state):
+        # Se canceló durante el último lote: puede estar incompleto y no se guarda
+        checkpoint.save(pending_rows, procesadas, sku_stats.counts)
+        logger.info(f"Extracción cancelada por el usuario; avance guardado en {procesadas}/{total_publicaciones}")
+        return None
+
+    # Extracción completa: juntar lo guardado en los checkpoints con lo descargado después
+    saving_start = time.perf_counter()
+    pending_rows.extend(all_items_info)
+    sku_stats.update(batch_stats.counts)
+    frames = [df for df in (checkpoint.rows(), pd.DataFrame(pending_rows)) if df is not None and not df.empty]
+    df_inv = normalize_snapshot(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame(columns=list(SNAPSHOT_DTYPES))
+    if len(frames) > 1:
+        # Dejar las filas en el orden del listado de la API
+        orden = {item_id: pos for pos, item_id in enumerate(item_ids)}
+        df_inv = df_inv.iloc[df_inv["item_id"].map(orden).argsort(kind="stable")].reset_index(drop=True)
+    if resultado["omitidas"]:
+        logger.info(f"Extracción incremental: {resultado['omitidas']} publicaciones tomadas del inventario anterior")
+    # Identificar publicaciones sin SKU
+    df_sin_sku = df_inv[df_inv["sku"].apply(lambda x: x is None or str(x).strip() == "")]
+    if not df_sin_sku.empty:
+        resultado["sin_sku"] = True
+        resultado["sin_sku_count"] = len(df_sin_sku)
+        resultado["sin_sku_items"] = df_sin_sku[["item_id", "título"]].drop_duplicates().to_dict('records')
+        # Guardar reporte Excel de publicaciones/variaciones sin SKU
+        sin_sku_dir = "reportes_sin_sku"
+        if not os.path.exists(sin_sku_dir):
+            os.makedirs(sin_sku_dir)
+        reporte_path = os.path.join(sin_sku_dir, f"sin_sku_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+        df_sin_sku.to_excel(reporte_path, index=False)
+        resultado["sin_sku_reporte"] = reporte_path
+        logger.warning(f"Se encontraron {len(df_sin_sku)} variaciones sin SKU en {len(resultado['sin_sku_items'])} publicaciones")
+    else:
+        resultado["sin_sku"] = False
+        resultado["sin_sku_reporte"] = None
+        logger.info("No se encontraron publicaciones sin SKU")
+
+    # Guardar en historial (Parquet con tipos explícitos) y en la base de datos; solo
+    # después se borra el checkpoint
+    file_path = save_ml_snapshot(df_inv)
+    snapshot_id = inventory_store.save_ml_snapshot(df_inv, source=file_path)
+    checkpoint.clear()
+    METRICS.observe_phase(EXTRACTION_JOB, "guardado", time.perf_counter() - saving_start)
+    resultado["snapshot_id"] = snapshot_id
+    resultado["fecha"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    logger.info(f"Inventario guardado en {file_path} con {len(df_inv)} variantes")
+    for entry in client.get_stats():
+        logger.info(f"API {entry['endpoint']}: {entry['peticiones']} peticiones, {entry['errores']} errores, "
+                    f"{entry['bytes']} bytes, {entry['latencia_promedio_ms']} ms promedio")
+    resultado["sku_estrategias"] = sku_stats.summary()
+    for entry in resultado["sku_estrategias"]:
+        logger.info(f"SKU por {entry['estrategia']}: {entry['resueltos']} ({entry['porcentaje']}%)")
+    return resultado
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from snapshots import normalize_snapshot
+
+logger = logging.getLogger("inventarios-app.extraction")
+
+# Área de trabajo de las extracciones en curso; nunca se mezcla con el historial publicado
+ML_STAGING_DIR = "inventario_ml_staging"
+# Publicaciones descargadas entre un checkpoint y el siguiente (múltiplo del tamaño de multiget)
+CHECKPOINT_EVERY = 500
+# Un checkpoint más antiguo se descarta: el listado de publicaciones ya no sería confiable
+CHECKPOINT_MAX_AGE = timedelta(hours=24)
+
+PLAN_FILE = "plan.json"
+PROGRESS_FILE = "progress.json"
+KEPT_FILE = "conservadas.parquet"
+
+
+def _write_json(path, data):
+    # Escribir y renombrar para que un reinicio nunca deje un JSON a medio escribir
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ExtractionCheckpoint:
+    """Progreso de una extracción guardado en `staging_dir` para poder reanudarla.
+
+    begin() guarda el plan (el listado de publicaciones y cuáles hay que descargar, más
+    las filas que se conservan del inventario anterior en modo incremental). save() agrega
+    una parte Parquet con las filas descargadas desde el checkpoint anterior y luego
+    actualiza progress.json, así que lo que indica progress.json siempre está en disco.
+    Nada de esto se publica en el historial: solo una extracción completa se guarda como
+    inventario, y después se borra el área de trabajo con clear().
+    """
+
+    def __init__(self, staging_dir=ML_STAGING_DIR):
+        self.staging_dir = staging_dir
+        self.plan = None
+        self.progress = None
+
+    def _path(self, name):
+        return os.path.join(self.staging_dir, name)
+
+    def load(self, incremental, base_snapshot):
+        """Carga el checkpoint si se puede reanudar con estos parámetros; si no, lo descarta.
+
+        Solo sirve un checkpoint del mismo modo (incremental o completo), hecho sobre el
+        mismo inventario base (`base_snapshot`, el último del historial) y de menos de
+        CHECKPOINT_MAX_AGE. Devuelve True si hay algo que reanudar.
+        """
+        if not self._read():
+            return False
+        created_at = datetime.strptime(self.plan["created_at"], "%Y-%m-%d %H:%M:%S")
+        if self.plan["incremental"] != incremental:
+            motivo = "se pidió otro modo de extracción"
+        elif self.plan["base_snapshot"] != base_snapshot:
+            motivo = "el historial cambió desde que empezó"
+        elif datetime.now() - created_at > CHECKPOINT_MAX_AGE:
+            motivo = f"tiene más de {CHECKPOINT_MAX_AGE}"
+        else:
+            logger.info(
+                f"Reanudando la extracción del {self.plan['created_at']}: "
+                f"{self.progress['procesadas']}/{len(self.plan['ids_a_descargar'])} publicaciones ya descargadas"
+            )
+            return True
+        logger.info(f"Se descarta el checkpoint de extracción del {self.plan['created_at']}: {motivo}")
+        self.clear()
+        return False
+
+    def _read(self):
+        try:
+            self.plan = _read_json(self._path(PLAN_FILE))
+            self.progress = _read_json(self._path(PROGRESS_FILE))
+            return True
+        except FileNotFoundError:
+            self.plan = self.progress = None
+            return False
+        except (ValueError, KeyError) as e:
+            logger.error(f"Checkpoint de extracción ilegible en {self.staging_dir}: {e}")
+            self.clear()
+            return False
+
+    def status(self):
+        """Resumen {creado, procesadas, total, incremental} del checkpoint en disco, o None."""
+        if not self._read():
+            return None
+        return {
+            "creado": self.plan["created_at"],
+            "procesadas": self.progress["procesadas"],
+            "total": len(self.plan["ids_a_descargar"]),
+            "incremental": self.plan["incremental"],
+        }
+
+    def begin(self, item_ids, ids_a_descargar, listado, incremental, base_snapshot, omitidas=0, df_conservadas=None,
+              last_updated=None):
+        """Empieza un checkpoint nuevo (borra el anterior) con el plan de la extracción.
+
+        `last_updated` ({item_id: last_updated} de la revisión incremental) se guarda para
+        que al reanudar la descarga siga usando la caché de publicaciones.
+        """
+        self.clear()
+        os.makedirs(self.staging_dir)
+        if df_conservadas is not None:
+            normalize_snapshot(df_conservadas).to_parquet(self._path(KEPT_FILE), index=False)
+        self.plan = {
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "incremental": incremental,
+            "base_snapshot": base_snapshot,
+            "item_ids": item_ids,
+            "ids_a_descargar": ids_a_descargar,
+            "listado": listado,
+            "omitidas": omitidas,
+            "conservadas": df_conservadas is not None,
+            "last_updated": last_updated,
+        }
+        self.progress = {"procesadas": 0, "partes": [], "sku_estrategias": {}}
+        _write_json(self._path(PLAN_FILE), self.plan)
+        _write_json(self._path(PROGRESS_FILE), self.progress)
+
+    def save(self, rows, procesadas, sku_counts):
+        """Guarda las filas descargadas desde el último checkpoint y el avance (`procesadas` de ids_a_descargar)."""
+        partes = list(self.progress["partes"])
+        if rows:
+            parte = f"parte_{len(partes):05d}.parquet"
+            tmp_path = self._path(parte + ".tmp")
+            normalize_snapshot(pd.DataFrame(rows)).to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._path(parte))
+            partes.append(parte)
+        self.progress = {"procesadas": procesadas, "partes": partes, "sku_estrategias": dict(sku_counts)}
+        _write_json(self._path(PROGRESS_FILE), self.progress)
+        logger.debug(f"Checkpoint de extracción: {procesadas}/{len(self.plan['ids_a_descargar'])} publicaciones")
+
+    def rows(self):
+        """Las filas guardadas (conservadas del inventario anterior y descargadas), o None si no hay."""
+        frames = []
+        if self.plan["conservadas"]:
+            frames.append(pd.read_parquet(self._path(KEPT_FILE)))
+        frames.extend(pd.read_parquet(self._path(parte)) for parte in self.progress["partes"])
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def clear(self):
+        """Borra el área de trabajo (al terminar una extracción o al descartar el checkpoint)."""
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+        self.plan = self.progress = None
@@ -2,6 +2,7 @@ import requests
 import json
 import os
 import sys
+import time
 
 def get_access_token(app_id, client_secret):
     """
@@ -49,7 +50,9 @@ def main():
         print(f"User ID: {token_info.get('user_id')}")
         print(f"Refresh Token: {token_info.get('refresh_token', 'No disponible')}")
         
-        # Guardar en un archivo para referencia
+        # Guardar en un archivo para referencia; la app lo usa para saber cuándo renovar el token
+        if token_info.get('expires_in'):
+            token_info['expires_at'] = time.time() + token_info['expires_in']
         with open("ml_token_info.json", "w") as f:
             json.dump(token_info, f, indent=2)
         print("\nLa información del token se ha guardado en ml_token_info.json")
@@ -0,0 +1,222 @@
+"""Extracción, procesamiento y sincronización de inventario sin la interfaz de Streamlit.
+
+Pensado para cron: usa las mismas funciones que app.py y escribe el mismo historial
+(inventario_ml_historial/, inventario_proveedor_historial/, inventario.db), el mismo
+app.log y los mismos logs/log_*.txt de cada sincronización.
+
+    python inventario_cli.py extraer [--completa] [--sin-reanudar]
+    python inventario_cli.py procesar inventario_proveedor.xlsx [--salida cambios.xlsx]
+    python inventario_cli.py sincronizar inventario_proveedor.xlsx [--extraer]
+
+Las credenciales y opciones se leen como en la app: variables de entorno en Render o
+`.streamlit/secrets.toml` (y si no están ahí, variables de entorno).
+"""
+import argparse
+import os
+import signal
+import sys
+import tomllib
+import uuid
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+# Códigos de salida
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CANCELLED = 130
+
+
+def load_secrets(path=SECRETS_PATH):
+    """Lee secrets.toml sin Streamlit; devuelve {} si no existe."""
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def get_setting(secrets, env_var, secrets_key, default=None, section="mercadolibre"):
+    """Igual que get_setting de app.py: variables de entorno en Render, si no secrets.toml y luego el entorno."""
+    if "RENDER" in os.environ:
+        return os.environ.get(env_var, default)
+    return secrets.get(section, {}).get(secrets_key, os.environ.get(env_var, default))
+
+
+def build_client(secrets):
+    from item_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ItemCache
+    from ml_client import TOKEN_FILE, MercadoLibreClient
+
+    access_token = get_setting(secrets, "MERCADOLIBRE_ACCESS_TOKEN", "access_token")
+    if not access_token:
+        raise SystemExit("El token de acceso de Mercado Libre no está configurado.")
+    return MercadoLibreClient(
+        access_token,
+        get_setting(secrets, "MERCADOLIBRE_CLIENT_ID", "client_id"),
+        get_setting(secrets, "MERCADOLIBRE_CLIENT_SECRET", "client_secret"),
+        base_url=get_setting(secrets, "MERCADOLIBRE_API_URL", "api_url"),
+        token_file=get_setting(secrets, "MERCADOLIBRE_TOKEN_FILE", "token_file", TOKEN_FILE),
+        item_cache=ItemCache(
+            get_setting(secrets, "ITEM_CACHE_PATH", "item_cache_path", DEFAULT_CACHE_PATH),
+            int(get_setting(secrets, "ITEM_CACHE_MAX_MB", "item_cache_max_mb", DEFAULT_MAX_BYTES // 2**20)) * 2**20,
+        ),
+    )
+
+
+def open_store():
+    """La base de inventarios, con los archivos del historial que falten ya registrados (como al abrir la app)."""
+    from inventory_store import InventoryStore
+    from snapshots import list_ml_snapshots, load_snapshot, migrate_xlsx_snapshots
+
+    inventory_store = InventoryStore()
+    migrate_xlsx_snapshots()
+    inventory_store.import_snapshot_files(list_ml_snapshots(), load_snapshot)
+    return inventory_store
+
+
+def run_extract(args, secrets, logger):
+    from extraction import run_extraction_job
+
+    client = build_client(secrets)
+    job_state = {"id": uuid.uuid4().hex[:8], "status": "running", "progress": 0, "text": ""}
+
+    def cancel(signum, frame):
+        # Detener en el siguiente paso para que se guarde el checkpoint
+        logger.warning(f"Señal {signum} recibida; cancelando la extracción")
+        job_state["status"] = "cancelled"
+
+    # Los manejadores anteriores se restauran al terminar, también si la extracción falla
+    previous_handlers = {signum: signal.signal(signum, cancel) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        resultado = run_extraction_job(
+            job_state, client, open_store(),
+            workers=args.hilos or int(get_setting(secrets, "ML_EXTRACTION_WORKERS", "extraction_workers", 4)),
+            rate_limit=args.tasa or float(get_setting(secrets, "ML_RATE_LIMIT", "rate_limit", 10.0)),
+            incremental=not args.completa,
+            resume=not args.sin_reanudar,
+        )
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+    if resultado is None:
+        print("Extracción cancelada; el avance quedó guardado para reanudarla.")
+        return EXIT_CANCELLED
+    if resultado.get("error"):
+        print(resultado["error"], file=sys.stderr)
+        return EXIT_ERROR
+    print(f"Inventario extraído (snapshot {resultado['snapshot_id']}, {resultado['fecha']}).")
+    if resultado.get("sin_sku"):
+        print(f"{resultado['sin_sku_count']} variaciones sin SKU; reporte en {resultado['sin_sku_reporte']}")
+    return EXIT_OK
+
+
+def process_provider(path, inventory_store, logger):
+    """Registra el archivo del proveedor y lo aplica al último inventario; devuelve (df_ml, df_actualizar, resumen)."""
+    from inventory_sync import apply_provider_stock
+    from provider_reader import import_provider_file
+
+    snapshot_id = inventory_store.latest_snapshot_id("ml")
+    if snapshot_id is None:
+        raise SystemExit("No hay un inventario de Mercado Libre; ejecuta primero `extraer`.")
+    with open(path, "rb") as f:
+        inventario, _, resumen, file_path = import_provider_file(f, os.path.basename(path))
+    inventory_store.save_provider_stock(inventario, source=file_path)
+
+    df_ml = apply_provider_stock(inventory_store.load_ml_snapshot(snapshot_id), inventario)
+    df_actualizar = df_ml[df_ml["cambio"]].copy()
+    logger.info(f"Procesamiento completado: {len(df_actualizar)} variantes con cambios")
+    print(
+        f"Proveedor: {resumen['validas']} filas válidas, {resumen['rechazadas']} rechazadas. "
+        f"Variaciones a actualizar: {len(df_actualizar)} de {len(df_ml)}."
+    )
+    return df_ml, df_actualizar, resumen
+
+
+def run_process(args, secrets, logger):
+    from provider_reader import ProviderFileError
+
+    try:
+        _, df_actualizar, _ = process_provider(args.archivo, open_store(), logger)
+    except ProviderFileError as e:
+        logger.error(f"Archivo de proveedor inválido: {e}")
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    if args.salida:
+        df_actualizar[["item_id", "título", "sku", "stock", "stock_nuevo"]].to_excel(args.salida, index=False)
+        print(f"Cambios guardados en {args.salida}")
+    return EXIT_OK
+
+
+def run_sync(args, secrets, logger):
+    from inventory_sync import sync_inventory
+    from provider_reader import ProviderFileError
+
+    if args.extraer:
+        code = run_extract(args, secrets, logger)
+        if code != EXIT_OK:
+            return code
+    try:
+        df_ml, df_actualizar, _ = process_provider(args.archivo, open_store(), logger)
+    except ProviderFileError as e:
+        logger.error(f"Archivo de proveedor inválido: {e}")
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+
+    resultado = sync_inventory(
+        build_client(secrets), df_ml, df_actualizar,
+        workers=int(get_setting(secrets, "ML_SYNC_WORKERS", "sync_workers", 4)),
+    )
+    print(
+        f"Sincronización: {resultado['exito']} actualizaciones exitosas, {resultado['error']} errores, "
+        f"{resultado['escrituras']} peticiones de escritura."
+    )
+    print(f"Log: {os.path.join('logs', resultado['log_file'])}")
+    for error in resultado["errores"]:
+        print(f"  - {error}", file=sys.stderr)
+    return EXIT_ERROR if resultado["error"] else EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Gestor de inventarios sin interfaz (para cron).")
+    commands = parser.add_subparsers(dest="comando", required=True)
+
+    def add_extraction_options(command):
+        command.add_argument("--completa", action="store_true", help="Forzar extracción completa (no incremental).")
+        command.add_argument("--sin-reanudar", action="store_true", help="Descartar el avance de una extracción interrumpida.")
+        command.add_argument("--hilos", type=int, help="Hilos en paralelo (por defecto ML_EXTRACTION_WORKERS o 4).")
+        command.add_argument("--tasa", type=float, help="Peticiones por segundo (por defecto ML_RATE_LIMIT o 10).")
+
+    extract = commands.add_parser("extraer", help="Extrae el inventario de Mercado Libre y lo guarda en el historial.")
+    add_extraction_options(extract)
+    extract.set_defaults(run=run_extract)
+
+    process = commands.add_parser("procesar", help="Aplica el archivo del proveedor al último inventario sin enviar nada.")
+    process.add_argument("archivo", help="Inventario del proveedor (.xlsx, .csv, .tsv o .txt).")
+    process.add_argument("--salida", help="Guardar las variaciones a actualizar en este .xlsx.")
+    process.set_defaults(run=run_process)
+
+    sync = commands.add_parser("sincronizar", help="Procesa el archivo del proveedor y envía los cambios a Mercado Libre.")
+    sync.add_argument("archivo", help="Inventario del proveedor (.xlsx, .csv, .tsv o .txt).")
+    sync.add_argument("--extraer", action="store_true", help="Extraer el inventario antes de sincronizar.")
+    add_extraction_options(sync)
+    sync.set_defaults(run=run_sync)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from logging_setup import LOG_SETTINGS, component_logger, configure_logging
+    from metrics import METRICS, METRICS_DIR
+
+    secrets = load_secrets()
+    configure_logging({key: get_setting(secrets, env_var, key, section="logging") for key, env_var in LOG_SETTINGS.items()})
+    METRICS.configure(get_setting(secrets, "METRICS_FILE_CLI", "prometheus_file_cli", os.path.join(METRICS_DIR, "cli.prom"), section="metrics"))
+    logger = component_logger("sync")
+    logger.info(f"CLI: {args.comando}")
+    try:
+        return args.run(args, secrets, logger)
+    finally:
+        METRICS.export()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from snapshots import normalize_snapshot
+
+logger = logging.getLogger("inventarios-app")
+
+DEFAULT_DB_PATH = os.environ.get("INVENTARIO_DB_PATH", "inventario.db")
+# Inventarios de cada tipo que se conservan; el Auditor busca SKU en los últimos 30
+DEFAULT_MAX_SNAPSHOTS = int(os.environ.get("INVENTARIO_DB_MAX_SNAPSHOTS", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    source TEXT,
+    row_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_kind_created ON snapshots (kind, created_at);
+
+CREATE TABLE IF NOT EXISTS listings (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    item_id TEXT NOT NULL,
+    status TEXT,
+    titulo TEXT,
+    last_updated TEXT,
+    PRIMARY KEY (snapshot_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_listings_item_id ON listings (item_id);
+
+CREATE TABLE IF NOT EXISTS variations (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    variation_id INTEGER,
+    sku TEXT,
+    stock INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_variations_sku ON variations (sku, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_variations_item_id ON variations (item_id, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_variations_variation_id ON variations (variation_id);
+
+CREATE TABLE IF NOT EXISTS provider_stock (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    sku TEXT NOT NULL,
+    existencias REAL,
+    PRIMARY KEY (snapshot_id, sku)
+);
+"""
+
+ML_SNAPSHOT_QUERY = """
+SELECT l.status, v.item_id, l.titulo AS "título", v.sku, v.variation_id AS "variación_id",
+       v.stock, l.last_updated
+FROM variations v
+JOIN listings l ON l.snapshot_id = v.snapshot_id AND l.item_id = v.item_id
+WHERE v.snapshot_id = ?
+ORDER BY v.position
+"""
+
+
+class InventoryStore:
+    """Almacén SQLite de inventarios: snapshots, publicaciones y variaciones indexadas.
+
+    A diferencia del historial de archivos (limitado a 3), aquí se conservan los últimos
+    `max_snapshots` inventarios de cada tipo, de modo que consultas como "todas las
+    variaciones del SKU X en los últimos 30 inventarios" se resuelven con los índices sin
+    leer archivos completos. Al guardar uno nuevo se borran los que exceden ese límite.
+    Cada operación abre su propia conexión, así que se puede usar desde varios hilos.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_snapshots=DEFAULT_MAX_SNAPSHOTS):
+        self.db_path = db_path
+        self.max_snapshots = max(1, int(max_snapshots))
+        self.write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Conexión de corta duración: confirma la transacción al salir y siempre se cierra."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _prune(self, conn, kind):
+        """Borra los snapshots de `kind` más antiguos que los últimos max_snapshots (con sus filas)."""
+        cursor = conn.execute(
+            """
+            DELETE FROM snapshots WHERE kind = ? AND id NOT IN (
+                SELECT id FROM snapshots WHERE kind = ? ORDER BY created_at DESC, id DESC LIMIT ?
+            )
+            """,
+            (kind, kind, self.max_snapshots)
+        )
+        if cursor.rowcount:
+            logger.info(f"Se eliminaron {cursor.rowcount} inventarios antiguos ({kind}) de la base de datos")
+
+    # ---- Inventarios de Mercado Libre ----
+    def save_ml_snapshot(self, df_inv, source=None, created_at=None):
+        """Guarda un inventario de Mercado Libre y devuelve el id del snapshot."""
+        df = normalize_snapshot(df_inv)
+        created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        listings = df.drop_duplicates("item_id")[["item_id", "status", "título", "last_updated"]]
+        listing_rows = [
+            (item_id, status, titulo, last_updated)
+            for item_id, status, titulo, last_updated in listings.astype(object).where(listings.notna(), None).itertuples(index=False)
+        ]
+        variation_rows = [
+            (position, item_id, None if pd.isna(variation_id) else int(variation_id), sku, int(stock))
+            for position, (item_id, variation_id, sku, stock) in enumerate(
+                df[["item_id", "variación_id", "sku", "stock"]].astype(object).itertuples(index=False)
+            )
+        ]
+
+        with self.write_lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO snapshots (kind, created_at, source, row_count) VALUES ('ml', ?, ?, ?)",
+                (created_at, source, len(df))
+            )
+            snapshot_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO listings (snapshot_id, item_id, status, titulo, last_updated) VALUES (?, ?, ?, ?, ?)",
+                [(snapshot_id, *row) for row in listing_rows]
+            )
+            conn.executemany(
+                "INSERT INTO variations (snapshot_id, position, item_id, variation_id, sku, stock) VALUES (?, ?, ?, ?, ?, ?)",
+                [(snapshot_id, *row) for row in variation_rows]
+            )
+            self._prune(conn, "ml")
+        logger.info(f"Inventario guardado en la base de datos como snapshot {snapshot_id} ({len(df)} variantes)")
+        return snapshot_id
+
+    def load_ml_snapshot(self, snapshot_id=None):
+        """Devuelve un inventario de Mercado Libre (el más reciente si no se indica id), o None."""
+        if snapshot_id is None:
+            snapshot_id = self.latest_snapshot_id("ml")
+            if snapshot_id is None:
+                return None
+        with self._connect() as conn:
+            df = pd.read_sql_query(ML_SNAPSHOT_QUERY, conn, params=(snapshot_id,))
+        return normalize_snapshot(df)
+
+    def iter_ml_snapshot(self, snapshot_id, chunksize=100_000):
+        """Recorre un inventario de Mercado Libre en bloques de `chunksize` variantes, en su orden original."""
+        with self._connect() as conn:
+            for chunk in pd.read_sql_query(ML_SNAPSHOT_QUERY, conn, params=(snapshot_id,), chunksize=chunksize):
+                yield normalize_snapshot(chunk)
+
+    def latest_snapshot_id(self, kind="ml"):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM snapshots WHERE kind = ? ORDER BY created_at DESC, id DESC LIMIT 1", (kind,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_snapshot(self, snapshot_id):
+        """Metadatos de un snapshot como diccionario, o None si no existe."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_snapshots(self, kind="ml", limit=None):
+        """Snapshots guardados, del más reciente al más antiguo."""
+        query = "SELECT id, kind, created_at, source, row_count FROM snapshots WHERE kind = ? ORDER BY created_at DESC, id DESC"
+        params = [kind]
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._connect() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def has_source(self, source):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM snapshots WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def import_snapshot_files(self, paths, loader):
+        """Importa al almacén los archivos del historial que todavía no estén registrados."""
+        imported = []
+        for path in sorted(paths, key=os.path.getmtime):
+            if self.has_source(path):
+                continue
+            try:
+                created_at = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+                imported.append(self.save_ml_snapshot(loader(path), source=path, created_at=created_at))
+            except Exception as e:
+                logger.error(f"No se pudo importar {path} a la base de datos: {e}")
+        return imported
+
+    # ---- Consultas ----
+    def variations_for_sku(self, sku, last_n=30):
+        """Todas las variaciones con ese SKU en los últimos `last_n` inventarios de Mercado Libre."""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                """
+                SELECT s.id AS snapshot_id, s.created_at, v.item_id, l.titulo AS "título",
+                       v.variation_id AS "variación_id", v.sku, v.stock, l.status
+                FROM (SELECT id, created_at FROM snapshots WHERE kind = 'ml'
+                      ORDER BY created_at DESC, id DESC LIMIT ?) s
+                JOIN variations v ON v.snapshot_id = s.id AND v.sku = ?
+                JOIN listings l ON l.snapshot_id = v.snapshot_id AND l.item_id = v.item_id
+                ORDER BY s.created_at DESC, v.item_id, v.variation_id
+                """,
+                conn, params=(int(last_n), sku)
+            )
+
+    # ---- Inventarios del proveedor ----
+    def save_provider_stock(self, inventario_dict, source=None):
+        """Guarda las existencias del proveedor ({sku: existencias}) y devuelve el id del snapshot."""
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.write_lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO snapshots (kind, created_at, source, row_count) VALUES ('proveedor', ?, ?, ?)",
+                (created_at, source, len(inventario_dict))
+            )
+            snapshot_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR REPLACE INTO provider_stock (snapshot_id, sku, existencias) VALUES (?, ?, ?)",
+                [(snapshot_id, str(sku), float(existencias)) for sku, existencias in inventario_dict.items()]
+            )
+            self._prune(conn, "proveedor")
+        return snapshot_id
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+
+logger = logging.getLogger("inventarios-app.sync")
+
+SYNC_JOB = "sincronizacion"
+
+
+def apply_provider_stock(df_ml, inventario):
+    """Calcula stock_nuevo y cambio para todo el inventario de Mercado Libre en una sola pasada.
+
+    `inventario` es un Series o diccionario {sku: existencias}. Aplica la regla de
+    seguridad: cualquier stock menor o igual a 3 se envía como 0.
+    """
+    df_ml = df_ml.copy()
+    stock_nuevo = df_ml["sku"].map(inventario).astype("float64").fillna(0).to_numpy().astype(np.int64)
+    stock_nuevo[stock_nuevo <= 3] = 0
+    df_ml["stock_nuevo"] = stock_nuevo
+    df_ml["cambio"] = df_ml["stock"].to_numpy().astype(np.int64) != stock_nuevo
+    return df_ml
+
+
+def changed_listings(df_ml):
+    """Todas las variantes de las publicaciones con algún cambio: lo único que necesita sync_inventory.
+
+    No bastan las filas que cambian, porque cada payload lleva TODAS las variantes de la
+    publicación (ver build_sync_plan); el resto del inventario no hace falta.
+    """
+    df = df_ml[df_ml["item_id"].isin(df_ml.loc[df_ml["cambio"], "item_id"])].copy()
+    # Con un inventario compacto (snapshots.compact_snapshot) las columnas categóricas
+    # arrastrarían las categorías de todo el inventario
+    for column in df.select_dtypes("category").columns:
+        df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+def build_sync_plan(df_ml, item_ids):
+    """Arma los payloads de todas las publicaciones a actualizar y la lista a pausar en una pasada.
+
+    Agrupa una sola vez por item_id (orden estable, conservando el orden de las variantes)
+    en lugar de filtrar df_ml por cada publicación. Cada payload incluye TODAS las
+    variantes de la publicación, no solo las que cambian: esto es CRÍTICO para evitar que
+    Mercado Libre elimine variantes por omisión.
+
+    Devuelve (updates, items_a_pausar) donde updates es una lista de
+    (item_id, payload, n_variantes) en el orden de item_ids.
+    """
+    codes, uniques = pd.factorize(df_ml["item_id"])
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(order)]
+
+    variation_ids = df_ml["variación_id"].astype("float64").to_numpy()[order]
+    stock_nuevo = df_ml["stock_nuevo"].to_numpy().astype(np.int64)[order]
+    stock = df_ml["stock"].to_numpy().astype(np.int64)[order]
+
+    total_nuevo = np.add.reduceat(stock_nuevo, starts) if len(starts) else np.array([], dtype=np.int64)
+    total_original = np.add.reduceat(stock, starts) if len(starts) else np.array([], dtype=np.int64)
+
+    # Pausar publicaciones que quedan en 0 y que antes tenían stock
+    a_pausar = np.flatnonzero((total_nuevo == 0) & (total_original > 0))
+    items_a_pausar = sorted(uniques[a_pausar].tolist())
+
+    # Listas de Python para armar los payloads sin convertir escalares de numpy uno por uno
+    group_of = {item_id: group for group, item_id in enumerate(uniques)}
+    starts, ends = starts.tolist(), ends.tolist()
+    variation_ids, stock_nuevo = variation_ids.tolist(), stock_nuevo.tolist()
+    updates = []
+    for item_id in item_ids:
+        group = group_of[item_id]
+        start, end = starts[group], ends[group]
+        if variation_ids[start] != variation_ids[start]:  # NaN: publicación sin variaciones
+            payload = {"available_quantity": stock_nuevo[start]}
+        else:
+            payload = {"variations": [
+                {"id": int(variation_id), "available_quantity": quantity}
+                for variation_id, quantity in zip(variation_ids[start:end], stock_nuevo[start:end])
+            ]}
+        updates.append((item_id, payload, end - start))
+    return updates, items_a_pausar
+
+
+def _rejects_combined_status(details):
+    """True si el cuerpo de un 400 indica que la API no acepta `status` en el mismo PUT.
+
+    Mercado Libre responde {"message", "error", "cause": [{"code", "message"}]}; se revisan
+    esos textos (no las claves del JSON) para no confundir un error de las variaciones con
+    un rechazo del estado.
+    """
+    try:
+        body = json.loads(details or "")
+    except ValueError:
+        return "status" in (details or "").lower()
+    if not isinstance(body, dict):
+        return False
+    textos = [body.get("message"), body.get("error")]
+    for cause in body.get("cause") or []:
+        if isinstance(cause, dict):
+            textos.extend([cause.get("code"), cause.get("message")])
+    return any("status" in str(texto).lower() for texto in textos if texto)
+
+
+def sync_inventory(client, df_ml, df_actualizar, workers=4, progress_callback=None, combine_pause=True):
+    """Envía a Mercado Libre las actualizaciones de stock y pausa las publicaciones que quedan en 0.
+
+    Cada publicación es una sola tarea (hasta `workers` en paralelo, bajo el limitador de
+    tasa del cliente). Si además hay que pausarla, con `combine_pause` el estado "paused"
+    viaja en el mismo PUT que las cantidades. Ante un 400 esa publicación se reenvía como
+    dos PUT (cantidades y pausa) dentro de la misma tarea; solo si el 400 señala el campo
+    status y las cantidades solas sí se aceptan, el resto de la sincronización deja de
+    combinar. Un 400 por un payload inválido afecta solo a su publicación. Así las pausas
+    avanzan a la par de las demás actualizaciones en lugar de esperar a que terminen todas.
+
+    El log se arma al final en el mismo orden que df_actualizar, así que el resultado no
+    depende del orden en que terminen las peticiones. progress_callback(hechas, total,
+    texto) se llama desde el hilo que invoca esta función. El resultado incluye
+    `escrituras`, el número de PUT enviados.
+    """
+    item_ids = list(df_actualizar['item_id'].unique())
+    with METRICS.phase(SYNC_JOB, "plan"):
+        updates, items_a_pausar = build_sync_plan(df_ml, item_ids)
+    n_variantes = {item_id: n for item_id, _, n in updates}
+    # Una publicación que pasa a 0 siempre tiene cambios, así que ya está en updates
+    items_a_pausar = [item_id for item_id in items_a_pausar if item_id in n_variantes]
+    pausar = set(items_a_pausar)
+    total = len(updates)
+    hechas = 0
+    # Se activa (para toda la sincronización, desde cualquier hilo) cuando la API rechaza el
+    # estado junto con las cantidades
+    separar = threading.Event()
+    if not combine_pause:
+        separar.set()
+
+    def report(texto):
+        if progress_callback:
+            progress_callback(hechas, total, texto)
+
+    def write(item_id, payload):
+        """Actualiza (y si corresponde pausa) una publicación; devuelve (resultado, resultado_pausa, escrituras)."""
+        if "variations" in payload:
+            logger.info(f"Actualizando {item_id} con {len(payload['variations'])} variantes")
+        else:
+            logger.info(f"Actualizando {item_id} sin variantes")
+        escrituras = 0
+        rechazo_status = False
+        if item_id in pausar and not separar.is_set():
+            result = client.update_item_stock_safe(item_id, {**payload, "status": "paused"})
+            escrituras += 1
+            if result["success"]:
+                logger.info(f"Item {item_id} pausado en la misma actualización")
+                return result, {"success": True}, escrituras
+            if result.get("status") != 400:
+                return result, {"success": False, "error": result.get("error", "Error desconocido")}, escrituras
+            logger.warning(f"La API rechazó la actualización combinada de {item_id} (400); se reenvía en dos PUT")
+            rechazo_status = _rejects_combined_status(result.get("details"))
+        result = client.update_item_stock_safe(item_id, payload)
+        escrituras += 1
+        if rechazo_status and result["success"] and not separar.is_set():
+            # Las cantidades solas pasaron: lo rechazado era el estado en el mismo PUT
+            logger.warning("La API no acepta status junto con las cantidades; el resto de la sincronización usa dos PUT")
+            separar.set()
+        pause_result = None
+        if item_id in pausar:
+            pause_result = client.pause_item(item_id)
+            escrituras += 1
+        return result, pause_result, escrituras
+
+    logger.info(
+        f"Iniciando sincronización de {len(item_ids)} publicaciones ({len(items_a_pausar)} a pausar) con {workers} hilo(s)"
+    )
+    report("Actualizando publicaciones...")
+    update_results = {}
+    pause_results = {}
+    escrituras = 0
+    with ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="ml-sync") as executor:
+        phase_start = time.perf_counter()
+        futures = {executor.submit(write, item_id, payload): item_id for item_id, payload, _ in updates}
+        for future in as_completed(futures):
+            item_id = futures[future]
+            try:
+                update_results[item_id], pause_result, n_escrituras = future.result()
+                escrituras += n_escrituras
+                if pause_result is not None:
+                    pause_results[item_id] = pause_result
+            except Exception as e:
+                logger.error(f"Excepción al actualizar {item_id}: {str(e)}")
+                update_results[item_id] = {"success": False, "error": str(e), "details": ""}
+                if item_id in pausar:
+                    pause_results[item_id] = {"success": False, "error": str(e)}
+            hechas += 1
+            report(f"Actualizando {hechas}/{total}")
+        METRICS.observe_phase(SYNC_JOB, "actualizaciones", time.perf_counter() - phase_start)
+
+    # Armar el log en orden determinista
+    log = []
+    errores_tipo = {}
+    exito_count = 0
+    error_count = 0
+    for item_id in item_ids:
+        update_result = update_results[item_id]
+        if update_result["success"]:
+            exito_count += n_variantes[item_id]
+            log.append(f"✔️ {item_id}: Actualizado correctamente ({n_variantes[item_id]} variantes/items).")
+        else:
+            error_count += n_variantes[item_id]
+            error_msg = update_result.get("error", "Error desconocido")
+            details = update_result.get("details", "")
+            full_error = f"{error_msg} - {details}" if details else error_msg
+            log.append(f"❌ {item_id}: Error en actualización. Causa: {full_error}")
+            errores_tipo[error_msg] = True
+
+    for item_id in items_a_pausar:
+        pause_result = pause_results[item_id]
+        if pause_result["success"]:
+            log.append(f"⏸️ {item_id}: Publicación pausada correctamente.")
+        else:
+            error_msg_pause = pause_result.get("error", "Error desconocido")
+            log.append(f"❌ {item_id}: Error al pausar. Causa: {error_msg_pause}")
+            errores_tipo[f"Error al pausar: {error_msg_pause}"] = True
+
+    log.append(f"Peticiones de escritura: {escrituras} para {len(item_ids)} publicaciones ({len(items_a_pausar)} pausadas).")
+    log_filename = write_sync_log(log)
+    logger.info(
+        f"Sincronización completada: {exito_count} éxitos, {error_count} errores, "
+        f"{escrituras} peticiones de escritura para {len(item_ids)} publicaciones"
+    )
+    METRICS.export()
+    return {
+        "log": log,
+        "errores": list(errores_tipo),
+        "exito": exito_count,
+        "error": error_count,
+        "escrituras": escrituras,
+        "log_file": log_filename
+    }
+
+
+def write_sync_log(log, log_dir="logs"):
+    """Guarda el log de la sincronización en logs/log_<fecha>.txt y devuelve el nombre del archivo."""
+    log_filename = f"log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    with open(os.path.join(log_dir, log_filename), "w") as f:
+        f.write("\n".join(log))
+    return log_filename
@@ -0,0 +1,139 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("inventarios-app.http")
+
+DEFAULT_CACHE_PATH = os.environ.get("ITEM_CACHE_PATH", "cache_items.db")
+# Tamaño máximo de las respuestas guardadas; al pasarlo se descartan las menos usadas
+DEFAULT_MAX_BYTES = 200 * 2**20
+# Al desalojar se baja hasta esta fracción del máximo para no desalojar en cada escritura
+EVICT_TO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    last_updated TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_last_access ON items (last_access);
+"""
+
+
+class ItemCache:
+    """Caché en disco de las publicaciones descargadas, con su ETag, Last-Modified y last_updated.
+
+    get() devuelve la respuesta guardada y los encabezados para una petición condicional
+    (If-None-Match / If-Modified-Since); si la API contesta 304 se reutiliza el cuerpo
+    guardado. El multiget no trae validadores HTTP, así que sus publicaciones se guardan
+    con su `last_updated` (store_many) y get_current() las devuelve mientras ese valor
+    coincida con el que reporta la API. Solo se guardan respuestas con algún validador.
+    El total de bytes se limita a `max_bytes` desalojando las entradas usadas hace más
+    tiempo (LRU); los aciertos y fallos se cuentan en metrics.METRICS. Cada operación
+    abre su propia conexión, así que se puede usar desde varios hilos.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = int(max_bytes)
+        self.lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if "last_updated" not in {row[1] for row in conn.execute("PRAGMA table_info(items)")}:
+                # Cachés creadas antes de guardar las publicaciones del multiget
+                conn.execute("ALTER TABLE items ADD COLUMN last_updated TEXT")
+            self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM items").fetchone()[0]
+
+    @contextmanager
+    def _connect(self):
+        """Conexión de corta duración: confirma la transacción al salir y siempre se cierra."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, item_id):
+        """Devuelve (cuerpo, encabezados condicionales) de la respuesta guardada, o None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, body FROM items WHERE item_id = ?", (item_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return body, headers
+
+    def get_current(self, last_updated):
+        """Cuerpos guardados de las publicaciones cuyo last_updated sigue siendo el de `last_updated` ({item_id: valor})."""
+        if not last_updated:
+            return {}
+        placeholders = ",".join("?" * len(last_updated))
+        with self.lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT item_id, last_updated, body FROM items WHERE item_id IN ({placeholders})", list(last_updated)
+            ).fetchall()
+            current = {item_id: body for item_id, updated, body in rows if updated and updated == last_updated[item_id]}
+            conn.executemany(
+                "UPDATE items SET last_access = ? WHERE item_id = ?", [(time.time(), item_id) for item_id in current]
+            )
+        return current
+
+    def hit(self, item_id):
+        """Registra un 304: la respuesta guardada sigue vigente y pasa a ser la más reciente."""
+        with self.lock, self._connect() as conn:
+            conn.execute("UPDATE items SET last_access = ? WHERE item_id = ?", (time.time(), item_id))
+
+    def store(self, item_id, body, etag=None, last_modified=None, last_updated=None):
+        """Guarda una respuesta 200 de GET /items/{id}; sin ningún validador no se guarda."""
+        self.store_many([(item_id, body, etag, last_modified, last_updated)])
+
+    def store_many(self, entries):
+        """Guarda varias publicaciones en una sola transacción: tuplas (item_id, cuerpo, etag, last_modified, last_updated)."""
+        entries = [entry for entry in entries if any(entry[2:]) and len(entry[1]) <= self.max_bytes]
+        if not entries:
+            return
+        with self.lock, self._connect() as conn:
+            for item_id, body, etag, last_modified, last_updated in entries:
+                previous = conn.execute("SELECT size FROM items WHERE item_id = ?", (item_id,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO items (item_id, etag, last_modified, last_updated, body, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (item_id, etag, last_modified, last_updated, body, len(body), time.time())
+                )
+                self.total_bytes += len(body) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        """Borra las entradas menos usadas hasta bajar a EVICT_TO del máximo (con self.lock tomado)."""
+        target = self.max_bytes * EVICT_TO
+        freed = 0
+        evicted = []
+        for item_id, size in conn.execute("SELECT item_id, size FROM items ORDER BY last_access"):
+            if self.total_bytes - freed <= target:
+                break
+            evicted.append((item_id,))
+            freed += size
+        conn.executemany("DELETE FROM items WHERE item_id = ?", evicted)
+        self.total_bytes -= freed
+        logger.debug(f"Caché de publicaciones: {len(evicted)} entradas desalojadas ({freed} bytes)")
+
+    def clear(self):
+        with self.lock, self._connect() as conn:
+            conn.execute("DELETE FROM items")
+            self.total_bytes = 0
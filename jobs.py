@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from metrics import METRICS
+
+logger = logging.getLogger("inventarios-app")
+
+RUNNING = "running"
+# Se pidió cancelar pero el hilo todavía no termina (p. ej. está guardando el checkpoint)
+CANCELLING = "cancelling"
+DONE = "done"
+CANCELLED = "cancelled"
+ERROR = "error"
+
+
+def job_active(job):
+    """True mientras el hilo del trabajo no haya publicado su estado final."""
+    return job is not None and job["status"] in (RUNNING, CANCELLING)
+
+
+def cancel_requested(job_state):
+    """Lo que consulta el código de un trabajo para saber si debe detenerse."""
+    return job_state is not None and job_state.get("status") in (CANCELLING, CANCELLED)
+
+
+class JobRegistry:
+    """Registro de trabajos en segundo plano compartido por todas las sesiones del proceso.
+
+    Solo puede haber un trabajo en curso por tipo ("extraccion", ...): pedir otro mientras
+    uno corre devuelve el existente, así que cualquier pestaña puede ver su progreso y su
+    resultado. El estado de cada trabajo es un diccionario que el hilo del trabajo va
+    actualizando (progress, text, ...); el resultado se publica al terminar, bajo el lock,
+    antes de marcar el status como "done", de modo que quien vea "done" ya ve el resultado.
+
+    cancel() solo marca el trabajo como "cancelling"; el status final (cancelled, o done si
+    el trabajo ya había terminado) lo publica el hilo al salir. Hasta entonces el trabajo
+    sigue activo y no se puede lanzar otro del mismo tipo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.threads = {}
+
+    def start(self, kind, target, *args, **kwargs):
+        """Lanza target(job, *args, **kwargs) en un hilo si no hay otro trabajo de ese tipo en curso.
+
+        Devuelve (job, creado). Lo que devuelva target se publica como job["result"].
+        """
+        with self.lock:
+            current = self.jobs.get(kind)
+            thread = self.threads.get(kind)
+            if job_active(current) or (thread is not None and thread.is_alive()):
+                return current, False
+            job = {
+                "id": uuid.uuid4().hex[:8],
+                "kind": kind,
+                "status": RUNNING,
+                "progress": 0,
+                "text": "Iniciando...",
+                "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "finished_at": None,
+                "result": None,
+            }
+            self.jobs[kind] = job
+            thread = threading.Thread(
+                target=self._run, args=(job, target, args, kwargs), name=f"job-{kind}-{job['id']}", daemon=True
+            )
+            self.threads[kind] = thread
+            thread.start()
+        logger.info(f"Trabajo {kind} {job['id']} iniciado")
+        return job, True
+
+    def _run(self, job, target, args, kwargs):
+        started = time.perf_counter()
+        try:
+            result = target(job, *args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Trabajo {job['kind']} {job['id']} falló")
+            self._finish(job, ERROR, message=str(e))
+            return
+        finally:
+            METRICS.observe_phase(job["kind"], "total", time.perf_counter() - started)
+            METRICS.export()
+        if result is None:
+            # El trabajo se detuvo sin resultado (cancelado)
+            self._finish(job, CANCELLED)
+        elif result.get("error"):
+            self._finish(job, ERROR, message=result["error"])
+        else:
+            if job["status"] == CANCELLING:
+                # La cancelación llegó después del último punto en que el trabajo la revisa
+                logger.info(f"Trabajo {job['kind']} {job['id']}: la cancelación llegó cuando ya había terminado")
+            self._finish(job, DONE, result=result)
+
+    def _finish(self, job, status, result=None, message=None):
+        with self.lock:
+            job["result"] = result
+            if message:
+                job["message"] = message
+            job["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            job["status"] = status
+        logger.info(f"Trabajo {job['kind']} {job['id']} terminó con status {status}")
+
+    def get(self, kind):
+        """El trabajo en curso o el último terminado de ese tipo, o None."""
+        with self.lock:
+            return self.jobs.get(kind)
+
+    def cancel(self, kind):
+        """Pide cancelar el trabajo en curso de ese tipo; el hilo lo detecta en su siguiente paso."""
+        with self.lock:
+            job = self.jobs.get(kind)
+            if job is None or job["status"] != RUNNING:
+                return False
+            job["status"] = CANCELLING
+        logger.info(f"Cancelación solicitada para el trabajo {kind} {job['id']}")
+        return True
@@ -0,0 +1,83 @@
+import os
+import re
+import threading
+from collections import deque
+
+# Etiqueta que logging_setup agrega a los registros emitidos dentro de un trabajo
+JOB_TAG_RE = re.compile(r" - \[job ([^\]]+)\] ")
+# Las líneas de un registro empiezan con la fecha; las demás (tracebacks) continúan el anterior
+RECORD_START_RE = re.compile(r"^\d{4}-\d{2}-\d{2} ")
+
+
+class LogTail:
+    """Últimas líneas de un archivo de log, leyendo solo lo que se agregó desde la última vez.
+
+    Recuerda el desplazamiento en el archivo y guarda las líneas en un buffer circular de
+    `max_lines`, así que mostrar el panel de logs no vuelve a leer el archivo completo.
+    Detecta la rotación (el archivo cambia de inodo o se acorta) y vuelve a empezar desde
+    el inicio del archivo nuevo. Si entre dos lecturas se escribieron más de `max_read`
+    bytes, solo se leen los últimos `max_read`.
+    """
+
+    def __init__(self, path, max_lines=1000, max_read=1024 * 1024):
+        self.path = path
+        self.max_read = max_read
+        self.lines_buffer = deque(maxlen=max_lines)
+        self.lock = threading.Lock()
+        self.offset = 0
+        self.inode = None
+        self.partial = b""
+        self.last_job = None
+        self.bytes_read = 0
+
+    def poll(self):
+        """Lee las líneas nuevas del archivo; devuelve cuántas se agregaron al buffer."""
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return 0
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                # Primera lectura (empieza cerca del final) o archivo rotado (empieza desde 0)
+                self.offset = max(0, stat.st_size - self.max_read) if self.inode is None else 0
+                self.inode = stat.st_ino
+                self.partial = b""
+                aligned = self.offset == 0
+            else:
+                aligned = True
+            if stat.st_size == self.offset:
+                return 0
+
+            start = max(self.offset, stat.st_size - self.max_read)
+            if start > self.offset:
+                aligned = False
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read(stat.st_size - start)
+            self.offset = start + len(data)
+            self.bytes_read += len(data)
+
+            if aligned:
+                data = self.partial + data
+            else:
+                # Se empezó a leer a mitad del archivo: la primera línea puede estar incompleta
+                data = data.split(b"\n", 1)[1] if b"\n" in data else b""
+            *complete, self.partial = data.split(b"\n")
+            for raw in complete:
+                self._append(raw.decode("utf-8", errors="replace"))
+            return len(complete)
+
+    def _append(self, line):
+        if RECORD_START_RE.match(line):
+            match = JOB_TAG_RE.search(line)
+            self.last_job = match.group(1) if match else None
+        self.lines_buffer.append((self.last_job, line))
+
+    def lines(self, n=50, job_id=None):
+        """Las últimas `n` líneas del buffer (solo las del trabajo `job_id` si se indica)."""
+        with self.lock:
+            if job_id is None:
+                selected = [line for _, line in self.lines_buffer]
+            else:
+                selected = [line for job, line in self.lines_buffer if job == job_id]
+        return selected[-n:]
@@ -0,0 +1,152 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+BASE_LOGGER = "inventarios-app"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s -%(job_tag)s %(message)s"
+
+# Trabajo (extracción, etc.) al que pertenecen los registros del hilo actual
+current_job_id = contextvars.ContextVar("current_job_id", default=None)
+
+# Componentes con nivel propio: cada uno es un logger hijo de "inventarios-app"
+COMPONENTS = {
+    "http": f"{BASE_LOGGER}.http",
+    "sku": f"{BASE_LOGGER}.sku",
+    "extraction": f"{BASE_LOGGER}.extraction",
+    "sync": f"{BASE_LOGGER}.sync",
+    "ui": f"{BASE_LOGGER}.ui",
+}
+
+# Clave en [logging] de secrets.toml -> variable de entorno
+LOG_SETTINGS = {
+    "level": "LOG_LEVEL",
+    "http": "LOG_LEVEL_HTTP",
+    "sku": "LOG_LEVEL_SKU",
+    "extraction": "LOG_LEVEL_EXTRACTION",
+    "sync": "LOG_LEVEL_SYNC",
+    "ui": "LOG_LEVEL_UI",
+    "libraries": "LOG_LEVEL_LIBRARIES",
+    "file": "LOG_FILE",
+    "max_bytes": "LOG_MAX_BYTES",
+    "backup_count": "LOG_BACKUP_COUNT",
+    "when": "LOG_ROTATE_WHEN",
+}
+
+DEFAULTS = {
+    "level": "DEBUG",
+    "libraries": "WARNING",
+    "file": "app.log",
+    "max_bytes": 5 * 1024 * 1024,
+    "backup_count": 5,
+    "when": None,
+}
+
+_lock = threading.Lock()
+_state = {"listener": None, "handler": None, "output": None}
+
+
+def component_logger(component):
+    """Logger de un componente (http, sku, extraction, sync, ui)."""
+    return logging.getLogger(COMPONENTS[component])
+
+
+def current_log_file():
+    """Ruta del archivo de log activo (el que se configuró por última vez)."""
+    return _state["output"][0] if _state["output"] else DEFAULTS["file"]
+
+
+def set_job_id(job_id):
+    """Marca los registros que emita el hilo actual (y los contextos copiados de él) con el id del trabajo."""
+    current_job_id.set(job_id)
+
+
+class JobTagFilter(logging.Filter):
+    """Agrega `job_tag` (" [job <id>]" o vacío) a cada registro, en el hilo que lo emite."""
+
+    def filter(self, record):
+        job_id = current_job_id.get()
+        record.job_tag = f" [job {job_id}]" if job_id else ""
+        return True
+
+
+def _settings_from_env():
+    return {key: os.environ.get(env_var) for key, env_var in LOG_SETTINGS.items()}
+
+
+def _level(value, default=logging.NOTSET):
+    if value in (None, ""):
+        return default
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).strip().upper())
+    return level if isinstance(level, int) else default
+
+
+def _build_handlers(log_file, max_bytes, backup_count, when):
+    if when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count, encoding="utf-8")
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handlers = [file_handler, logging.StreamHandler()]
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging(settings=None):
+    """Configura el logging de la aplicación; se puede llamar en cada rerun sin duplicar handlers.
+
+    Los registros se encolan con un QueueHandler y un QueueListener los escribe desde un
+    hilo en segundo plano en un archivo rotativo (por tamaño o, si se indica `when`, por
+    tiempo) y en la consola. `settings` usa las claves de LOG_SETTINGS; las que falten se
+    leen de las variables de entorno. Los niveles de los componentes que no se indiquen
+    heredan el nivel general.
+    """
+    merged = _settings_from_env()
+    merged.update({key: value for key, value in (settings or {}).items() if value not in (None, "")})
+    config = {key: merged.get(key) if merged.get(key) not in (None, "") else DEFAULTS.get(key) for key in LOG_SETTINGS}
+
+    output = (config["file"], int(config["max_bytes"]), int(config["backup_count"]), config["when"] or None)
+    with _lock:
+        root = logging.getLogger()
+        if _state["output"] != output:
+            # Primera llamada o cambió el archivo/rotación: se reemplaza el listener
+            if _state["listener"] is not None:
+                _stop_listener(root)
+            log_queue = queue.SimpleQueue()
+            queue_handler = logging.handlers.QueueHandler(log_queue)
+            queue_handler.addFilter(JobTagFilter())
+            listener = logging.handlers.QueueListener(log_queue, *_build_handlers(*output), respect_handler_level=True)
+            listener.start()
+            root.addHandler(queue_handler)
+            _state.update(listener=listener, handler=queue_handler, output=output)
+
+        # Las librerías (urllib3, etc.) solo registran avisos salvo que se indique otra cosa
+        root.setLevel(_level(config["libraries"], logging.WARNING))
+        logging.getLogger(BASE_LOGGER).setLevel(_level(config["level"], logging.DEBUG))
+        for component, name in COMPONENTS.items():
+            logging.getLogger(name).setLevel(_level(config[component]))
+    return logging.getLogger(BASE_LOGGER)
+
+
+def shutdown_logging():
+    """Escribe los registros pendientes y detiene el hilo del listener."""
+    with _lock:
+        if _state["listener"] is not None:
+            _stop_listener(logging.getLogger())
+
+
+def _stop_listener(root):
+    root.removeHandler(_state["handler"])
+    _state["listener"].stop()
+    for handler in _state["listener"].handlers:
+        handler.close()
+    _state.update(listener=None, handler=None, output=None)
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,278 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger("inventarios-app")
+
+# Límites (segundos) de los histogramas de latencia y de duración de fases
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0, 30.0)
+PHASE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Resultado de una petición HTTP según su status (o la excepción)
+OUTCOMES = ("ok", "4xx", "429", "5xx", "timeout", "conexion")
+
+METRICS_DIR = "metrics"
+
+
+def request_outcome(status=None, error=None):
+    """Clasifica una petición: ok, 4xx, 429, 5xx, timeout o conexion."""
+    if error is not None:
+        return "timeout" if "Timeout" in type(error).__name__ else "conexion"
+    if status == 429:
+        return "429"
+    if status >= 500:
+        return "5xx"
+    if status >= 400:
+        return "4xx"
+    return "ok"
+
+
+class Histogram:
+    """Histograma acumulable con límites fijos (mismo modelo que Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimación del cuantil q interpolando dentro del bucket (como histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """Métricas del proceso: peticiones a Mercado Libre por endpoint y fases de cada trabajo.
+
+    Por endpoint guarda un histograma de latencia, peticiones por resultado (ok, 429,
+    5xx, timeout, ...), reintentos por motivo, segundos de espera (limitador de tasa y
+    pausas entre reintentos) y bytes recibidos; por caché de respuestas, aciertos y
+    fallos. Por trabajo (extracción, sincronización)
+    guarda la duración de cada fase. Se exporta en formato de texto de Prometheus.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.export_path = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.endpoints = {}
+            self.phases = {}
+            self.caches = {}
+
+    def configure(self, export_path=None):
+        """Archivo .prom donde export() escribe las métricas (None para no exportar)."""
+        self.export_path = export_path
+
+    def _endpoint(self, endpoint):
+        entry = self.endpoints.get(endpoint)
+        if entry is None:
+            entry = self.endpoints[endpoint] = {
+                "latencia": Histogram(LATENCY_BUCKETS),
+                "resultados": dict.fromkeys(OUTCOMES, 0),
+                "reintentos": {},
+                "espera": {},
+                "bytes": 0,
+            }
+        return entry
+
+    # ---- Registro ----
+    def observe_request(self, endpoint, elapsed, status=None, nbytes=0, error=None):
+        with self.lock:
+            entry = self._endpoint(endpoint)
+            entry["latencia"].observe(elapsed)
+            entry["resultados"][request_outcome(status, error)] += 1
+            entry["bytes"] += nbytes
+
+    def count_retry(self, endpoint, reason):
+        with self.lock:
+            retries = self._endpoint(endpoint)["reintentos"]
+            retries[reason] = retries.get(reason, 0) + 1
+
+    def add_wait(self, endpoint, reason, seconds):
+        """Suma tiempo de espera sin petición en curso (rate_limit o reintento)."""
+        if seconds <= 0:
+            return
+        with self.lock:
+            waits = self._endpoint(endpoint)["espera"]
+            waits[reason] = waits.get(reason, 0.0) + seconds
+
+    def count_cache(self, cache, result):
+        """Cuenta una consulta a una caché de respuestas (`result` es "acierto" o "fallo")."""
+        with self.lock:
+            counts = self.caches.setdefault(cache, {"acierto": 0, "fallo": 0})
+            counts[result] += 1
+
+    def observe_phase(self, job, phase, seconds):
+        with self.lock:
+            entry = self.phases.get((job, phase))
+            if entry is None:
+                entry = self.phases[(job, phase)] = {"duracion": Histogram(PHASE_BUCKETS), "ultima": 0.0}
+            entry["duracion"].observe(seconds)
+            entry["ultima"] = seconds
+
+    @contextmanager
+    def phase(self, job, phase):
+        """Mide la duración del bloque como fase `phase` del trabajo `job`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(job, phase, time.perf_counter() - start)
+
+    # ---- Consulta ----
+    def endpoint_rows(self):
+        """Una fila por endpoint con conteos, reintentos, esperas y latencia p50/p95/p99 (ms)."""
+        with self.lock:
+            rows = []
+            for endpoint, entry in sorted(self.endpoints.items()):
+                latency = entry["latencia"]
+                rows.append({
+                    "endpoint": endpoint,
+                    "peticiones": latency.count,
+                    **{f"resultado_{outcome}": entry["resultados"][outcome] for outcome in OUTCOMES},
+                    "reintentos": sum(entry["reintentos"].values()),
+                    "espera_rate_limit_s": round(entry["espera"].get("rate_limit", 0.0), 2),
+                    "espera_reintentos_s": round(entry["espera"].get("reintento", 0.0), 2),
+                    "bytes": entry["bytes"],
+                    "p50_ms": round(1000 * latency.quantile(0.5), 1),
+                    "p95_ms": round(1000 * latency.quantile(0.95), 1),
+                    "p99_ms": round(1000 * latency.quantile(0.99), 1),
+                    "max_ms": round(1000 * latency.max, 1),
+                })
+            return rows
+
+    def phase_rows(self):
+        """Una fila por (trabajo, fase) con ejecuciones, total, promedio y última duración (s)."""
+        with self.lock:
+            return [
+                {
+                    "trabajo": job,
+                    "fase": phase,
+                    "ejecuciones": entry["duracion"].count,
+                    "total_s": round(entry["duracion"].sum, 2),
+                    "promedio_s": round(entry["duracion"].sum / entry["duracion"].count, 2),
+                    "ultima_s": round(entry["ultima"], 2),
+                }
+                for (job, phase), entry in sorted(self.phases.items())
+            ]
+
+    def cache_rows(self):
+        """Una fila por caché con aciertos, fallos y tasa de aciertos."""
+        with self.lock:
+            return [
+                {
+                    "cache": cache,
+                    "aciertos": counts["acierto"],
+                    "fallos": counts["fallo"],
+                    "tasa_aciertos": round(counts["acierto"] / (counts["acierto"] + counts["fallo"]), 3),
+                }
+                for cache, counts in sorted(self.caches.items())
+            ]
+
+    def to_prometheus(self):
+        """Las métricas en el formato de texto de Prometheus."""
+        lines = []
+
+        def histogram(name, labels, hist):
+            cumulative = 0
+            for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(**labels)} {hist.sum}")
+            lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines += ["# HELP inventarios_http_request_duration_seconds Latencia de las peticiones a Mercado Libre.",
+                      "# TYPE inventarios_http_request_duration_seconds histogram"]
+            for endpoint, entry in endpoints:
+                histogram("inventarios_http_request_duration_seconds", {"endpoint": endpoint}, entry["latencia"])
+
+            lines += ["# HELP inventarios_http_requests_total Peticiones a Mercado Libre por resultado.",
+                      "# TYPE inventarios_http_requests_total counter"]
+            for endpoint, entry in endpoints:
+                for outcome, count in entry["resultados"].items():
+                    lines.append(f"inventarios_http_requests_total{_labels(endpoint=endpoint, resultado=outcome)} {count}")
+
+            lines += ["# HELP inventarios_http_retries_total Reintentos por motivo.",
+                      "# TYPE inventarios_http_retries_total counter"]
+            for endpoint, entry in endpoints:
+                for reason, count in sorted(entry["reintentos"].items()):
+                    lines.append(f"inventarios_http_retries_total{_labels(endpoint=endpoint, motivo=reason)} {count}")
+
+            lines += ["# HELP inventarios_http_wait_seconds_total Espera sin petición en curso (limitador de tasa y pausas entre reintentos).",
+                      "# TYPE inventarios_http_wait_seconds_total counter"]
+            for endpoint, entry in endpoints:
+                for reason, seconds in sorted(entry["espera"].items()):
+                    lines.append(f"inventarios_http_wait_seconds_total{_labels(endpoint=endpoint, motivo=reason)} {seconds}")
+
+            lines += ["# HELP inventarios_http_response_bytes_total Bytes recibidos de Mercado Libre.",
+                      "# TYPE inventarios_http_response_bytes_total counter"]
+            for endpoint, entry in endpoints:
+                lines.append(f"inventarios_http_response_bytes_total{_labels(endpoint=endpoint)} {entry['bytes']}")
+
+            lines += ["# HELP inventarios_cache_requests_total Consultas a las cachés de respuestas (acierto = 304).",
+                      "# TYPE inventarios_cache_requests_total counter"]
+            for cache, counts in sorted(self.caches.items()):
+                for result, count in counts.items():
+                    lines.append(f"inventarios_cache_requests_total{_labels(cache=cache, resultado=result)} {count}")
+
+            lines += ["# HELP inventarios_job_phase_duration_seconds Duración de cada fase de los trabajos.",
+                      "# TYPE inventarios_job_phase_duration_seconds histogram"]
+            for (job, phase), entry in sorted(self.phases.items()):
+                histogram("inventarios_job_phase_duration_seconds", {"trabajo": job, "fase": phase}, entry["duracion"])
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Escribe las métricas en export_path (si está configurado); devuelve la ruta o None."""
+        path = self.export_path
+        if not path:
+            return None
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Escribir y renombrar para que el scraper nunca lea un archivo a medio escribir
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"No se pudieron exportar las métricas a {path}: {e}")
+            return None
+        return path
+
+
+# Registro compartido por todo el proceso (app o CLI)
+METRICS = MetricsRegistry()
@@ -0,0 +1,668 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from jobs import cancel_requested
+from metrics import METRICS
+
+logger = logging.getLogger("inventarios-app.http")
+
+API_BASE_URL = "https://api.mercadolibre.com"
+
+# Máximo de IDs que acepta el endpoint multiget /items?ids=...
+MULTIGET_MAX_IDS = 20
+
+# Donde get_ml_token.py y TokenManager guardan el último token obtenido (con su expiración)
+TOKEN_FILE = "ml_token_info.json"
+# Segundos antes del vencimiento en que se renueva el token
+TOKEN_REFRESH_MARGIN = 600
+# Tras una renovación fallida no se vuelve a llamar a OAuth antes de estos segundos
+TOKEN_RETRY_AFTER = 60
+
+
+def refresh_access_token(client_id, client_secret, base_url=API_BASE_URL):
+    """Obtiene un nuevo token de acceso usando las credenciales de la aplicación.
+
+    Devuelve la respuesta de OAuth ({access_token, expires_in, ...}) o None si falla.
+    """
+    url = f"{base_url}/oauth/token"
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Accept": "application/json"
+    }
+    data = {
+        "grant_type": "client_credentials",
+        "client_id": client_id,
+        "client_secret": client_secret
+    }
+
+    try:
+        resp = requests.post(url, headers=headers, data=data, timeout=10)
+        resp.raise_for_status()
+        token_info = resp.json()
+
+        # Registrar la renovación en el log
+        logger.info(f"Token de Mercado Libre renovado. Expira en {token_info.get('expires_in')} segundos.")
+
+        return token_info
+    except requests.RequestException as e:
+        logger.error(f"Error al renovar el token: {str(e)}")
+        if hasattr(e, 'response') and e.response:
+            logger.error(f"Respuesta del servidor: {e.response.text}")
+        return None
+
+
+def token_expires_at(token_info, saved_at=None):
+    """Momento (epoch) en que vence el token: `expires_at`, o `saved_at` + `expires_in`."""
+    if token_info.get("expires_at"):
+        return float(token_info["expires_at"])
+    if token_info.get("expires_in") and saved_at is not None:
+        return saved_at + float(token_info["expires_in"])
+    return None
+
+
+def _format_epoch(epoch):
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class RateLimiter:
+    """Token bucket compartido entre todos los hilos que llaman a la API de Mercado Libre.
+
+    Cuando cualquier hilo recibe un 429 la tasa se reduce a la mitad y todos esperan
+    un periodo de enfriamiento; con respuestas limpias la tasa vuelve a subir poco a poco.
+    """
+
+    def __init__(self, rate=10.0, max_rate=20.0, min_rate=1.0):
+        self.lock = threading.Lock()
+        self.configure(rate, max_rate, min_rate)
+
+    def configure(self, rate, max_rate=None, min_rate=1.0):
+        """Reinicia el limitador con una nueva tasa (req/s)."""
+        with self.lock:
+            self.rate = float(rate)
+            self.max_rate = float(max_rate if max_rate is not None else rate * 2)
+            self.min_rate = float(min_rate)
+            self.tokens = 1.0
+            self.cooldown_until = 0.0
+            self.backoff = 1.0
+            self.last_refill = time.monotonic()
+
+    def set_rate(self, rate, max_rate=None):
+        """Cambia la tasa de una corrida sin borrar la pausa ni el backoff de un 429 reciente.
+
+        La tasa actual solo baja de inmediato; si la nueva es mayor, sube de forma gradual
+        con report_success() hasta el nuevo máximo, igual que después de un 429.
+        """
+        with self.lock:
+            self.max_rate = float(max_rate if max_rate is not None else rate * 2)
+            self.rate = max(self.min_rate, min(float(rate), self.rate))
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible para hacer una petición."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.cooldown_until:
+                    self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.last_refill) * self.rate)
+                    self.last_refill = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.last_refill = self.cooldown_until
+                    wait = self.cooldown_until - now
+            time.sleep(wait)
+
+    def report_throttled(self, retry_after=None):
+        """Registra un 429: reduce la tasa y pausa globalmente a todos los hilos."""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            try:
+                wait = float(retry_after) if retry_after else self.backoff
+            except ValueError:
+                wait = self.backoff
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + wait)
+            self.backoff = min(self.backoff * 2, 30.0)
+            self.tokens = 0.0
+            logger.warning(f"Rate limit de Mercado Libre: pausa global de {wait:.1f}s, nueva tasa {self.rate:.1f} req/s")
+
+    def report_success(self):
+        """Registra una respuesta limpia: la tasa sube de forma gradual hasta el máximo."""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+            self.backoff = 1.0
+
+
+class TokenManager:
+    """Token de acceso de Mercado Libre compartido por todos los hilos, con renovación anticipada.
+
+    La expiración se toma de `token_file` (lo escriben get_ml_token.py y cada renovación)
+    y el token se renueva `refresh_margin` segundos antes de vencer. Solo un hilo a la vez
+    llama a OAuth: mientras el token siga vigente los demás lo siguen usando sin esperar, y
+    si ya venció esperan esa misma renovación. invalidate() renueva ante un 401, también
+    una sola vez aunque lo reciban varios hilos.
+    """
+
+    def __init__(self, access_token, client_id=None, client_secret=None, base_url=API_BASE_URL,
+                 token_file=TOKEN_FILE, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.lock = threading.Lock()
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self.token = access_token
+        self.expires_at = None
+        self.retry_at = 0.0
+        self.refreshes = 0
+        self._load_token_file()
+
+    @property
+    def can_refresh(self):
+        return bool(self.client_id and self.client_secret)
+
+    def _load_token_file(self):
+        """Toma la expiración del token configurado, o el token del archivo si es otro y sigue vigente."""
+        if not self.token_file:
+            return
+        try:
+            with open(self.token_file, encoding="utf-8") as f:
+                token_info = json.load(f)
+            saved_at = os.path.getmtime(self.token_file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer {self.token_file}: {e}")
+            return
+        expires_at = token_expires_at(token_info, saved_at)
+        if not token_info.get("access_token") or expires_at is None:
+            return
+        if token_info["access_token"] == self.token:
+            self.expires_at = expires_at
+        elif expires_at - self.refresh_margin > time.time():
+            # Token renovado en una ejecución anterior: el configurado es más viejo
+            logger.info(f"Usando el token de {self.token_file}, vigente hasta {_format_epoch(expires_at)}")
+            self.token = token_info["access_token"]
+            self.expires_at = expires_at
+
+    def _save_token_file(self, token_info):
+        if not self.token_file:
+            return
+        try:
+            # Escribir y renombrar para que otro proceso nunca lea un JSON a medio escribir
+            tmp_path = self.token_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(token_info, f, indent=2)
+            os.replace(tmp_path, self.token_file)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el token en {self.token_file}: {e}")
+
+    def _needs_refresh(self):
+        if not self.can_refresh or self.expires_at is None:
+            return False
+        return time.time() >= max(self.expires_at - self.refresh_margin, self.retry_at)
+
+    def get_token(self):
+        """Devuelve el token a usar, renovándolo antes si está por vencer."""
+        if not self._needs_refresh():
+            return self.token
+        expired = time.time() >= self.expires_at
+        if not self.lock.acquire(blocking=expired):
+            # Otro hilo ya lo está renovando y el actual todavía sirve
+            return self.token
+        try:
+            if self._needs_refresh():
+                logger.info(f"El token vence el {_format_epoch(self.expires_at)}; renovándolo por anticipado")
+                self._refresh()
+            return self.token
+        finally:
+            self.lock.release()
+
+    def invalidate(self, failed_token):
+        """Renueva el token tras un 401 con `failed_token`; devuelve True si hay uno nuevo para reintentar."""
+        with self.lock:
+            if self.token != failed_token:
+                # Otro hilo ya lo renovó mientras esperábamos
+                return True
+            if not self.can_refresh:
+                logger.error("No se encontraron las credenciales para renovar el token")
+                return False
+            if time.time() < self.retry_at:
+                return False
+            logger.warning("Token expirado. Intentando renovar...")
+            return self._refresh()
+
+    def _refresh(self):
+        """Pide un token nuevo a OAuth y lo guarda en token_file; se llama con self.lock tomado."""
+        token_info = refresh_access_token(self.client_id, self.client_secret, self.base_url)
+        if not token_info or not token_info.get("access_token"):
+            logger.error(f"No se pudo renovar el token; se reintentará en {TOKEN_RETRY_AFTER} s")
+            self.retry_at = time.time() + TOKEN_RETRY_AFTER
+            return False
+        self.token = token_info["access_token"]
+        self.expires_at = token_expires_at(token_info, time.time())
+        self.retry_at = 0.0
+        self.refreshes += 1
+        self._save_token_file(dict(token_info, expires_at=self.expires_at))
+        return True
+
+    def status(self):
+        """Resumen {expira, restante_s, renovaciones} para mostrar en la interfaz."""
+        if self.expires_at is None:
+            return {"expira": None, "restante_s": None, "renovaciones": self.refreshes}
+        return {
+            "expira": _format_epoch(self.expires_at),
+            "restante_s": int(self.expires_at - time.time()),
+            "renovaciones": self.refreshes,
+        }
+
+
+class MercadoLibreClient:
+    """Cliente único para la API de Mercado Libre.
+
+    Mantiene un pool de conexiones keep-alive, aplica la misma política de reintentos a
+    todas las llamadas (429 con Retry-After, 5xx y timeouts), renueva el token antes de que
+    venza y de forma transparente ante un 401 (ver TokenManager) y lleva estadísticas de peticiones, bytes y latencia por endpoint.
+    `base_url` permite apuntar a otra API compatible (p. ej. el servidor local de
+    benchmarks/ml_stub_server.py). Latencias, reintentos y esperas se registran además
+    en `metrics` (por defecto el registro del proceso, metrics.METRICS). Con `item_cache`
+    (item_cache.ItemCache) las lecturas de /items/{id} son condicionales y el multiget
+    reutiliza las publicaciones guardadas cuyo last_updated no cambió.
+    """
+
+    def __init__(self, access_token, client_id=None, client_secret=None, rate_limit=10.0,
+                 pool_size=16, max_retries=3, base_url=None, metrics=None, token_file=TOKEN_FILE,
+                 item_cache=None):
+        self.base_url = (base_url or API_BASE_URL).rstrip("/")
+        self.metrics = metrics or METRICS
+        self.token_manager = TokenManager(access_token, client_id, client_secret, self.base_url, token_file)
+        self.item_cache = item_cache
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(rate=rate_limit, max_rate=rate_limit * 2)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept": "application/json"})
+        self.stats_lock = threading.Lock()
+        self.stats = {}
+
+    @property
+    def can_refresh(self):
+        return self.token_manager.can_refresh
+
+    # ---- Infraestructura común ----
+    def _record(self, endpoint, elapsed, resp=None, error=None):
+        nbytes = len(resp.content or b"") if resp is not None else 0
+        self.metrics.observe_request(endpoint, elapsed, resp.status_code if resp is not None else None, nbytes, error)
+        with self.stats_lock:
+            entry = self.stats.setdefault(endpoint, {
+                "peticiones": 0, "errores": 0, "bytes": 0, "latencia_total": 0.0, "latencia_max": 0.0
+            })
+            entry["peticiones"] += 1
+            entry["latencia_total"] += elapsed
+            entry["latencia_max"] = max(entry["latencia_max"], elapsed)
+            entry["bytes"] += nbytes
+            if error is not None or resp is None or resp.status_code >= 400:
+                entry["errores"] += 1
+
+    def get_stats(self):
+        """Devuelve las estadísticas por endpoint como lista de diccionarios."""
+        with self.stats_lock:
+            return [
+                {
+                    "endpoint": endpoint,
+                    "peticiones": entry["peticiones"],
+                    "errores": entry["errores"],
+                    "bytes": entry["bytes"],
+                    "latencia_promedio_ms": round(1000 * entry["latencia_total"] / entry["peticiones"], 1),
+                    "latencia_max_ms": round(1000 * entry["latencia_max"], 1),
+                }
+                for endpoint, entry in sorted(self.stats.items())
+            ]
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {}
+
+    def request(self, method, path, endpoint, params=None, payload=None, timeout=15, retries=None, headers=None):
+        """Hace una petición con la política común de reintentos y devuelve la respuesta.
+
+        Un 401 renueva el token (una vez) y repite la petición sin gastar un intento.
+        Los códigos 4xx distintos de 401/429 se devuelven sin reintentar para que cada
+        llamada decida qué hacer. Si se agotan los reintentos se lanza la última excepción
+        o se devuelve la última respuesta recibida. `headers` se agregan a cada intento.
+        """
+        retries = self.max_retries if retries is None else retries
+        extra_headers = headers or {}
+        url = f"{self.base_url}{path}"
+        data = json.dumps(payload) if payload is not None else None
+        refreshed = False
+        resp = None
+        last_error = None
+
+        attempt = 0
+        while attempt < retries:
+            attempt += 1
+            token = self.token_manager.get_token()
+            headers = {**extra_headers, "Authorization": f"Bearer {token}"}
+            if data is not None:
+                headers["Content-Type"] = "application/json"
+            waiting = time.perf_counter()
+            self.limiter.acquire()
+            start = time.perf_counter()
+            self.metrics.add_wait(endpoint, "rate_limit", start - waiting)
+            try:
+                resp = self.session.request(method, url, params=params, data=data, headers=headers, timeout=timeout)
+            except requests.RequestException as e:
+                self._record(endpoint, time.perf_counter() - start, error=e)
+                last_error = e
+                resp = None
+                logger.warning(f"{endpoint}: {type(e).__name__} (intento {attempt}/{retries}): {str(e)}")
+                if attempt < retries:
+                    self._retry_pause(endpoint, "timeout" if isinstance(e, requests.Timeout) else "conexion", attempt - 1)
+                continue
+            self._record(endpoint, time.perf_counter() - start, resp)
+
+            if resp.status_code == 401 and not refreshed:
+                refreshed = True
+                if self.token_manager.invalidate(token):
+                    # El reintento con el token renovado no consume uno de los intentos
+                    retries += 1
+                    self.metrics.count_retry(endpoint, "401")
+                    continue
+                return resp
+            if resp.status_code == 429:
+                logger.warning(f"{endpoint}: rate limit (intento {attempt}/{retries})")
+                self.limiter.report_throttled(resp.headers.get("Retry-After"))
+                if attempt < retries:
+                    # La pausa del 429 la aplica el limitador y se cuenta como espera de rate_limit
+                    self.metrics.count_retry(endpoint, "429")
+                continue
+            if resp.status_code >= 500:
+                logger.warning(f"{endpoint}: error {resp.status_code} del servidor (intento {attempt}/{retries})")
+                if attempt < retries:
+                    self._retry_pause(endpoint, "5xx", attempt - 1)
+                continue
+
+            self.limiter.report_success()
+            return resp
+
+        if resp is None and last_error is not None:
+            raise last_error
+        return resp
+
+    def _retry_pause(self, endpoint, reason, attempt):
+        """Espera antes de reintentar (1, 2, 4... hasta 8 s) y lo registra en las métricas."""
+        self.metrics.count_retry(endpoint, reason)
+        pause = min(2 ** attempt, 8)
+        time.sleep(pause)
+        self.metrics.add_wait(endpoint, "reintento", pause)
+
+    # ---- Endpoints ----
+    def get_user_id(self):
+        """Obtiene el ID del usuario autenticado en Mercado Libre."""
+        try:
+            resp = self.request("GET", "/users/me", "GET /users/me", timeout=10)
+            resp.raise_for_status()
+            return resp.json()["id"]
+        except requests.RequestException as e:
+            logger.error(f"Error al obtener user_id: {str(e)}")
+            return None
+
+    def get_items(self, user_id, status, search_type="scan"):
+        """Obtiene todos los items de un usuario con un status específico (active, paused, etc).
+
+        Con search_type="scan" se recorre el listado con scroll_id, que no tiene el tope de
+        offset de la paginación normal. Cada página se reintenta antes de darse por perdida;
+        si aun así falla se relanza la excepción, porque un listado parcial terminaría en un
+        inventario truncado. Devuelve (items, total) donde total es el número de
+        publicaciones que reporta la API.
+        """
+        items = []
+        total = None
+        offset = 0
+        limit = 100 if search_type == "scan" else 50
+        scroll_id = None
+
+        while True:
+            params = {"status": status, "limit": limit}
+            if search_type == "scan":
+                params["search_type"] = "scan"
+                if scroll_id:
+                    params["scroll_id"] = scroll_id
+            else:
+                params["offset"] = offset
+
+            try:
+                resp = self.request("GET", f"/users/{user_id}/items/search", "GET /users/{id}/items/search", params=params)
+                resp.raise_for_status()
+                data = resp.json()
+            except requests.RequestException as e:
+                if total is not None and len(items) >= total:
+                    # Falló la página vacía que cierra el scan; el listado ya está completo
+                    logger.warning(f"Listado de items con status {status}: falló la última página ({str(e)}), "
+                                   f"pero ya se obtuvieron las {total} publicaciones")
+                    break
+                logger.error(f"Listado de items con status {status} interrumpido: {str(e)}. "
+                             f"Se obtuvieron {len(items)} de {total if total is not None else '?'}")
+                raise
+
+            if total is None:
+                total = data.get("paging", {}).get("total")
+            results = data.get("results", [])
+            items.extend(results)
+            if search_type == "scan":
+                scroll_id = data.get("scroll_id")
+                if not results or not scroll_id:
+                    break
+            else:
+                if not results or len(results) < limit:
+                    break
+                offset += limit
+
+        if total is not None and len(items) < total:
+            logger.warning(f"Status {status}: la API reporta {total} publicaciones pero solo se obtuvieron {len(items)}")
+        return items, total
+
+    def get_item_detail(self, item_id):
+        """Obtiene los detalles completos de un item específico con manejo robusto de errores.
+
+        Con item_cache la petición es condicional: si la publicación no cambió la API
+        responde 304 sin cuerpo y se devuelve la respuesta guardada.
+        """
+        cached = self.item_cache.get(item_id) if self.item_cache is not None else None
+        try:
+            resp = self.request("GET", f"/items/{item_id}", "GET /items/{id}", headers=cached[1] if cached else None)
+            if resp.status_code == 304 and cached:
+                self.item_cache.hit(item_id)
+                self.metrics.count_cache("items", "acierto")
+                return json.loads(cached[0])
+            resp.raise_for_status()
+            item = resp.json()
+            if self.item_cache is not None:
+                self.item_cache.store(item_id, resp.content, resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                                      item.get("last_updated"))
+                self.metrics.count_cache("items", "fallo")
+            return item
+        except requests.RequestException as e:
+            logger.error(f"Falló la obtención de {item_id}: {str(e)}")
+            return None
+
+    def get_items_details(self, item_ids, attributes=None, last_updated=None):
+        """Obtiene los detalles de hasta 20 items en una sola petición usando el endpoint multiget.
+
+        Devuelve un diccionario {item_id: item}. Los items con error dentro de la respuesta
+        (401, 429 o 5xx) se reintentan de forma individual con get_item_detail; los que no existen
+        o no son accesibles (404, 403, etc.) quedan como None. Con `attributes` (p. ej.
+        ["id", "last_updated"]) la API devuelve solo esos campos de cada item.
+
+        Con item_cache, las descargas completas se guardan en la caché y `last_updated`
+        ({item_id: last_updated} ya consultado a la API) permite tomar de ella las
+        publicaciones que no cambiaron; si no falta ninguna no se hace la petición.
+        """
+        details = {item_id: None for item_id in list(item_ids)[:MULTIGET_MAX_IDS]}
+        use_cache = self.item_cache is not None and not attributes
+        if use_cache and last_updated:
+            cached = self.item_cache.get_current({
+                item_id: last_updated[item_id] for item_id in details if last_updated.get(item_id)
+            })
+            for item_id, body in cached.items():
+                details[item_id] = json.loads(body)
+                self.metrics.count_cache("items", "acierto")
+        item_ids = [item_id for item_id, item in details.items() if item is None]
+        if not item_ids:
+            return details
+
+        params = {"ids": ",".join(item_ids)}
+        if attributes:
+            params["attributes"] = ",".join(attributes)
+
+        try:
+            resp = self.request("GET", "/items", "GET /items?ids", params=params, timeout=20)
+            resp.raise_for_status()
+            results = resp.json()
+        except requests.RequestException as e:
+            # Si el lote completo falla, no perder los items: pedirlos uno por uno
+            logger.error(f"Falló el multiget para {item_ids[0]}..{item_ids[-1]} ({str(e)}), obteniendo los items de forma individual")
+            for item_id in item_ids:
+                details[item_id] = self.get_item_detail(item_id)
+            return details
+
+        downloaded = []
+        for position, entry in enumerate(results):
+            code = entry.get("code")
+            body = entry.get("body") or {}
+            item_id = body.get("id") or (item_ids[position] if position < len(item_ids) else None)
+            if item_id is None:
+                continue
+
+            if code == 200:
+                details[item_id] = body
+                if use_cache:
+                    downloaded.append((item_id, json.dumps(body).encode("utf-8"), None, None, body.get("last_updated")))
+                    self.metrics.count_cache("items", "fallo")
+            elif code in (401, 429) or (isinstance(code, int) and code >= 500):
+                # Un 401 dentro del multiget también se reintenta: la petición individual renueva el token
+                logger.warning(f"Multiget devolvió {code} para {item_id}, reintentando de forma individual")
+                self.metrics.count_retry("GET /items?ids", f"item_{code if code in (401, 429) else '5xx'}")
+                if code == 429:
+                    self.limiter.report_throttled()
+                details[item_id] = self.get_item_detail(item_id)
+            else:
+                logger.error(f"Multiget devolvió {code} para {item_id}: {body.get('message', body)}")
+
+        if downloaded:
+            self.item_cache.store_many(downloaded)
+        return details
+
+    def iter_items_details(self, item_ids, workers=1, job_state=None, attributes=None, last_updated=None):
+        """Descarga los detalles en lotes multiget usando hasta `workers` hilos en paralelo.
+
+        Entrega un diccionario {item_id: item} por lote, siempre en el orden original de
+        item_ids, de modo que el resultado de la extracción es el mismo que en modo serial.
+        Si se pide cancelar job_state (jobs.cancel_requested) no se envían más lotes.
+        `last_updated` se pasa a get_items_details para reutilizar la caché de publicaciones.
+        """
+        batches = [item_ids[i:i + MULTIGET_MAX_IDS] for i in range(0, len(item_ids), MULTIGET_MAX_IDS)]
+        workers = max(1, int(workers))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ml-extraccion")
+
+        def fetch(batch_ids):
+            if cancel_requested(job_state):
+                return {}
+            return self.get_items_details(batch_ids, attributes, last_updated)
+
+        try:
+            # Ventana acotada de lotes en vuelo para no acumular resultados en memoria
+            pending = []
+            next_batch = 0
+            for _ in batches:
+                while next_batch < len(batches) and len(pending) < workers * 2:
+                    # Los hilos del pool heredan el contexto (p. ej. el id del trabajo para los logs)
+                    future = executor.submit(contextvars.copy_context().run, fetch, batches[next_batch])
+                    pending.append((batches[next_batch], future))
+                    next_batch += 1
+                batch_ids, future = pending.pop(0)
+                try:
+                    yield future.result()
+                except Exception as batch_error:
+                    logger.error(f"Error obteniendo el lote {batch_ids[0]}..{batch_ids[-1]}: {batch_error}")
+                    yield {}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def update_item_stock_safe(self, item_id, all_variations):
+        """Actualiza el stock de un item asegurando que se envíen TODAS las variantes para evitar eliminaciones."""
+        try:
+            resp = self.request("PUT", f"/items/{item_id}", "PUT /items/{id}", payload=all_variations)
+            if resp.status_code == 200:
+                logger.info(f"Item {item_id} actualizado correctamente")
+                return {"success": True, "data": resp.json()}
+
+            # Si sigue fallando, registrar el error
+            error_msg = f"Status {resp.status_code}"
+            logger.error(f"Error al actualizar {item_id}: {error_msg} - {resp.text}")
+            return {"success": False, "error": error_msg, "details": resp.text, "status": resp.status_code}
+
+        except requests.RequestException as e:
+            logger.error(f"Excepción al actualizar {item_id}: {str(e)}")
+            return {"success": False, "error": str(e), "details": ""}
+
+    def pause_item(self, item_id):
+        """Pausa una publicación en Mercado Libre (cuando su stock total es 0)."""
+        try:
+            resp = self.request("PUT", f"/items/{item_id}", "PUT /items/{id}", payload={"status": "paused"}, timeout=10)
+            resp.raise_for_status()
+            logger.info(f"Item {item_id} pausado correctamente")
+            return {"success": True}
+        except requests.RequestException as e:
+            logger.error(f"Error al pausar item {item_id}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def debug_item_structure(self, item_id):
+        """Función temporal para debuggear la estructura de un item específico."""
+        try:
+            # Misma petición (y caché) que la extracción: no vuelve a descargar lo que no cambió
+            item = self.get_item_detail(item_id)
+            if item is None:
+                return None
+
+            logger.info(f"\n=== DEBUG ITEM {item_id} ===")
+            logger.info(f"Título: {item.get('title', 'N/A')}")
+            logger.info(f"seller_custom_field: {item.get('seller_custom_field', 'N/A')}")
+            logger.info(f"seller_sku: {item.get('seller_sku', 'N/A')}")
+
+            if "attributes" in item:
+                logger.info("Attributes:")
+                for attr in item["attributes"]:
+                    attr_id = attr.get('id', 'NO_ID')
+                    attr_value = attr.get('value_name', attr.get('value', 'NO_VALUE'))
+                    logger.info(f"  - {attr_id}: {attr_value}")
+
+            if "variations" in item and item["variations"]:
+                logger.info("Variations:")
+                for i, var in enumerate(item["variations"]):
+                    logger.info(f"  Variation {i}:")
+                    logger.info(f"    - id: {var.get('id', 'N/A')}")
+                    logger.info(f"    - seller_custom_field: {var.get('seller_custom_field', 'N/A')}")
+                    logger.info(f"    - seller_sku: {var.get('seller_sku', 'N/A')}")
+                    if "attributes" in var:
+                        for attr in var["attributes"]:
+                            attr_id = attr.get('id', 'NO_ID')
+                            attr_value = attr.get('value_name', attr.get('value', 'NO_VALUE'))
+                            logger.info(f"    - {attr_id}: {attr_value}")
+
+            return item
+        except Exception as e:
+            logger.error(f"Error debugging item {item_id}: {e}")
+            return None
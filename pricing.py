@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+PRECIO_MINIMO = 299.00
+
+
+def cost_values(costos):
+    """Convierte la columna PRECIO MAYOREO a un arreglo float con NaN donde el costo no es válido.
+
+    Igual que la validación fila por fila: solo se aceptan números mayores que 0; los
+    textos (aunque parezcan números) y las celdas vacías quedan como NaN.
+    """
+    costos = pd.Series(costos)
+    if not pd.api.types.is_numeric_dtype(costos):
+        try:
+            es_texto = costos.str.len().notna()
+        except AttributeError:
+            # El accesor .str no aplica cuando la columna no contiene ningún texto
+            es_texto = pd.Series(False, index=costos.index)
+        costos = pd.to_numeric(costos.where(~es_texto), errors="coerce")
+    valores = costos.to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(valores > 0, valores, np.nan)
+
+
+def suggested_prices(costos, utilidad, costo_envio, iva, comision_ml):
+    """Precio de venta sugerido para cada costo, calculado sobre arreglos completos.
+
+    precio = (costo * (1 + IVA + utilidad) + envío) / (1 - comisión ML), redondeado hacia
+    arriba y nunca menor a PRECIO_MINIMO. Los porcentajes se reciben como en la interfaz
+    (20 = 20 %). utilidad, costo_envio y comision_ml pueden ser arreglos: se combinan con
+    las reglas de broadcasting de numpy, así que con ejes distintos se evalúa una rejilla
+    completa de escenarios en una sola pasada.
+    """
+    costos = np.asarray(costos, dtype="float64")
+    utilidad_dec = np.asarray(utilidad, dtype="float64") / 100.0
+    comision_dec = np.asarray(comision_ml, dtype="float64") / 100.0
+    precio = (costos * (1 + iva / 100.0 + utilidad_dec) + np.asarray(costo_envio, dtype="float64")) / (1 - comision_dec)
+    # Las comparaciones con NaN son falsas: los costos inválidos se restauran al final
+    precio = np.where(precio >= PRECIO_MINIMO, np.ceil(precio), PRECIO_MINIMO)
+    return np.where(np.isnan(costos), np.nan, precio)
+
+
+def scenario_grid(costos, utilidades, comisiones, envios, iva):
+    """Evalúa todas las combinaciones utilidad × comisión × envío para todo el catálogo.
+
+    Devuelve (precios, escenarios): precios tiene forma (productos, escenarios) y
+    escenarios es un DataFrame con los parámetros de cada columna, en el mismo orden.
+    """
+    costos = cost_values(costos)
+    utilidades = np.asarray(utilidades, dtype="float64")
+    comisiones = np.asarray(comisiones, dtype="float64")
+    envios = np.asarray(envios, dtype="float64")
+    precios = suggested_prices(
+        costos[:, None, None, None],
+        utilidades[None, :, None, None],
+        envios[None, None, None, :],
+        iva,
+        comisiones[None, None, :, None],
+    )
+    n_escenarios = len(utilidades) * len(comisiones) * len(envios)
+    u, c, e = np.meshgrid(utilidades, comisiones, envios, indexing="ij")
+    escenarios = pd.DataFrame({
+        "utilidad_%": u.ravel(),
+        "comisión_%": c.ravel(),
+        "envío_$": e.ravel(),
+    })
+    return precios.reshape(len(costos), n_escenarios), escenarios
+
+
+def summarize_scenarios(precios, escenarios):
+    """Resumen por escenario: productos con precio, precio promedio y mediano, y cuántos quedan en el mínimo."""
+    por_escenario = pd.DataFrame(precios)
+    resumen = escenarios.copy()
+    resumen["productos"] = por_escenario.count().to_numpy()
+    resumen["precio_promedio"] = por_escenario.mean().round(2).to_numpy()
+    resumen["precio_mediano"] = por_escenario.median().to_numpy()
+    resumen["en_precio_mínimo"] = (precios == PRECIO_MINIMO).sum(axis=0)
+    return resumen
+
+
+def scenario_label(utilidad, comision, envio):
+    """Nombre de la columna de un escenario en el catálogo exportado."""
+    return f"PRECIO U{utilidad:g}% C{comision:g}% E${envio:g}"
@@ -0,0 +1,217 @@
+import codecs
+import csv
+import logging
+import os
+import re
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+from snapshots import manage_file_history
+
+logger = logging.getLogger("inventarios-app.sync")
+
+REQUIRED_COLUMNS = ("CLAVE_ARTICULO", "EXISTENCIAS")
+PROVIDER_EXTENSIONS = (".xlsx", ".csv", ".tsv", ".txt")
+PROVIDER_HISTORY_DIR = "inventario_proveedor_historial"
+
+# Número con comas como separador de miles: 1,234 o 1,234,567.5
+THOUSANDS_RE = re.compile(r"^[+-]?\d{1,3}(,\d{3})+(\.\d+)?$")
+
+# Cuántos rechazos se guardan con detalle; el resto solo se cuenta
+MAX_REJECTED_DETAIL = 1000
+
+
+class ProviderFileError(ValueError):
+    """El archivo del proveedor no se puede leer o no tiene las columnas requeridas."""
+
+
+def normalize_provider_key(clave):
+    """CLAVE_ARTICULO como texto: una clave numérica de Excel (12345 o 12345.0) vale lo mismo que "12345" en un CSV.
+
+    Los valores que no son números (texto, fechas, booleanos, None) se devuelven sin cambios.
+    """
+    if isinstance(clave, bool) or not isinstance(clave, (int, float)) or clave != clave:
+        return clave
+    if isinstance(clave, float) and clave.is_integer():
+        return str(int(clave))
+    return str(clave)
+
+
+def _find_columns(header):
+    columns = [str(c).strip().upper() if c is not None else "" for c in header]
+    if any(name not in columns for name in REQUIRED_COLUMNS):
+        raise ProviderFileError("El archivo debe tener las columnas CLAVE_ARTICULO y EXISTENCIAS.")
+    return columns.index("CLAVE_ARTICULO"), columns.index("EXISTENCIAS")
+
+
+def _iter_xlsx(fileobj):
+    """Filas (línea, clave, existencias) de la primera hoja leída en modo read-only."""
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ProviderFileError("El archivo del proveedor está vacío.")
+        clave_idx, existencias_idx = _find_columns(header)
+        # Solo se materializan las celdas entre las dos columnas necesarias
+        first = min(clave_idx, existencias_idx)
+        last = max(clave_idx, existencias_idx)
+        clave_idx -= first
+        existencias_idx -= first
+        for line, row in enumerate(sheet.iter_rows(min_row=2, min_col=first + 1, max_col=last + 1, values_only=True), start=2):
+            yield line, row[clave_idx] if len(row) > clave_idx else None, row[existencias_idx] if len(row) > existencias_idx else None
+    finally:
+        workbook.close()
+
+
+def _parse_number(value, decimal_comma=False):
+    """Convierte el texto de un CSV a int/float; el texto sin cambios si no es un número.
+
+    Con `decimal_comma` (archivos separados por ";", típicos de Excel en español) la coma es
+    el separador decimal: "12,5" es 12.5. Si no, la coma solo se acepta como separador de
+    miles bien formado ("1,234"); "12,5" queda como texto y la fila se rechaza.
+    """
+    value = value.strip() if isinstance(value, str) else value
+    if value in (None, ""):
+        return None
+    if "," in value:
+        if decimal_comma:
+            value = value.replace(",", ".")
+        elif THOUSANDS_RE.match(value):
+            value = value.replace(",", "")
+        else:
+            return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _iter_csv(fileobj, filename):
+    """Filas (línea, clave, existencias) de un CSV/TSV leído en streaming."""
+    sample = fileobj.read(64 * 1024)
+    fileobj.seek(0)
+    if isinstance(sample, str):
+        text = fileobj
+        sample_text = sample
+    else:
+        try:
+            sample_text = sample.decode("utf-8-sig")
+            encoding = "utf-8-sig"
+        except UnicodeDecodeError:
+            # Muchos sistemas de proveedores exportan en Windows-1252
+            sample_text = sample.decode("cp1252", errors="replace")
+            encoding = "cp1252"
+        text = codecs.getreader(encoding)(fileobj, errors="replace")
+
+    if filename.lower().endswith(".tsv"):
+        delimiter = "\t"
+    else:
+        try:
+            delimiter = csv.Sniffer().sniff(sample_text.split("\n", 1)[0], delimiters=",;\t|").delimiter
+        except csv.Error:
+            delimiter = ","
+
+    reader = csv.reader(text, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        raise ProviderFileError("El archivo del proveedor está vacío.")
+    clave_idx, existencias_idx = _find_columns(header)
+    for row in reader:
+        line = reader.line_num
+        clave = row[clave_idx] if len(row) > clave_idx else None
+        existencias = row[existencias_idx] if len(row) > existencias_idx else None
+        yield line, clave, _parse_number(existencias, decimal_comma=delimiter == ";")
+
+
+def iter_provider_rows(fileobj, filename):
+    """Recorre el archivo del proveedor fila por fila sin cargarlo completo en memoria.
+
+    Entrega tuplas (línea, CLAVE_ARTICULO, EXISTENCIAS) con el número de línea del
+    archivo (la cabecera es la línea 1). Soporta xlsx (openpyxl en modo read-only) y
+    CSV/TSV. Lanza ProviderFileError si faltan las columnas requeridas.
+    """
+    extension = os.path.splitext(filename.lower())[1]
+    if extension not in PROVIDER_EXTENSIONS:
+        raise ProviderFileError(f"Formato no soportado: {extension or filename}")
+    if extension == ".xlsx":
+        return _iter_xlsx(fileobj)
+    return _iter_csv(fileobj, filename)
+
+
+def read_provider_stock(fileobj, filename):
+    """Lee y valida las existencias del proveedor a medida que llegan las filas.
+
+    Devuelve (inventario, rechazos, resumen): inventario es {CLAVE_ARTICULO: EXISTENCIAS}
+    con las claves como texto (ver normalize_provider_key; si una clave se repite gana la
+    última, igual que antes), rechazos es una lista de
+    hasta MAX_REJECTED_DETAIL diccionarios con la línea y el motivo, y resumen cuenta las
+    filas leídas, válidas y rechazadas.
+    """
+    inventario = {}
+    rechazos = []
+    resumen = {"filas": 0, "validas": 0, "rechazadas": 0}
+
+    for line, clave, existencias in iter_provider_rows(fileobj, filename):
+        if clave is None and existencias is None:
+            continue  # fila vacía
+        resumen["filas"] += 1
+        clave = normalize_provider_key(clave)
+
+        motivo = None
+        if not isinstance(clave, str) or not clave.strip():
+            motivo = "CLAVE_ARTICULO vacía o no es texto"
+        elif existencias is None:
+            motivo = "EXISTENCIAS vacía"
+        elif isinstance(existencias, bool) or not isinstance(existencias, (int, float)):
+            motivo = "EXISTENCIAS no es numérica"
+
+        if motivo:
+            resumen["rechazadas"] += 1
+            if len(rechazos) < MAX_REJECTED_DETAIL:
+                rechazos.append({"línea": line, "CLAVE_ARTICULO": clave, "EXISTENCIAS": existencias, "motivo": motivo})
+            continue
+
+        resumen["validas"] += 1
+        inventario[clave] = existencias
+
+    logger.info(f"Archivo de proveedor {filename}: {resumen['filas']} filas, {resumen['validas']} válidas, {resumen['rechazadas']} rechazadas")
+    return inventario, rechazos, resumen
+
+
+def copy_provider_file(fileobj, destination):
+    """Copia el archivo subido al historial en bloques, sin volver a cargarlo completo en memoria."""
+    fileobj.seek(0)
+    with open(destination, "wb") as f:
+        while True:
+            chunk = fileobj.read(1024 * 1024)
+            if not chunk:
+                break
+            f.write(chunk)
+    fileobj.seek(0)
+
+
+def import_provider_file(fileobj, filename, history_dir=PROVIDER_HISTORY_DIR):
+    """Guarda el archivo del proveedor en su historial y lo lee desde ahí.
+
+    Devuelve (inventario, rechazos, resumen, ruta_en_historial). Si el archivo no se puede
+    usar se borra del historial y se propaga ProviderFileError.
+    """
+    extension = os.path.splitext(filename)[1].lower() or ".xlsx"
+    manage_file_history(history_dir, PROVIDER_EXTENSIONS)
+    file_path = os.path.join(history_dir, f"proveedor_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}")
+    copy_provider_file(fileobj, file_path)
+    logger.info(f"Archivo de proveedor guardado en {file_path}")
+    try:
+        with open(file_path, "rb") as f:
+            inventario, rechazos, resumen = read_provider_stock(f, file_path)
+    except ProviderFileError:
+        # No conservar en el historial un archivo que no se pudo usar
+        os.remove(file_path)
+        raise
+    return inventario, rechazos, resumen, file_path
@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+class RunStats:
+    """Contadores de ejecuciones de la página por tipo (script completo o fragmento).
+
+    Sirven para comparar cuánto trabajo hace el servidor mientras hay una extracción en
+    curso: cada pestaña abierta suma ejecuciones. Una ejecución que termina con
+    st.rerun() o st.stop() se cuenta pero no aporta duración.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = time.time()
+            self.counters = {}
+
+    def _entry(self, kind):
+        return self.counters.setdefault(kind, {"ejecuciones": 0, "completas": 0, "segundos": 0.0, "max_segundos": 0.0})
+
+    def start(self, kind):
+        """Registra el inicio de una ejecución y devuelve el instante para pasarlo a finish()."""
+        with self.lock:
+            self._entry(kind)["ejecuciones"] += 1
+        return time.perf_counter()
+
+    def finish(self, kind, started):
+        """Suma la duración; si hubo un reset() desde start() el contador se vuelve a crear."""
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            entry = self._entry(kind)
+            entry["completas"] += 1
+            entry["segundos"] += elapsed
+            entry["max_segundos"] = max(entry["max_segundos"], elapsed)
+
+    def snapshot(self):
+        """Lista de {tipo, ejecuciones, por_segundo, promedio_ms, max_ms, cpu_ms_por_segundo} desde el último reset."""
+        with self.lock:
+            window = max(time.time() - self.since, 1e-9)
+            rows = []
+            for kind, entry in sorted(self.counters.items()):
+                promedio = entry["segundos"] / entry["completas"] if entry["completas"] else 0.0
+                rows.append({
+                    "tipo": kind,
+                    "ejecuciones": entry["ejecuciones"],
+                    "por_segundo": round(entry["ejecuciones"] / window, 2),
+                    "promedio_ms": round(1000 * promedio, 1),
+                    "max_ms": round(1000 * entry["max_segundos"], 1),
+                    # Tiempo de servidor por segundo de reloj: la carga que generan todas las pestañas
+                    "ms_por_segundo": round(1000 * entry["segundos"] / window, 1),
+                })
+            return rows
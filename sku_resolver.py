@@ -0,0 +1,151 @@
+import logging
+import threading
+from collections import Counter, namedtuple
+
+logger = logging.getLogger("inventarios-app.sku")
+
+# Resultado de resolver un SKU: el valor, la estrategia que lo encontró y el campo exacto
+SkuMatch = namedtuple("SkuMatch", ["sku", "strategy", "field"])
+
+# Estrategias en el orden en que se prueban
+STRATEGIES = (
+    "seller_custom_field",
+    "seller_sku",
+    "attributes",
+    "attribute_combinations",
+    "campo_directo",
+    "campo_alternativo",
+)
+NO_MATCH = "sin_sku"
+
+ATTRIBUTE_SKU_IDS = frozenset(["SELLER_SKU", "SKU", "ITEM_SKU", "PRODUCT_SKU", "CUSTOM_SKU", "IDENTIFIER"])
+COMBINATION_SKU_IDS = frozenset(["SELLER_SKU", "SKU", "ITEM_SKU", "PRODUCT_SKU"])
+VALUE_FIELDS = ("value_name", "value", "values")
+DIRECT_SKU_FIELDS = ("sku", "variation_sku", "custom_sku", "identifier", "code")
+
+_MISS = SkuMatch("", NO_MATCH, None)
+
+
+def _attribute_id(attr):
+    attr_id = attr.get("id")
+    return attr_id.upper() if isinstance(attr_id, str) else ""
+
+
+def resolve_sku(item_or_variation):
+    """Busca el SKU de un item o variación y devuelve un SkuMatch(sku, strategy, field).
+
+    Prueba, en orden: seller_custom_field, seller_sku, los atributos de SKU, los
+    attribute_combinations de la variación, los campos directos conocidos y, como último
+    recurso, cualquier campo cuyo nombre contenga "sku". Si no encuentra nada devuelve
+    sku="" con strategy="sin_sku".
+    """
+    get = item_or_variation.get
+
+    # 1 y 2. seller_custom_field (preferido) y seller_sku, el "Código de identificación (SKU)" de ML
+    for key in ("seller_custom_field", "seller_sku"):
+        value = get(key)
+        if isinstance(value, str):
+            value = value.strip()
+            if value:
+                return _hit(item_or_variation, SkuMatch(value, key, key))
+
+    # 3. Atributos de SKU
+    attributes = get("attributes")
+    if attributes:
+        for attr in attributes:
+            attr_id = _attribute_id(attr)
+            if attr_id not in ATTRIBUTE_SKU_IDS:
+                continue
+            for value_field in VALUE_FIELDS:
+                value = attr.get(value_field)
+                if isinstance(value, str):
+                    if value.strip():
+                        return _hit(item_or_variation, SkuMatch(value.strip(), "attributes", f"{attr_id}.{value_field}"))
+                elif isinstance(value, list) and value and isinstance(value[0], str):
+                    return _hit(item_or_variation, SkuMatch(value[0].strip(), "attributes", f"{attr_id}.{value_field}[0]"))
+
+    # 4. attribute_combinations (variaciones)
+    combinations = get("attribute_combinations")
+    if combinations:
+        for attr in combinations:
+            attr_id = _attribute_id(attr)
+            if attr_id not in COMBINATION_SKU_IDS:
+                continue
+            for value_field in VALUE_FIELDS:
+                value = attr.get(value_field)
+                if isinstance(value, str) and value.strip():
+                    return _hit(item_or_variation, SkuMatch(value.strip(), "attribute_combinations", f"{attr_id}.{value_field}"))
+
+    # 5. Campos directos de SKU
+    for key in DIRECT_SKU_FIELDS:
+        value = get(key)
+        if isinstance(value, str):
+            value = value.strip()
+            if value:
+                return _hit(item_or_variation, SkuMatch(value, "campo_directo", key))
+
+    # 6. Último recurso: cualquier campo que contenga "sku" en el nombre
+    for key, value in item_or_variation.items():
+        if isinstance(value, str) and "sku" in key.lower():
+            value = value.strip()
+            if value:
+                return _hit(item_or_variation, SkuMatch(value, "campo_alternativo", key))
+
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning(
+            "No se encontró SKU para item %s. Estructura disponible: %s. Atributos: %s",
+            _item_id(item_or_variation), list(item_or_variation), _AttributeSummary(attributes)
+        )
+    return _MISS
+
+
+def _item_id(item_or_variation):
+    return item_or_variation.get("item_id", item_or_variation.get("id", "unknown"))
+
+
+def _hit(item_or_variation, match):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("SKU encontrado en %s (%s) para %s: %s", match.strategy, match.field, _item_id(item_or_variation), match.sku)
+    return match
+
+
+class _AttributeSummary:
+    """Lista de atributos "ID:valor" que solo se formatea si el mensaje llega a escribirse."""
+
+    def __init__(self, attributes):
+        self.attributes = attributes
+
+    def __str__(self):
+        if not self.attributes:
+            return "[]"
+        return str([f"{attr.get('id', 'NO_ID')}:{attr.get('value_name', attr.get('value', 'NO_VALUE'))}" for attr in self.attributes])
+
+
+class SkuStats:
+    """Cuenta cuántos SKUs resolvió cada estrategia (uso seguro desde varios hilos)."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def resolve(self, item_or_variation):
+        match = resolve_sku(item_or_variation)
+        with self.lock:
+            self.counts[match.strategy] += 1
+        return match
+
+    def update(self, counts):
+        """Suma conteos {estrategia: n} (de otro SkuStats o de un checkpoint)."""
+        with self.lock:
+            self.counts.update(counts)
+
+    def summary(self):
+        """Lista de {estrategia, resueltos, porcentaje} en el orden de STRATEGIES, con los sin SKU al final."""
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return [
+            {"estrategia": strategy, "resueltos": counts.get(strategy, 0),
+             "porcentaje": round(100.0 * counts.get(strategy, 0) / total, 2) if total else 0.0}
+            for strategy in STRATEGIES + (NO_MATCH,)
+        ]
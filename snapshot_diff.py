@@ -0,0 +1,178 @@
+import logging
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from snapshots import normalize_snapshot
+
+logger = logging.getLogger("inventarios-app")
+
+# Filas por bloque al leer un inventario; también decide cuántas particiones se usan
+DEFAULT_CHUNKSIZE = 250_000
+
+DIFF_COLUMNS = ["item_id", "variación_id", "título", "sku", "stock"]
+CHANGE_TYPES = ["agregada", "eliminada", "sku_cambiado", "stock_cambiado"]
+
+
+def variation_keys(df):
+    """Hash de 64 bits de (item_id, variación_id) para cada fila de un inventario normalizado."""
+    return pd.util.hash_pandas_object(df[["item_id", "variación_id"]], index=False).to_numpy()
+
+
+# ---- Fuentes de inventarios ----
+# Una fuente es una función sin argumentos que devuelve un iterador de bloques (DataFrames).
+
+def dataframe_source(df, chunksize=DEFAULT_CHUNKSIZE):
+    def chunks():
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    chunks.row_count = len(df)
+    return chunks
+
+
+def file_source(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Inventario del historial; los Parquet se leen por lotes sin cargar el archivo completo."""
+    if path.endswith(".xlsx"):
+        return dataframe_source(pd.read_excel(path), chunksize)
+
+    def chunks():
+        parquet_file = pq.ParquetFile(path)
+        columns = [c for c in DIFF_COLUMNS if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    chunks.row_count = pq.ParquetFile(path).metadata.num_rows
+    return chunks
+
+
+def store_source(store, snapshot_id, chunksize=DEFAULT_CHUNKSIZE):
+    """Inventario guardado en InventoryStore, leído por bloques desde SQLite."""
+    def chunks():
+        return store.iter_ml_snapshot(snapshot_id, chunksize)
+    snapshot = store.get_snapshot(snapshot_id)
+    chunks.row_count = snapshot["row_count"] if snapshot else 0
+    return chunks
+
+
+# ---- Motor de comparación ----
+
+def _compact(chunk):
+    """Solo las columnas que se comparan, con tipos fijos y la clave hasheada."""
+    chunk = normalize_snapshot(chunk)[DIFF_COLUMNS]
+    chunk.insert(0, "key", variation_keys(chunk))
+    return chunk
+
+
+class _Partitions:
+    """Reparte los bloques de un inventario en particiones por hash de la clave.
+
+    Con una sola partición todo queda en memoria; con más, cada partición se escribe en
+    archivos Parquet del directorio de trabajo y se lee de vuelta solo cuando se compara.
+    """
+
+    def __init__(self, n_partitions, work_dir):
+        self.n_partitions = n_partitions
+        self.work_dir = work_dir
+        self.in_memory = {}
+        self.files = {}
+
+    def add(self, snapshot_index, source):
+        for chunk_index, chunk in enumerate(source()):
+            chunk = _compact(chunk)
+            if self.n_partitions == 1:
+                self.in_memory.setdefault((snapshot_index, 0), []).append(chunk)
+                continue
+            partition = chunk["key"].to_numpy() % np.uint64(self.n_partitions)
+            for p in np.unique(partition).tolist():
+                path = os.path.join(self.work_dir, f"s{snapshot_index}_p{p}_c{chunk_index}.parquet")
+                chunk[partition == p].to_parquet(path, index=False)
+                self.files.setdefault((snapshot_index, p), []).append(path)
+
+    def load(self, snapshot_index, partition):
+        parts = self.in_memory.get((snapshot_index, partition))
+        if parts is None:
+            parts = [pd.read_parquet(path) for path in self.files.get((snapshot_index, partition), [])]
+        if not parts:
+            return _compact(pd.DataFrame(columns=DIFF_COLUMNS))
+        df = pd.concat(parts, ignore_index=True)
+        # Una clave repetida en el mismo inventario se compara con su última aparición
+        return df.drop_duplicates("key", keep="last")
+
+
+def _diff_partition(antes, despues):
+    merged = antes.merge(despues, on="key", how="outer", suffixes=("_antes", "_despues"), indicator=True)
+    both = merged["_merge"] == "both"
+    cambios = {
+        "agregada": merged["_merge"] == "right_only",
+        "eliminada": merged["_merge"] == "left_only",
+        "sku_cambiado": both & (merged["sku_antes"] != merged["sku_despues"]).fillna(False),
+        "stock_cambiado": both & (merged["stock_antes"] != merged["stock_despues"]).fillna(False),
+    }
+    frames = []
+    for tipo, mask in cambios.items():
+        rows = merged[mask.to_numpy(dtype=bool)]
+        if rows.empty:
+            continue
+        lado = "despues" if tipo == "agregada" else "antes"
+        frames.append(pd.DataFrame({
+            "tipo": tipo,
+            "item_id": rows[f"item_id_{lado}"],
+            "variación_id": rows[f"variación_id_{lado}"],
+            "título": rows[f"título_{lado}"],
+            "sku_antes": rows["sku_antes"],
+            "sku_despues": rows["sku_despues"],
+            "stock_antes": rows["stock_antes"].astype("Int64"),
+            "stock_despues": rows["stock_despues"].astype("Int64"),
+        }))
+    return frames
+
+
+def diff_snapshots(sources, labels=None, chunksize=DEFAULT_CHUNKSIZE, n_partitions=None, work_dir=None):
+    """Compara dos o más inventarios en orden (el primero contra el segundo, el segundo contra el tercero...).
+
+    Las variaciones se identifican por el hash de (item_id, variación_id) y se reportan
+    como agregadas, eliminadas, con SKU cambiado o con stock cambiado. Para inventarios
+    grandes las filas se reparten en particiones por hash y cada par se compara partición
+    por partición, de modo que la memoria depende del tamaño de una partición y no del
+    inventario completo. Por omisión se usa una partición por cada `chunksize` filas del
+    inventario más grande.
+
+    Devuelve una lista con un diccionario por par: desde, hasta, resumen (conteo por tipo)
+    y cambios (DataFrame ordenado por item_id y variación_id).
+    """
+    if len(sources) < 2:
+        raise ValueError("Se necesitan al menos dos inventarios para compararlos.")
+    labels = list(labels) if labels is not None else [str(i + 1) for i in range(len(sources))]
+    if n_partitions is None:
+        max_rows = max(getattr(source, "row_count", 0) for source in sources)
+        n_partitions = max(1, math.ceil(max_rows / chunksize))
+
+    owns_work_dir = work_dir is None and n_partitions > 1
+    if owns_work_dir:
+        work_dir = tempfile.mkdtemp(prefix="diff_inventarios_")
+    try:
+        partitions = _Partitions(n_partitions, work_dir)
+        for index, source in enumerate(sources):
+            partitions.add(index, source)
+
+        results = []
+        for index in range(len(sources) - 1):
+            frames = []
+            for p in range(n_partitions):
+                frames.extend(_diff_partition(partitions.load(index, p), partitions.load(index + 1, p)))
+            cambios = (
+                pd.concat(frames, ignore_index=True) if frames
+                else pd.DataFrame(columns=["tipo", "item_id", "variación_id", "título", "sku_antes", "sku_despues", "stock_antes", "stock_despues"])
+            )
+            cambios = cambios.sort_values(["item_id", "variación_id", "tipo"], kind="stable", ignore_index=True)
+            resumen = {tipo: int((cambios["tipo"] == tipo).sum()) for tipo in CHANGE_TYPES}
+            logger.info(f"Comparación {labels[index]} → {labels[index + 1]}: {resumen} ({n_partitions} partición(es))")
+            results.append({"desde": labels[index], "hasta": labels[index + 1], "resumen": resumen, "cambios": cambios})
+        return results
+    finally:
+        if owns_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,154 @@
+import io
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger("inventarios-app")
+
+ML_HISTORY_DIR = "inventario_ml_historial"
+SNAPSHOT_EXTENSION = ".parquet"
+
+# Tipos explícitos de cada columna del inventario de Mercado Libre. variación_id es un
+# entero nullable porque las publicaciones sin variaciones no tienen id de variación.
+SNAPSHOT_DTYPES = {
+    "status": "string",
+    "item_id": "string",
+    "título": "string",
+    "sku": "string",
+    "variación_id": "Int64",
+    "stock": "int64",
+    "last_updated": "string",
+}
+
+
+# Tipos de menor memoria para los inventarios que la app mantiene en memoria: los textos
+# que se repiten en cada variación de una publicación (o en todo el inventario, como el
+# status) son categóricos y el stock cabe en int32. variación_id sigue como Int64.
+COMPACT_DTYPES = {
+    "status": "category",
+    "item_id": "category",
+    "título": "category",
+    "sku": "category",
+    "stock": "int32",
+    "last_updated": "category",
+}
+
+
+def manage_file_history(directory, file_extension, max_files=3):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    history = sorted(
+        [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(file_extension)],
+        key=os.path.getmtime
+    )
+
+    while len(history) >= max_files:
+        os.remove(history.pop(0))
+
+
+def get_latest_file(directory, file_extension):
+    """Devuelve la ruta del archivo más reciente del historial, o None si no hay ninguno."""
+    if not os.path.exists(directory):
+        return None
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(file_extension)]
+    return max(files, key=os.path.getmtime) if files else None
+
+
+def normalize_snapshot(df):
+    """Aplica los tipos de SNAPSHOT_DTYPES a un inventario (agrega las columnas que falten)."""
+    df = df.copy()
+    for column, dtype in SNAPSHOT_DTYPES.items():
+        if column not in df.columns:
+            df[column] = pd.Series(pd.NA, index=df.index, dtype="string") if dtype == "string" else 0
+        if dtype == "string":
+            df[column] = df[column].astype("string")
+        elif dtype == "Int64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").round().astype("Int64")
+        else:
+            df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype(dtype)
+    # Los SKUs vacíos se guardan como "" igual que en la extracción
+    df["sku"] = df["sku"].fillna("")
+    return df[list(SNAPSHOT_DTYPES) + [c for c in df.columns if c not in SNAPSHOT_DTYPES]]
+
+
+def compact_snapshot(df):
+    """Inventario normalizado con los tipos de COMPACT_DTYPES (mismos valores, menos memoria)."""
+    return df.astype({column: dtype for column, dtype in COMPACT_DTYPES.items() if column in df.columns})
+
+
+def save_ml_snapshot(df_inv, history_dir=ML_HISTORY_DIR, max_files=3):
+    """Guarda el inventario en el historial en formato Parquet y devuelve la ruta."""
+    manage_file_history(history_dir, SNAPSHOT_EXTENSION, max_files)
+    filename = f"ml_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}{SNAPSHOT_EXTENSION}"
+    file_path = os.path.join(history_dir, filename)
+    tmp_path = file_path + ".tmp"
+    normalize_snapshot(df_inv).to_parquet(tmp_path, index=False)
+    # Escribir y renombrar para que nunca se lea un archivo a medio escribir
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def load_snapshot(path):
+    """Lee un inventario del historial (Parquet o, por compatibilidad, xlsx) con sus tipos explícitos."""
+    if path.endswith(".xlsx"):
+        return normalize_snapshot(pd.read_excel(path))
+    return normalize_snapshot(pd.read_parquet(path))
+
+
+def get_latest_ml_snapshot(history_dir=ML_HISTORY_DIR):
+    """Ruta del inventario de Mercado Libre más reciente del historial, o None."""
+    return get_latest_file(history_dir, SNAPSHOT_EXTENSION)
+
+
+def list_ml_snapshots(history_dir=ML_HISTORY_DIR):
+    """Rutas de los inventarios del historial, del más reciente al más antiguo."""
+    if not os.path.exists(history_dir):
+        return []
+    files = [os.path.join(history_dir, f) for f in os.listdir(history_dir) if f.endswith(SNAPSHOT_EXTENSION)]
+    return sorted(files, key=os.path.getmtime, reverse=True)
+
+
+def migrate_xlsx_snapshots(history_dir=ML_HISTORY_DIR):
+    """Convierte los ml_inventory_*.xlsx antiguos del historial a Parquet.
+
+    Conserva el nombre base y la fecha de modificación (que es la que ordena el historial)
+    y comprueba que el Parquet se lee con las mismas filas. El xlsx no se borra (puede ser
+    un archivo del repositorio): los que ya tienen su Parquet al lado se omiten. Devuelve
+    la lista de archivos migrados en esta llamada.
+    """
+    if not os.path.exists(history_dir):
+        return []
+
+    migrated = []
+    for filename in sorted(os.listdir(history_dir)):
+        if not (filename.startswith("ml_inventory_") and filename.endswith(".xlsx")):
+            continue
+        xlsx_path = os.path.join(history_dir, filename)
+        parquet_path = xlsx_path[:-len(".xlsx")] + SNAPSHOT_EXTENSION
+        if os.path.exists(parquet_path):
+            continue
+        try:
+            df = load_snapshot(xlsx_path)
+            df.to_parquet(parquet_path, index=False)
+            if len(pd.read_parquet(parquet_path)) != len(df):
+                raise ValueError("el número de filas no coincide tras la conversión")
+            mtime = os.path.getmtime(xlsx_path)
+            os.utime(parquet_path, (mtime, mtime))
+            migrated.append(parquet_path)
+            logger.info(f"Inventario {filename} migrado a {os.path.basename(parquet_path)}")
+        except Exception as e:
+            logger.error(f"No se pudo migrar {filename} a Parquet: {e}")
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
+    return migrated
+
+
+def snapshot_to_xlsx_bytes(path):
+    """Genera el xlsx de un inventario del historial en memoria (solo al descargarlo)."""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        load_snapshot(path).to_excel(writer, index=False)
+    return output.getvalue()
@@ -0,0 +1,110 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from extraction_checkpoint import CHECKPOINT_MAX_AGE, PLAN_FILE, ExtractionCheckpoint
+
+
+def fila(item_id, sku, stock):
+    return {"status": "active", "item_id": item_id, "título": f"Publicación {item_id}", "sku": sku,
+            "variación_id": None, "stock": stock}
+
+
+@pytest.fixture
+def staging_dir(tmp_path):
+    return str(tmp_path / "staging")
+
+
+def begin(checkpoint, incremental=True, base_snapshot="ml_inventory_1.parquet", conservadas=None):
+    checkpoint.begin(
+        item_ids=["MLM1", "MLM2", "MLM3"], ids_a_descargar=["MLM2", "MLM3"],
+        listado={"active": 3}, incremental=incremental, base_snapshot=base_snapshot, omitidas=1,
+        df_conservadas=conservadas, last_updated={"MLM2": "2025-06-19T10:00:00.000Z"},
+    )
+
+
+def test_round_trip_resumes_with_the_saved_rows(staging_dir):
+    checkpoint = ExtractionCheckpoint(staging_dir)
+    begin(checkpoint, conservadas=pd.DataFrame([fila("MLM1", "A", 5)]))
+    checkpoint.save([fila("MLM2", "B", 3)], procesadas=1, sku_counts={"seller_sku": 1})
+    checkpoint.save([], procesadas=1, sku_counts={"seller_sku": 1})
+    checkpoint.save([fila("MLM3", "C", 0)], procesadas=2, sku_counts={"seller_sku": 2})
+
+    reanudado = ExtractionCheckpoint(staging_dir)
+    assert reanudado.load(True, "ml_inventory_1.parquet") is True
+    assert reanudado.progress["procesadas"] == 2
+    assert reanudado.progress["sku_estrategias"] == {"seller_sku": 2}
+    assert reanudado.plan["ids_a_descargar"] == ["MLM2", "MLM3"]
+    assert reanudado.plan["last_updated"] == {"MLM2": "2025-06-19T10:00:00.000Z"}
+
+    rows = reanudado.rows()
+    # Las filas conservadas van primero y un save() sin filas no agrega una parte vacía
+    assert rows["item_id"].tolist() == ["MLM1", "MLM2", "MLM3"]
+    assert rows["sku"].tolist() == ["A", "B", "C"]
+    assert rows["stock"].tolist() == [5, 3, 0]
+    assert len(reanudado.progress["partes"]) == 2
+    assert reanudado.status() == {"creado": reanudado.plan["created_at"], "procesadas": 2, "total": 2, "incremental": True}
+
+
+def test_full_extraction_without_rows_has_nothing_to_return(staging_dir):
+    checkpoint = ExtractionCheckpoint(staging_dir)
+    begin(checkpoint, incremental=False, base_snapshot=None)
+
+    reanudado = ExtractionCheckpoint(staging_dir)
+    assert reanudado.load(False, None) is True
+    assert reanudado.rows() is None
+
+
+@pytest.mark.parametrize("incremental, base_snapshot", [
+    (False, "ml_inventory_1.parquet"),
+    (True, "ml_inventory_2.parquet"),
+])
+def test_mismatched_checkpoint_is_discarded(staging_dir, incremental, base_snapshot):
+    checkpoint = ExtractionCheckpoint(staging_dir)
+    begin(checkpoint)
+    checkpoint.save([fila("MLM2", "B", 3)], procesadas=1, sku_counts={})
+
+    reanudado = ExtractionCheckpoint(staging_dir)
+    assert reanudado.load(incremental, base_snapshot) is False
+    assert not os.path.exists(staging_dir)
+    assert reanudado.plan is None
+    assert reanudado.status() is None
+
+
+def test_old_checkpoint_is_discarded(staging_dir):
+    checkpoint = ExtractionCheckpoint(staging_dir)
+    begin(checkpoint)
+    plan_path = os.path.join(staging_dir, PLAN_FILE)
+    with open(plan_path, encoding="utf-8") as f:
+        plan = json.load(f)
+    plan["created_at"] = (datetime.now() - CHECKPOINT_MAX_AGE * 2).strftime("%Y-%m-%d %H:%M:%S")
+    with open(plan_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f)
+
+    assert ExtractionCheckpoint(staging_dir).load(True, "ml_inventory_1.parquet") is False
+    assert not os.path.exists(staging_dir)
+
+
+def test_unreadable_checkpoint_is_discarded(staging_dir):
+    checkpoint = ExtractionCheckpoint(staging_dir)
+    begin(checkpoint)
+    with open(os.path.join(staging_dir, PLAN_FILE), "w", encoding="utf-8") as f:
+        f.write("{")
+
+    assert ExtractionCheckpoint(staging_dir).load(True, "ml_inventory_1.parquet") is False
+    assert not os.path.exists(staging_dir)
+
+
+def test_begin_replaces_the_previous_checkpoint(staging_dir):
+    checkpoint = ExtractionCheckpoint(staging_dir)
+    begin(checkpoint)
+    checkpoint.save([fila("MLM2", "B", 3)], procesadas=1, sku_counts={})
+    begin(checkpoint, incremental=False, base_snapshot=None)
+
+    reanudado = ExtractionCheckpoint(staging_dir)
+    assert reanudado.load(False, None) is True
+    assert reanudado.progress["procesadas"] == 0
+    assert reanudado.rows() is None
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pandas as pd
+
+from inventory_store import InventoryStore
+
+
+def inventario(stock):
+    return pd.DataFrame({
+        "status": ["active", "active"],
+        "item_id": ["MLM1", "MLM1"],
+        "título": ["Playera", "Playera"],
+        "sku": ["SKU-A", "SKU-B"],
+        "variación_id": [11, 12],
+        "stock": [stock, stock + 1],
+    })
+
+
+def count_rows(store, table):
+    with sqlite3.connect(store.db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_saving_prunes_snapshots_beyond_the_cap(tmp_path):
+    store = InventoryStore(str(tmp_path / "inventario.db"), max_snapshots=2)
+    ids = [
+        store.save_ml_snapshot(inventario(i), created_at=f"2025-06-0{i + 1} 10:00:00")
+        for i in range(4)
+    ]
+
+    assert store.list_snapshots("ml")["id"].tolist() == ids[:1:-1]
+    assert store.get_snapshot(ids[0]) is None
+    # Las publicaciones y variaciones de los snapshots borrados se van en cascada
+    assert count_rows(store, "listings") == 2
+    assert count_rows(store, "variations") == 4
+    assert store.load_ml_snapshot()["stock"].tolist() == [3, 4]
+
+
+def test_pruning_is_per_kind(tmp_path):
+    store = InventoryStore(str(tmp_path / "inventario.db"), max_snapshots=1)
+    store.save_ml_snapshot(inventario(1))
+    store.save_provider_stock({"SKU-A": 5})
+    store.save_provider_stock({"SKU-A": 7})
+
+    assert len(store.list_snapshots("ml")) == 1
+    assert len(store.list_snapshots("proveedor")) == 1
+    assert count_rows(store, "provider_stock") == 1
+
+
+def test_imported_files_older_than_the_cap_are_not_kept(tmp_path):
+    store = InventoryStore(str(tmp_path / "inventario.db"), max_snapshots=1)
+    reciente = store.save_ml_snapshot(inventario(1), created_at="2025-06-02 10:00:00")
+    store.save_ml_snapshot(inventario(2), source="viejo.parquet", created_at="2025-06-01 10:00:00")
+
+    assert store.list_snapshots("ml")["id"].tolist() == [reciente]
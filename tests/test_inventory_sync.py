@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from inventory_sync import sync_inventory
+
+
+class FakeClient:
+    """Cliente de Mercado Libre en memoria: registra cada escritura y responde según `rechazos`.
+
+    `rechazos` es {(item_id, combinado): resultado} para los PUT que deben fallar;
+    combinado indica si el payload lleva el estado "paused" junto con las cantidades.
+    """
+
+    def __init__(self, rechazos=None):
+        self.rechazos = rechazos or {}
+        self.calls = []
+
+    def update_item_stock_safe(self, item_id, payload):
+        combinado = payload.get("status") == "paused"
+        self.calls.append(("PUT combinado" if combinado else "PUT", item_id))
+        return self.rechazos.get((item_id, combinado), {"success": True, "data": {}})
+
+    def pause_item(self, item_id):
+        self.calls.append(("pausa", item_id))
+        return {"success": True}
+
+
+@pytest.fixture
+def inventario(tmp_path, monkeypatch):
+    """MLM1 y MLM2 (con dos variaciones) quedan en 0 y se pausan; MLM3 solo cambia de stock."""
+    # sync_inventory escribe el log en logs/ con ruta relativa
+    monkeypatch.chdir(tmp_path)
+    df_ml = pd.DataFrame({
+        "item_id": ["MLM1", "MLM2", "MLM2", "MLM3"],
+        "variación_id": [np.nan, 11.0, 12.0, np.nan],
+        "stock": [5, 4, 6, 2],
+        "stock_nuevo": [0, 0, 0, 10],
+    })
+    df_ml["cambio"] = df_ml["stock"] != df_ml["stock_nuevo"]
+    return df_ml, df_ml[df_ml["cambio"]]
+
+
+def run_sync(client, inventario):
+    # Un solo hilo: las publicaciones se escriben en el orden del plan
+    return sync_inventory(client, *inventario, workers=1)
+
+
+def test_combined_put_pauses_in_the_same_request(inventario):
+    client = FakeClient()
+    resultado = run_sync(client, inventario)
+
+    assert client.calls == [("PUT combinado", "MLM1"), ("PUT combinado", "MLM2"), ("PUT", "MLM3")]
+    assert resultado["escrituras"] == 3
+    assert resultado["error"] == 0
+    assert resultado["log"] == [
+        "✔️ MLM1: Actualizado correctamente (1 variantes/items).",
+        "✔️ MLM2: Actualizado correctamente (2 variantes/items).",
+        "✔️ MLM3: Actualizado correctamente (1 variantes/items).",
+        "⏸️ MLM1: Publicación pausada correctamente.",
+        "⏸️ MLM2: Publicación pausada correctamente.",
+        "Peticiones de escritura: 3 para 3 publicaciones (2 pausadas).",
+    ]
+
+
+def test_rejected_combination_falls_back_to_separate_puts(inventario):
+    rechazo = '{"message": "status no se puede combinar con otros campos", "error": "bad_request", "cause": []}'
+    client = FakeClient({("MLM1", True): {"success": False, "error": "Status 400", "details": rechazo, "status": 400}})
+    resultado = run_sync(client, inventario)
+
+    # Tras el 400 por status de MLM1 el resto de la sincronización ya no intenta combinar
+    assert client.calls == [
+        ("PUT combinado", "MLM1"), ("PUT", "MLM1"), ("pausa", "MLM1"),
+        ("PUT", "MLM2"), ("pausa", "MLM2"),
+        ("PUT", "MLM3"),
+    ]
+    assert resultado["escrituras"] == 6
+    assert resultado["error"] == 0
+    assert resultado["log"] == [
+        "✔️ MLM1: Actualizado correctamente (1 variantes/items).",
+        "✔️ MLM2: Actualizado correctamente (2 variantes/items).",
+        "✔️ MLM3: Actualizado correctamente (1 variantes/items).",
+        "⏸️ MLM1: Publicación pausada correctamente.",
+        "⏸️ MLM2: Publicación pausada correctamente.",
+        "Peticiones de escritura: 6 para 3 publicaciones (2 pausadas).",
+    ]
+
+
+def test_payload_400_only_affects_its_listing(inventario):
+    rechazo = {
+        "success": False, "error": "Status 400", "status": 400,
+        "details": '{"message": "Validation error", "error": "validation_error", '
+                   '"cause": [{"code": "item.variations.invalid", "message": "Variation 11 not found"}]}',
+    }
+    client = FakeClient({("MLM1", True): rechazo, ("MLM1", False): rechazo})
+    resultado = run_sync(client, inventario)
+
+    # MLM1 se reintenta en dos PUT, pero MLM2 sigue pausándose en una sola petición
+    assert client.calls == [
+        ("PUT combinado", "MLM1"), ("PUT", "MLM1"), ("pausa", "MLM1"),
+        ("PUT combinado", "MLM2"),
+        ("PUT", "MLM3"),
+    ]
+    assert resultado["escrituras"] == 5
+    assert resultado["error"] == 1
+    assert resultado["log"] == [
+        "❌ MLM1: Error en actualización. Causa: Status 400 - " + rechazo["details"],
+        "✔️ MLM2: Actualizado correctamente (2 variantes/items).",
+        "✔️ MLM3: Actualizado correctamente (1 variantes/items).",
+        "⏸️ MLM1: Publicación pausada correctamente.",
+        "⏸️ MLM2: Publicación pausada correctamente.",
+        "Peticiones de escritura: 5 para 3 publicaciones (2 pausadas).",
+    ]
+
+
+def test_other_failures_keep_combining(inventario):
+    client = FakeClient({("MLM1", True): {"success": False, "error": "Error 500", "details": "", "status": 500}})
+    resultado = run_sync(client, inventario)
+
+    # Un error que no es 400 no se reintenta por separado ni apaga la combinación
+    assert client.calls == [("PUT combinado", "MLM1"), ("PUT combinado", "MLM2"), ("PUT", "MLM3")]
+    assert resultado["escrituras"] == 3
+    assert resultado["exito"] == 3
+    assert resultado["error"] == 1
+    assert resultado["errores"] == ["Error 500", "Error al pausar: Error 500"]
+    assert resultado["log"] == [
+        "❌ MLM1: Error en actualización. Causa: Error 500",
+        "✔️ MLM2: Actualizado correctamente (2 variantes/items).",
+        "✔️ MLM3: Actualizado correctamente (1 variantes/items).",
+        "❌ MLM1: Error al pausar. Causa: Error 500",
+        "⏸️ MLM2: Publicación pausada correctamente.",
+        "Peticiones de escritura: 3 para 3 publicaciones (2 pausadas).",
+    ]
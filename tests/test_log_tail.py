@@ -0,0 +1,82 @@
+import os
+
+from log_tail import LogTail
+
+
+def record(n, job=None):
+    tag = f"[job {job}] " if job else ""
+    return f"2025-06-19 10:00:00,000 - inventarios-app - INFO - {tag}registro {n:04d}\n"
+
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_buffer_keeps_only_the_last_max_lines(tmp_path):
+    path = tmp_path / "app.log"
+    append(path, "".join(record(i) for i in range(10)))
+    tail = LogTail(str(path), max_lines=4)
+
+    assert tail.poll() == 10
+    assert tail.lines(n=50) == [record(i).rstrip("\n") for i in range(6, 10)]
+    assert tail.lines(n=2) == [record(i).rstrip("\n") for i in range(8, 10)]
+
+    append(path, record(10) + record(11))
+    assert tail.poll() == 2
+    assert tail.lines() == [record(i).rstrip("\n") for i in range(8, 12)]
+
+
+def test_poll_reads_only_what_was_appended(tmp_path):
+    path = tmp_path / "app.log"
+    append(path, record(0))
+    tail = LogTail(str(path))
+    tail.poll()
+    leido = tail.bytes_read
+
+    assert tail.poll() == 0
+    # Una línea a medio escribir espera a su salto de línea
+    append(path, record(1)[:20])
+    assert tail.poll() == 0
+    append(path, record(1)[20:])
+    assert tail.poll() == 1
+    assert tail.lines() == [record(0).rstrip("\n"), record(1).rstrip("\n")]
+    assert tail.bytes_read == leido + len(record(1))
+
+
+def test_first_read_and_large_appends_are_capped_at_max_read(tmp_path):
+    path = tmp_path / "app.log"
+    append(path, "".join(record(i) for i in range(100)))
+    size = len(record(0))
+    tail = LogTail(str(path), max_read=3 * size + 5)
+
+    # Se descarta la línea cortada al principio de la ventana leída
+    assert tail.poll() == 3
+    assert tail.lines() == [record(i).rstrip("\n") for i in range(97, 100)]
+
+    append(path, "".join(record(i) for i in range(100, 200)))
+    assert tail.poll() == 3
+    assert tail.lines()[-3:] == [record(i).rstrip("\n") for i in range(197, 200)]
+    assert tail.bytes_read == 2 * (3 * size + 5)
+
+
+def test_rotation_starts_again_from_the_new_file(tmp_path):
+    path = tmp_path / "app.log"
+    append(path, record(0) + record(1))
+    tail = LogTail(str(path), max_lines=10)
+    tail.poll()
+
+    os.replace(path, tmp_path / "app.log.1")
+    append(path, record(2))
+    assert tail.poll() == 1
+    assert tail.lines() == [record(i).rstrip("\n") for i in range(3)]
+
+
+def test_lines_filter_by_job_including_continuation_lines(tmp_path):
+    path = tmp_path / "app.log"
+    append(path, record(0, job="a1") + "Traceback (most recent call last):\n" + record(1) + record(2, job="b2"))
+    tail = LogTail(str(path))
+    tail.poll()
+
+    assert tail.lines(job_id="a1") == [record(0, job="a1").rstrip("\n"), "Traceback (most recent call last):"]
+    assert tail.lines(job_id="b2") == [record(2, job="b2").rstrip("\n")]
@@ -0,0 +1,134 @@
+import pytest
+import requests
+
+import ml_client
+from metrics import MetricsRegistry
+from ml_client import MercadoLibreClient, RateLimiter
+
+
+class FakeTime:
+    """Reloj de mentira para ml_client: sleep() solo avanza el reloj y se registra."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(ml_client, "time", fake)
+    return fake
+
+
+def response(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = b"{}"
+    resp.headers.update(headers or {})
+    return resp
+
+
+class FakeSession:
+    """Sesión HTTP que devuelve las respuestas de `responses` en orden."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_throttle_halves_the_rate_and_doubles_the_backoff(reloj):
+    limiter = RateLimiter(rate=8.0, max_rate=16.0, min_rate=1.0)
+
+    limiter.report_throttled()
+    assert limiter.rate == 4.0
+    assert limiter.cooldown_until == reloj.now + 1.0
+    assert limiter.backoff == 2.0
+
+    for _ in range(10):
+        limiter.report_throttled()
+    # La tasa no baja del mínimo y la pausa sin Retry-After no pasa de 30 s
+    assert limiter.rate == 1.0
+    assert limiter.backoff == 30.0
+
+
+def test_retry_after_sets_the_pause(reloj):
+    limiter = RateLimiter(rate=8.0)
+
+    limiter.report_throttled("7")
+    assert limiter.cooldown_until == reloj.now + 7.0
+
+    # Un Retry-After ilegible usa el backoff en curso (ya duplicado por el 429 anterior)
+    limiter.report_throttled("mañana")
+    assert limiter.cooldown_until == reloj.now + 7.0
+    limiter.cooldown_until = 0.0
+    limiter.report_throttled("mañana")
+    assert limiter.cooldown_until == reloj.now + 4.0
+
+
+def test_acquire_waits_out_the_cooldown(reloj):
+    limiter = RateLimiter(rate=4.0)
+    limiter.acquire()
+
+    limiter.report_throttled("3")
+    limiter.acquire()
+    # Primero la pausa global; después un token a la nueva tasa (2 req/s)
+    assert reloj.sleeps == [3.0, 0.5]
+    assert reloj.now == 1003.5
+
+
+def test_success_recovers_the_rate_gradually(reloj):
+    limiter = RateLimiter(rate=4.0, max_rate=5.0)
+    limiter.report_throttled()
+    limiter.report_throttled()
+    assert limiter.rate == 1.0
+    assert limiter.backoff == 4.0
+
+    limiter.report_success()
+    assert limiter.rate == pytest.approx(1.1)
+    assert limiter.backoff == 1.0
+
+    for _ in range(100):
+        limiter.report_success()
+    assert limiter.rate == 5.0
+
+
+def test_request_retries_after_429(reloj):
+    client = MercadoLibreClient("token", rate_limit=4.0, metrics=MetricsRegistry(), token_file=None)
+    client.session = FakeSession([response(429, {"Retry-After": "2"}), response(200)])
+
+    resp = client.request("GET", "/users/me", "GET /users/me")
+
+    assert resp.status_code == 200
+    assert client.session.calls == 2
+    assert 2.0 in reloj.sleeps
+    # La tasa se redujo a la mitad por el 429 y empezó a subir con la respuesta limpia
+    assert client.limiter.rate == pytest.approx(2.1)
+    assert client.limiter.backoff == 1.0
+
+
+def test_request_returns_the_last_429_when_retries_run_out(reloj):
+    client = MercadoLibreClient("token", rate_limit=4.0, metrics=MetricsRegistry(), token_file=None, max_retries=2)
+    client.session = FakeSession([response(429), response(429)])
+
+    resp = client.request("GET", "/users/me", "GET /users/me")
+
+    assert resp.status_code == 429
+    assert client.session.calls == 2
+    assert client.limiter.rate == 1.0
@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+import pytest
+
+from snapshot_diff import dataframe_source, diff_snapshots, file_source
+
+
+def inventario(filas):
+    return pd.DataFrame(filas, columns=["item_id", "variación_id", "título", "sku", "stock"])
+
+
+ANTES = inventario([
+    ("MLM1", 11, "Playera", "PL-CH", 5),
+    ("MLM1", 12, "Playera", "PL-M", 3),
+    ("MLM2", None, "Gorra", "GO-1", 7),
+    ("MLM3", None, "Taza", "TA-1", 2),
+    ("MLM4", 41, "Sudadera", "SU-CH", 1),
+])
+DESPUES = inventario([
+    ("MLM1", 11, "Playera", "PL-CH", 5),
+    ("MLM1", 12, "Playera", "PL-M2", 3),
+    ("MLM2", None, "Gorra", "GO-1", 9),
+    ("MLM4", 41, "Sudadera", "SU-CH", 1),
+    ("MLM4", 42, "Sudadera", "SU-M", 4),
+    ("MLM5", None, "Termo", "TE-1", 6),
+])
+ESPERADO = [
+    ("sku_cambiado", "MLM1", 12),
+    ("stock_cambiado", "MLM2", None),
+    ("eliminada", "MLM3", None),
+    ("agregada", "MLM4", 42),
+    ("agregada", "MLM5", None),
+]
+
+
+def cambios(resultado):
+    df = resultado["cambios"]
+    return [
+        (tipo, item_id, None if pd.isna(variacion) else int(variacion))
+        for tipo, item_id, variacion in df[["tipo", "item_id", "variación_id"]].itertuples(index=False)
+    ]
+
+
+@pytest.mark.parametrize("n_partitions", [1, 3, 8])
+def test_changes_are_the_same_with_any_number_of_partitions(tmp_path, n_partitions):
+    [resultado] = diff_snapshots(
+        [dataframe_source(ANTES, chunksize=2), dataframe_source(DESPUES, chunksize=2)],
+        labels=["antes", "despues"], n_partitions=n_partitions, work_dir=str(tmp_path),
+    )
+
+    assert (resultado["desde"], resultado["hasta"]) == ("antes", "despues")
+    assert cambios(resultado) == ESPERADO
+    assert resultado["resumen"] == {"agregada": 2, "eliminada": 1, "sku_cambiado": 1, "stock_cambiado": 1}
+    fila = resultado["cambios"].iloc[0]
+    assert (fila["sku_antes"], fila["sku_despues"]) == ("PL-M", "PL-M2")
+    stock = resultado["cambios"][resultado["cambios"]["tipo"] == "stock_cambiado"].iloc[0]
+    assert (stock["stock_antes"], stock["stock_despues"]) == (7, 9)
+    # Con más de una partición los bloques se escriben en el directorio de trabajo
+    assert bool(os.listdir(tmp_path)) == (n_partitions > 1)
+
+
+def test_default_partitions_spill_to_a_temporary_dir_and_clean_it(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    [resultado] = diff_snapshots([dataframe_source(ANTES), dataframe_source(DESPUES)], chunksize=2)
+
+    # 6 filas en bloques de 2: tres particiones en un directorio temporal que se borra al terminar
+    assert cambios(resultado) == ESPERADO
+    assert os.listdir(tmp_path) == []
+
+
+def test_chain_of_snapshots_compares_each_pair(tmp_path):
+    tercero = DESPUES[DESPUES["item_id"] != "MLM5"]
+    resultados = diff_snapshots(
+        [dataframe_source(ANTES), dataframe_source(DESPUES), dataframe_source(tercero)],
+        labels=["1", "2", "3"], n_partitions=2, work_dir=str(tmp_path),
+    )
+
+    assert [(r["desde"], r["hasta"]) for r in resultados] == [("1", "2"), ("2", "3")]
+    assert cambios(resultados[0]) == ESPERADO
+    assert cambios(resultados[1]) == [("eliminada", "MLM5", None)]
+
+
+def test_identical_snapshots_have_no_changes():
+    [resultado] = diff_snapshots([dataframe_source(ANTES), dataframe_source(ANTES.copy())])
+
+    assert resultado["cambios"].empty
+    assert resultado["resumen"] == {"agregada": 0, "eliminada": 0, "sku_cambiado": 0, "stock_cambiado": 0}
+
+
+def test_parquet_files_are_read_in_batches(tmp_path):
+    antes = str(tmp_path / "antes.parquet")
+    despues = str(tmp_path / "despues.parquet")
+    ANTES.to_parquet(antes, index=False)
+    DESPUES.to_parquet(despues, index=False)
+    (tmp_path / "trabajo").mkdir()
+
+    [resultado] = diff_snapshots(
+        [file_source(antes, chunksize=2), file_source(despues, chunksize=2)],
+        chunksize=2, work_dir=str(tmp_path / "trabajo"),
+    )
+
+    assert cambios(resultado) == ESPERADO
+
+
+def test_needs_two_snapshots():
+    with pytest.raises(ValueError):
+        diff_snapshots([dataframe_source(ANTES)])
@@ -0,0 +1,136 @@
+import json
+import time
+
+import pytest
+import requests
+
+import ml_client
+from metrics import MetricsRegistry
+from ml_client import TOKEN_RETRY_AFTER, MercadoLibreClient, TokenManager
+
+
+@pytest.fixture
+def oauth(monkeypatch):
+    """Reemplaza la llamada a OAuth: entrega "nuevo-1", "nuevo-2"... o None si `falla`."""
+    state = {"llamadas": 0, "falla": False}
+
+    def refresh(client_id, client_secret, base_url):
+        state["llamadas"] += 1
+        if state["falla"]:
+            return None
+        return {"access_token": f"nuevo-{state['llamadas']}", "expires_in": 21600}
+
+    monkeypatch.setattr(ml_client, "refresh_access_token", refresh)
+    return state
+
+
+def token_file(tmp_path, access_token, expires_in):
+    path = tmp_path / "ml_token_info.json"
+    path.write_text(json.dumps({"access_token": access_token, "expires_at": time.time() + expires_in}))
+    return str(path)
+
+
+def manager(path, access_token="viejo"):
+    return TokenManager(access_token, "client-id", "secreto", token_file=path, refresh_margin=600)
+
+
+def test_valid_token_is_not_refreshed(tmp_path, oauth):
+    tokens = manager(token_file(tmp_path, "viejo", 3600))
+
+    assert tokens.get_token() == "viejo"
+    assert oauth["llamadas"] == 0
+
+
+def test_token_is_refreshed_before_it_expires(tmp_path, oauth):
+    path = token_file(tmp_path, "viejo", 300)
+    tokens = manager(path)
+
+    assert tokens.get_token() == "nuevo-1"
+    assert tokens.get_token() == "nuevo-1"
+    assert oauth["llamadas"] == 1
+    assert tokens.refreshes == 1
+    # El token renovado queda en el archivo con su vencimiento absoluto
+    saved = json.loads(open(path, encoding="utf-8").read())
+    assert saved["access_token"] == "nuevo-1"
+    assert saved["expires_at"] == pytest.approx(time.time() + 21600, abs=5)
+
+
+def test_newer_token_in_the_file_replaces_the_configured_one(tmp_path, oauth):
+    tokens = manager(token_file(tmp_path, "renovado", 3600), access_token="de-secrets")
+
+    assert tokens.get_token() == "renovado"
+    assert oauth["llamadas"] == 0
+
+
+def test_failed_refresh_keeps_the_token_and_waits_before_retrying(tmp_path, oauth):
+    oauth["falla"] = True
+    tokens = manager(token_file(tmp_path, "viejo", 300))
+
+    assert tokens.get_token() == "viejo"
+    assert tokens.get_token() == "viejo"
+    assert oauth["llamadas"] == 1
+    assert tokens.retry_at == pytest.approx(time.time() + TOKEN_RETRY_AFTER, abs=5)
+    assert tokens.invalidate("viejo") is False
+    assert oauth["llamadas"] == 1
+
+
+def test_invalidate_refreshes_once_per_token(tmp_path, oauth):
+    tokens = manager(token_file(tmp_path, "viejo", 3600))
+
+    assert tokens.invalidate("viejo") is True
+    # Otro hilo que recibió el 401 con el mismo token usa el ya renovado
+    assert tokens.invalidate("viejo") is True
+    assert tokens.get_token() == "nuevo-1"
+    assert oauth["llamadas"] == 1
+
+
+def test_invalidate_without_credentials(tmp_path, oauth):
+    tokens = TokenManager("viejo", token_file=None)
+
+    assert tokens.invalidate("viejo") is False
+    assert oauth["llamadas"] == 0
+
+
+class AuthSession:
+    """Sesión HTTP que responde 401 a cualquier token distinto de `valid_token`."""
+
+    def __init__(self, valid_token):
+        self.valid_token = valid_token
+        self.tokens = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        token = headers["Authorization"].removeprefix("Bearer ")
+        self.tokens.append(token)
+        resp = requests.Response()
+        resp.status_code = 200 if token == self.valid_token else 401
+        resp._content = b"{}"
+        return resp
+
+
+def test_request_refreshes_on_401_without_using_a_retry(tmp_path, oauth):
+    client = MercadoLibreClient(
+        "viejo", "client-id", "secreto", metrics=MetricsRegistry(),
+        token_file=token_file(tmp_path, "viejo", 3600), max_retries=1,
+    )
+    client.session = AuthSession("nuevo-1")
+
+    resp = client.request("GET", "/users/me", "GET /users/me")
+
+    assert resp.status_code == 200
+    assert client.session.tokens == ["viejo", "nuevo-1"]
+    assert oauth["llamadas"] == 1
+
+
+def test_request_returns_the_401_when_the_new_token_is_rejected(tmp_path, oauth):
+    client = MercadoLibreClient(
+        "viejo", "client-id", "secreto", metrics=MetricsRegistry(),
+        token_file=token_file(tmp_path, "viejo", 3600), max_retries=3,
+    )
+    client.session = AuthSession("otro")
+
+    resp = client.request("GET", "/users/me", "GET /users/me")
+
+    # Solo se renueva una vez por petición; el segundo 401 se devuelve a quien llama
+    assert resp.status_code == 401
+    assert client.session.tokens == ["viejo", "nuevo-1"]
+    assert oauth["llamadas"] == 1